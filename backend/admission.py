@@ -0,0 +1,248 @@
+"""
+Admission control for the analysis worker threads
+
+All analysis used to share one ThreadPoolExecutor with an unbounded queue:
+a burst of video uploads queued without limit, and an image request that
+arrived behind them waited for every one. AdmissionExecutor runs the same
+fixed set of threads, but work is submitted to named lanes:
+
+- each lane has a bounded queue; submitting to a full one raises Saturated
+  (the API answers 503 with a Retry-After estimated from the lane's recent
+  run times) instead of queueing without limit
+- free threads take work from the highest-priority lane first
+- each lane can be capped to a number of running tasks, and `reserved`
+  threads are kept for interactive lanes, so long videos can never occupy
+  every thread while image requests wait
+
+lane(name) returns a concurrent.futures.Executor bound to one lane, for
+loop.run_in_executor and JobManager. AdmissionMiddleware runs a lane's
+check() before an upload's body is read, so a saturated server turns large
+uploads away without receiving them first.
+"""
+import math
+import threading
+import time
+from collections import deque
+from concurrent.futures import Executor, Future
+from typing import Callable, Dict, List, Optional
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+from metrics import ADMISSION_REJECTED, EXECUTOR_ACTIVE, EXECUTOR_QUEUE_DEPTH
+
+
+class Saturated(Exception):
+    """Raised when a lane's queue is full"""
+
+    def __init__(self, lane: str, retry_after: int):
+        super().__init__(f"The {lane} analysis queue is full")
+        self.lane = lane
+        self.retry_after = retry_after
+
+
+class _Lane:
+    def __init__(self, name: str, priority: int, max_queued: Optional[int], max_running: int,
+                 interactive: bool):
+        self.name = name
+        self.priority = priority
+        self.max_queued = max_queued  # None = unbounded (the caller limits it)
+        self.max_running = max_running
+        self.interactive = interactive
+
+        self.queue = deque()
+        self.running = 0
+        self.avg_seconds: Optional[float] = None
+        self.rejected = 0
+
+    def report(self):
+        EXECUTOR_QUEUE_DEPTH.labels(self.name).set(len(self.queue))
+        EXECUTOR_ACTIVE.labels(self.name).set(self.running)
+
+
+class LaneExecutor(Executor):
+    """Executor view of one lane of an AdmissionExecutor"""
+
+    def __init__(self, pool: "AdmissionExecutor", lane: str):
+        self.pool = pool
+        self.lane = lane
+
+    def submit(self, fn, /, *args, **kwargs) -> Future:
+        return self.pool.submit(self.lane, fn, *args, **kwargs)
+
+    def check(self):
+        self.pool.check(self.lane)
+
+    def shutdown(self, wait: bool = True, *, cancel_futures: bool = False):
+        # The threads belong to the pool; shut that down instead
+        pass
+
+
+class AdmissionExecutor:
+    """Fixed worker threads shared by prioritized lanes with bounded queues"""
+
+    # Weight of the latest run in a lane's average run time
+    SMOOTHING = 0.2
+
+    def __init__(self, workers: int, reserved: int = 1):
+        self.workers = max(1, workers)
+        # Threads only interactive lanes may use (at least one is left for the rest)
+        self.reserved = max(0, min(reserved, self.workers - 1))
+
+        self._lanes: Dict[str, _Lane] = {}
+        self._by_priority: List[_Lane] = []
+        self._cond = threading.Condition()
+        self._shutdown = False
+
+        self._threads = [
+            threading.Thread(target=self._work, name=f"analysis-{i}", daemon=True)
+            for i in range(self.workers)
+        ]
+        for thread in self._threads:
+            thread.start()
+
+    def add_lane(self, name: str, priority: int, max_queued: Optional[int] = None,
+                 max_running: Optional[int] = None, interactive: bool = False) -> LaneExecutor:
+        """Register a lane (lower priority numbers run first) and return its executor"""
+        lane = _Lane(name, priority, max_queued, max_running or self.workers, interactive)
+        with self._cond:
+            self._lanes[name] = lane
+            self._by_priority = sorted(self._lanes.values(), key=lambda l: l.priority)
+        lane.report()
+        return LaneExecutor(self, name)
+
+    def lane(self, name: str) -> LaneExecutor:
+        return LaneExecutor(self, name)
+
+    def _admit(self, lane: _Lane):
+        """Raise Saturated if lane's queue is full (lock held)"""
+        if lane.max_queued is not None and len(lane.queue) >= lane.max_queued:
+            lane.rejected += 1
+            ADMISSION_REJECTED.labels(lane.name).inc()
+            raise Saturated(lane.name, self._retry_after(lane))
+
+    def check(self, lane_name: str):
+        """Raise Saturated if a submit to the lane would be rejected right now"""
+        with self._cond:
+            self._admit(self._lanes[lane_name])
+
+    def submit(self, lane_name: str, fn, /, *args, **kwargs) -> Future:
+        """Queue fn on a lane, raising Saturated if the lane's queue is full"""
+        with self._cond:
+            if self._shutdown:
+                raise RuntimeError("Cannot submit after shutdown")
+
+            lane = self._lanes[lane_name]
+            self._admit(lane)
+
+            future = Future()
+            lane.queue.append((future, fn, args, kwargs))
+            lane.report()
+            self._cond.notify()
+        return future
+
+    def _retry_after(self, lane: _Lane) -> int:
+        """Seconds until the lane has likely worked through its current queue"""
+        per_task = lane.avg_seconds if lane.avg_seconds is not None else 1.0
+        capacity = max(1, min(lane.max_running, self.workers - (0 if lane.interactive else self.reserved)))
+        return int(min(max(math.ceil(per_task * (len(lane.queue) + 1) / capacity), 1), 300))
+
+    def _next_lane(self) -> Optional[_Lane]:
+        """Highest-priority lane with queued work that may start another task (lock held)"""
+        background = sum(lane.running for lane in self._by_priority if not lane.interactive)
+        for lane in self._by_priority:
+            if not lane.queue or lane.running >= lane.max_running:
+                continue
+            if not lane.interactive and background >= self.workers - self.reserved:
+                continue
+            return lane
+        return None
+
+    def _work(self):
+        while True:
+            with self._cond:
+                while True:
+                    lane = self._next_lane()
+                    if lane is not None:
+                        future, fn, args, kwargs = lane.queue.popleft()
+                        if future.set_running_or_notify_cancel():
+                            break
+                        lane.report()  # Cancelled while queued
+                        continue
+                    if self._shutdown:
+                        return
+                    self._cond.wait()
+
+                lane.running += 1
+                lane.report()
+
+            started = time.perf_counter()
+            try:
+                result = fn(*args, **kwargs)
+            except BaseException as e:
+                future.set_exception(e)
+            else:
+                future.set_result(result)
+            finally:
+                elapsed = time.perf_counter() - started
+                with self._cond:
+                    lane.running -= 1
+                    lane.avg_seconds = elapsed if lane.avg_seconds is None else (
+                        self.SMOOTHING * elapsed + (1 - self.SMOOTHING) * lane.avg_seconds
+                    )
+                    lane.report()
+                    # A lane held back by a running cap may be able to start now
+                    self._cond.notify_all()
+            del future, fn, args, kwargs
+
+    def stats(self) -> Dict:
+        with self._cond:
+            return {
+                "workers": self.workers,
+                "reserved_for_interactive": self.reserved,
+                "lanes": {
+                    lane.name: {
+                        "priority": lane.priority,
+                        "queued": len(lane.queue),
+                        "running": lane.running,
+                        "max_queued": lane.max_queued,
+                        "max_running": lane.max_running,
+                        "rejected": lane.rejected,
+                        "avg_seconds": round(lane.avg_seconds, 3) if lane.avg_seconds is not None else None
+                    }
+                    for lane in self._by_priority
+                }
+            }
+
+    def shutdown(self, wait: bool = True):
+        """Stop the threads once the queued work is done"""
+        with self._cond:
+            self._shutdown = True
+            self._cond.notify_all()
+        if wait:
+            for thread in self._threads:
+                thread.join()
+
+
+class AdmissionMiddleware:
+    """Refuse POSTs to busy endpoints before their request bodies are read
+
+    checks maps a URL path to a function returning an HTTPException to
+    answer with (a 503 or 429 with Retry-After), or None to let the request
+    through. The handler still submits as usual, so a lane that fills up
+    during the upload is caught there.
+    """
+
+    def __init__(self, app, checks: Dict[str, Callable[[], Optional[HTTPException]]]):
+        self.app = app
+        self.checks = checks
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] == "http" and scope["method"] == "POST" and scope["path"] in self.checks:
+            refusal = self.checks[scope["path"]]()
+            if refusal is not None:
+                response = JSONResponse({"detail": refusal.detail}, status_code=refusal.status_code,
+                                        headers=refusal.headers)
+                await response(scope, receive, send)
+                return
+        await self.app(scope, receive, send)
@@ -0,0 +1,159 @@
+"""
+Bulk image analysis for /analyze/batch
+
+A batch is either several image parts in one multipart upload, or a tar/zip
+archive of images uploaded as a single part (the way to send thousands -
+multipart uploads are capped at 1000 parts). Either way the items flow
+through a bounded pipeline:
+
+1. items are read in chunks of the model batch size (archive members one at
+   a time, never the whole archive into memory)
+2. each chunk is decoded and analyzed on the executor, one model forward
+   pass per chunk; at most `depth` chunks are in flight, so a huge archive
+   holds only depth * batch_size images at a time
+3. every item of a finished chunk becomes one NDJSON line straight away,
+   in completion order (each line carries the item's index)
+
+A bad item (not an image, too large, undecodable) becomes an error line for
+that item only; the rest of the batch carries on.
+"""
+import asyncio
+import tarfile
+import zipfile
+from concurrent.futures import Executor
+from typing import AsyncIterator, Callable, Dict, Iterator, List, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from response_format import dumps
+
+
+# (index, name, data or None, error or None)
+BatchItem = Tuple[int, str, Optional[bytes], Optional[str]]
+
+ARCHIVE_SUFFIXES = (".zip", ".tar", ".tar.gz", ".tgz", ".tar.bz2", ".tar.xz")
+
+
+def is_archive(filename: str, header: bytes) -> bool:
+    """Whether an uploaded part is a zip or (possibly compressed) tar archive"""
+    if header.startswith(b"PK\x03\x04") or header[257:262] == b"ustar":
+        return True
+    return (filename or "").lower().endswith(ARCHIVE_SUFFIXES)
+
+
+def _skipped(name: str) -> bool:
+    """Directory entries and OS metadata files (__MACOSX/, .DS_Store, ._*) aren't items"""
+    base = name.rstrip("/").rsplit("/", 1)[-1]
+    return name.endswith("/") or name.startswith("__MACOSX/") or base.startswith(".")
+
+
+def _archive_members(fileobj, max_item_bytes: int) -> Iterator[Tuple[str, Optional[bytes], Optional[str]]]:
+    """(name, data, error) for each file in a zip or tar archive, read one at a time"""
+    fileobj.seek(0)
+    if fileobj.read(4) == b"PK\x03\x04":
+        fileobj.seek(0)
+        with zipfile.ZipFile(fileobj) as archive:
+            for info in archive.infolist():
+                if info.is_dir() or _skipped(info.filename):
+                    continue
+                if info.file_size > max_item_bytes:
+                    yield info.filename, None, "File exceeds the image size limit"
+                    continue
+                yield info.filename, archive.read(info), None
+        return
+
+    fileobj.seek(0)
+    # Stream mode: members are read in order without seeking back
+    with tarfile.open(fileobj=fileobj, mode="r|*") as archive:
+        for member in archive:
+            if not member.isfile() or _skipped(member.name):
+                continue
+            if member.size > max_item_bytes:
+                yield member.name, None, "File exceeds the image size limit"
+                continue
+            yield member.name, archive.extractfile(member).read(), None
+
+
+def _part_items(upload, max_item_bytes: int) -> Iterator[Tuple[str, Optional[bytes], Optional[str]]]:
+    """(name, data, error) for each item of one uploaded part"""
+    upload.file.seek(0)
+    header = upload.file.read(512)
+
+    if not is_archive(upload.filename, header):
+        upload.file.seek(0, 2)
+        if upload.file.tell() > max_item_bytes:
+            yield upload.filename, None, "File exceeds the image size limit"
+        else:
+            upload.file.seek(0)
+            yield upload.filename, upload.file.read(), None
+        return
+
+    try:
+        yield from _archive_members(upload.file, max_item_bytes)
+    except (tarfile.TarError, zipfile.BadZipFile, EOFError, OSError) as e:
+        yield upload.filename or "archive", None, f"Could not read archive: {e}"
+
+
+def iter_items(files: List, max_item_bytes: int, max_items: int) -> Iterator[BatchItem]:
+    """Every item of a batch upload, numbered in upload order (blocking)
+
+    files are the request's UploadFiles. Archives are expanded in place; one
+    that turns out to be corrupt ends with an error item.
+    """
+    index = 0
+    for upload in files:
+        for name, data, error in _part_items(upload, max_item_bytes):
+            if index >= max_items:
+                yield index, name, None, f"Batch exceeds the {max_items} item limit"
+                return
+            yield index, name, data, error
+            index += 1
+
+
+async def run_pipeline(items: Iterator[BatchItem], analyze_chunk: Callable[[List[BatchItem]], List[Dict]],
+                       executor: Executor, batch_size: int, depth: int) -> AsyncIterator[str]:
+    """NDJSON lines for every item, analyzing up to depth chunks of batch_size at once
+
+    analyze_chunk runs on executor and returns one result dict per item of
+    its chunk. If it raises, each item of that chunk gets an error line.
+    A last line {"done": true, ...} sums up the batch.
+    """
+    loop = asyncio.get_event_loop()
+    in_flight = {}
+    exhausted = False
+    total = failed = 0
+
+    def next_chunk() -> List[BatchItem]:
+        chunk = []
+        for item in items:
+            chunk.append(item)
+            if len(chunk) >= batch_size:
+                break
+        return chunk
+
+    while in_flight or not exhausted:
+        # Top the pipeline up before waiting on it
+        while not exhausted and len(in_flight) < depth:
+            chunk = await run_in_threadpool(next_chunk)
+            if not chunk:
+                exhausted = True
+                break
+            in_flight[loop.run_in_executor(executor, analyze_chunk, chunk)] = chunk
+
+        if not in_flight:
+            break
+
+        done, _ = await asyncio.wait(in_flight, return_when=asyncio.FIRST_COMPLETED)
+        for future in done:
+            chunk = in_flight.pop(future)
+            try:
+                results = future.result()
+            except Exception as e:
+                results = [{"index": index, "filename": name, "error": f"Analysis failed: {e}"}
+                           for index, name, _, _ in chunk]
+            for result in results:
+                total += 1
+                failed += "error" in result
+                yield dumps(result) + "\n"
+
+    yield dumps({"done": True, "items": total, "failed": failed}) + "\n"
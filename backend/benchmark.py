@@ -0,0 +1,375 @@
+"""
+Offline benchmark suite for the detection pipeline
+
+Generates synthetic images and videos (several resolutions, lengths and
+codecs, always from the same seed) and times, in-process:
+
+- each DeepfakeAnalyzer detector on its own
+- analyze_image and analyze_video
+- the /analyze/image and /analyze/video endpoints through FastAPI's TestClient
+
+Every case reports p50/p95/p99 latency, throughput and its own peak RSS
+(with how much it grew over the RSS the case started at) as JSON. Compare against a stored run to catch regressions:
+
+    python benchmark.py --output baseline.json
+    python benchmark.py --baseline baseline.json   # exits 1 on a regression
+
+--model tiny (the default) builds a small randomly initialised ViT, so no
+network or model download is needed; --model none benchmarks the
+heuristics alone; anything else is a model name or path for ML_MODEL_NAME.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import sys
+import tempfile
+import time
+from typing import Callable, Dict, List, Optional
+
+import cv2
+import numpy as np
+
+
+SEED = 1234
+
+IMAGE_RESOLUTIONS = {"360p": (640, 360), "720p": (1280, 720), "1080p": (1920, 1080), "2160p": (3840, 2160)}
+
+# (name, resolution, seconds, fourcc, extension)
+VIDEOS = [
+    ("360p-2s-mp4v", "360p", 2, "mp4v", ".mp4"),
+    ("720p-2s-mp4v", "720p", 2, "mp4v", ".mp4"),
+    ("1080p-2s-mp4v", "1080p", 2, "mp4v", ".mp4"),
+    ("720p-10s-mp4v", "720p", 10, "mp4v", ".mp4"),
+    ("720p-2s-mjpg", "720p", 2, "MJPG", ".avi"),
+    ("720p-2s-vp8", "720p", 2, "VP80", ".webm"),
+    ("720p-2s-h264", "720p", 2, "avc1", ".mp4"),
+]
+QUICK_VIDEOS = {"360p-2s-mp4v", "720p-2s-mp4v"}
+
+VIDEO_FPS = 25
+VIDEO_SAMPLE_RATE = 30
+
+DETECTORS = ["frequency_analysis", "facial_consistency", "compression_artifacts", "color_analysis"]
+
+
+def synthetic_frame(width: int, height: int, t: float, rng: np.random.Generator) -> np.ndarray:
+    """Smooth textured background with a moving face-like shape"""
+    y, x = np.mgrid[0:height, 0:width].astype(np.float32)
+    background = np.stack([
+        127 + 60 * np.sin(x / width * 6 + t),
+        127 + 60 * np.cos(y / height * 5 - t),
+        127 + 60 * np.sin((x + y) / (width + height) * 4 + t * 0.5),
+    ], axis=-1)
+    texture = cv2.GaussianBlur(rng.normal(0, 12, (height, width, 3)).astype(np.float32), (0, 0), 2)
+    frame = np.clip(background + texture, 0, 255).astype(np.uint8)
+
+    # Skin-toned face with eyes and a mouth, drifting across the frame
+    cx = int(width * (0.4 + 0.2 * np.sin(t)))
+    cy = int(height * 0.5)
+    axes = (int(height * 0.16), int(height * 0.22))
+    cv2.ellipse(frame, (cx, cy), axes, 0, 0, 360, (150, 180, 225), -1)
+    for dx in (-1, 1):
+        cv2.circle(frame, (cx + dx * axes[0] // 2, cy - axes[1] // 4), max(axes[0] // 8, 2), (40, 40, 40), -1)
+    cv2.ellipse(frame, (cx, cy + axes[1] // 2), (axes[0] // 3, max(axes[1] // 10, 1)), 0, 0, 180, (60, 60, 150), -1)
+    return frame
+
+
+def generate_media(directory: str, quick: bool) -> Dict:
+    """Write the synthetic images and videos, returning {"images": {...}, "videos": {...}}"""
+    rng = np.random.default_rng(SEED)
+    media = {"images": {}, "videos": {}}
+
+    for name, (width, height) in IMAGE_RESOLUTIONS.items():
+        if quick and name in ("1080p", "2160p"):
+            continue
+        media["images"][name] = synthetic_frame(width, height, 0.0, rng)
+
+    for name, resolution, seconds, fourcc, extension in VIDEOS:
+        if quick and name not in QUICK_VIDEOS:
+            continue
+        width, height = IMAGE_RESOLUTIONS[resolution]
+        path = os.path.join(directory, name + extension)
+        writer = cv2.VideoWriter(path, cv2.VideoWriter_fourcc(*fourcc), VIDEO_FPS, (width, height))
+        if not writer.isOpened():
+            print(f"⚠️  Skipping {name}: this OpenCV build can't encode {fourcc}")
+            continue
+        for i in range(seconds * VIDEO_FPS):
+            writer.write(synthetic_frame(width, height, i / VIDEO_FPS, rng))
+        writer.release()
+        media["videos"][name] = path
+
+    return media
+
+
+def build_tiny_model(directory: str) -> str:
+    """Save a small randomly initialised ViT classifier and return its path"""
+    import torch
+    from transformers import ViTConfig, ViTForImageClassification, ViTImageProcessor
+
+    torch.manual_seed(SEED)
+    config = ViTConfig(
+        image_size=224, patch_size=32, hidden_size=64, num_hidden_layers=2,
+        num_attention_heads=2, intermediate_size=128, num_labels=2,
+        id2label={0: "Fake", 1: "Real"}, label2id={"Fake": 0, "Real": 1}
+    )
+    path = os.path.join(directory, "tiny-vit")
+    ViTForImageClassification(config).eval().save_pretrained(path)
+    ViTImageProcessor().save_pretrained(path)
+    return path
+
+
+def peak_rss_mb() -> float:
+    """High-water resident set size of this process so far (or since reset_peak_rss)"""
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
+
+
+def proc_status_mb(field: str) -> Optional[float]:
+    """A memory field of /proc/self/status (VmRSS, VmHWM) in MB, None off Linux"""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith(field + ":"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        pass
+    return None
+
+
+def reset_peak_rss() -> bool:
+    """Restart the high-water mark at the current RSS (Linux), so a case's peak is its own"""
+    try:
+        with open("/proc/self/clear_refs", "w") as f:
+            f.write("5")
+        return True
+    except OSError:
+        return False
+
+
+def measure(fn: Callable[[], object], iterations: int, warmup: int = 1) -> Dict:
+    """Time fn; an int it returns counts as that many items (e.g. frames) for the throughput
+
+    ru_maxrss only ever grows, so without a reset every case would report the
+    largest case run before it. Where the high-water mark can't be reset
+    (macOS), peak_rss_mb and rss_growth_mb are None.
+    """
+    rss_before = proc_status_mb("VmRSS")
+    own_peak = rss_before is not None and reset_peak_rss()
+
+    for _ in range(warmup):
+        fn()
+
+    latencies = []
+    items = 0
+    started = time.perf_counter()
+    for _ in range(iterations):
+        t = time.perf_counter()
+        processed = fn()
+        latencies.append((time.perf_counter() - t) * 1000)
+        items += processed if isinstance(processed, int) else 1
+    elapsed = time.perf_counter() - started
+
+    p50, p95, p99 = np.percentile(latencies, [50, 95, 99])
+    peak = proc_status_mb("VmHWM") if own_peak else None
+    return {
+        "iterations": iterations,
+        "mean_ms": round(float(np.mean(latencies)), 3),
+        "p50_ms": round(float(p50), 3),
+        "p95_ms": round(float(p95), 3),
+        "p99_ms": round(float(p99), 3),
+        "throughput_per_s": round(items / elapsed, 3) if elapsed > 0 else None,
+        "peak_rss_mb": peak,
+        "rss_growth_mb": round(peak - rss_before, 1) if peak is not None else None
+    }
+
+
+def run_benchmarks(main, media: Dict, iterations: int, video_iterations: int, endpoints: bool) -> Dict:
+    """Time every case, returning {case name: stats}"""
+    from deepfake_analyzer import ANALYSIS_MAX_DIM
+    from frame_context import FrameBuffers, FrameContext
+
+    analyzer = main.analyzer
+    results = {}
+
+    def record(name: str, stats: Dict):
+        results[name] = stats
+        print(f"   {name:<40} p50 {stats['p50_ms']:>9.2f} ms   p95 {stats['p95_ms']:>9.2f} ms   "
+              f"{stats['throughput_per_s']:>8.2f}/s   RSS {stats['peak_rss_mb']} MB (+{stats['rss_growth_mb']})")
+
+    print("⏱  Detectors")
+    for resolution, image in media["images"].items():
+        buffers = FrameBuffers()
+        for detector in DETECTORS:
+            method = getattr(analyzer, f"_{detector}")
+            # A fresh context per call, so each detector pays for the conversions it needs
+            record(f"detector/{detector}/{resolution}",
+                   measure(lambda: method(FrameContext(image, buffers, analysis_max_dim=ANALYSIS_MAX_DIM)), iterations))
+        if analyzer.ml_available:
+            record(f"detector/ml_model/{resolution}", measure(lambda: analyzer._ml_detection(image), iterations))
+
+    print("⏱  analyze_image")
+    for resolution, image in media["images"].items():
+        record(f"analyze_image/{resolution}", measure(lambda: analyzer.analyze_image(image), iterations))
+
+    print("⏱  analyze_video")
+    for name, path in media["videos"].items():
+        def run_video():
+            return analyzer.analyze_video(path, VIDEO_SAMPLE_RATE)["video_info"]["frames_analyzed"]
+        stats = measure(run_video, video_iterations)
+        stats["throughput_unit"] = "frames"
+        record(f"analyze_video/{name}", stats)
+
+    if endpoints:
+        try:
+            from fastapi.testclient import TestClient
+        except (ImportError, RuntimeError) as e:
+            print(f"⚠️  Skipping endpoint benchmarks ({e}); install httpx to enable them")
+            return results
+
+        print("⏱  Endpoints")
+        with TestClient(main.app) as client:
+            for resolution, image in media["images"].items():
+                payload = cv2.imencode(".jpg", image)[1].tobytes()
+
+                def post_image():
+                    response = client.post("/analyze/image", files={"file": ("bench.jpg", payload, "image/jpeg")})
+                    response.raise_for_status()
+                record(f"endpoint/analyze_image/{resolution}", measure(post_image, iterations))
+
+            for name, path in media["videos"].items():
+                with open(path, "rb") as f:
+                    video = f.read()
+
+                def post_video():
+                    response = client.post(
+                        "/analyze/video", params={"sample_rate": VIDEO_SAMPLE_RATE},
+                        files={"file": (os.path.basename(path), video, "video/" + path.rsplit(".", 1)[-1])}
+                    )
+                    response.raise_for_status()
+                record(f"endpoint/analyze_video/{name}", measure(post_video, video_iterations))
+
+    return results
+
+
+def compare(results: Dict, baseline: Dict, tolerance: float, min_delta_ms: float = 0.5) -> List[Dict]:
+    """Cases whose p50 or p95 got slower than the baseline by more than tolerance
+
+    Slowdowns under min_delta_ms are ignored - sub-millisecond cases jitter
+    by more than any sensible tolerance.
+    """
+    regressions = []
+    for name, stats in results.items():
+        reference = baseline.get("results", {}).get(name)
+        if reference is None:
+            continue
+        for metric in ("p50_ms", "p95_ms"):
+            slower = stats[metric] - reference[metric]
+            if reference[metric] > 0 and slower > reference[metric] * tolerance and slower > min_delta_ms:
+                regressions.append({
+                    "case": name,
+                    "metric": metric,
+                    "baseline": reference[metric],
+                    "current": stats[metric],
+                    "change_pct": round((stats[metric] / reference[metric] - 1) * 100, 1)
+                })
+    return regressions
+
+
+def environment_info(model: str) -> Dict:
+    info = {
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpu_count": os.cpu_count(),
+        "opencv": cv2.__version__,
+        "numpy": np.__version__,
+        "model": model
+    }
+    try:
+        import torch
+        info["torch"] = torch.__version__
+        info["torch_threads"] = torch.get_num_threads()
+    except ImportError:
+        pass
+    return info
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the detection pipeline offline")
+    parser.add_argument("--model", default="tiny", help="'tiny' (random ViT), 'none' (heuristics only) or a model name/path")
+    parser.add_argument("--quick", action="store_true", help="Fewer resolutions and videos")
+    parser.add_argument("--iterations", type=int, default=20, help="Timed runs per image/detector case")
+    parser.add_argument("--video-iterations", type=int, default=3, help="Timed runs per video case")
+    parser.add_argument("--no-endpoints", action="store_true", help="Skip the in-process FastAPI endpoint cases")
+    parser.add_argument("--keep", action="store_true", help="Keep the generated media and model instead of deleting them")
+    parser.add_argument("--output", help="Write the results JSON here (use it later as --baseline)")
+    parser.add_argument("--baseline", help="Results JSON from an earlier run to compare against")
+    parser.add_argument("--tolerance", type=float, default=0.15, help="Allowed slowdown before a case counts as a regression")
+    parser.add_argument("--min-delta-ms", type=float, default=0.5, help="Ignore slowdowns smaller than this")
+    args = parser.parse_args()
+
+    workdir = tempfile.mkdtemp(prefix="truthlens-bench-")
+    try:
+        # main reads its configuration at import time, so set it up first
+        os.environ["HF_HUB_OFFLINE"] = os.environ.get("HF_HUB_OFFLINE", "1" if args.model in ("tiny", "none") else "0")
+        os.environ["RESULT_CACHE_ENABLED"] = "false"  # Every run has to do the work
+        if args.model == "tiny":
+            os.environ["ML_MODEL_NAME"] = build_tiny_model(workdir)
+        elif args.model != "none":
+            os.environ["ML_MODEL_NAME"] = args.model
+
+        sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+        import main
+
+        if args.model == "none":
+            main.ml_model_cache.update(loaded=True, available=False)
+        else:
+            main.load_ml_model()
+
+        print(f"🎞  Generating synthetic media in {workdir}")
+        media = generate_media(workdir, args.quick)
+
+        # Taken before the cases reset the high-water mark
+        startup_peak_rss = peak_rss_mb()
+        results = run_benchmarks(main, media, args.iterations, args.video_iterations, not args.no_endpoints)
+        report = {
+            "environment": environment_info(args.model),
+            "config": {
+                "quick": args.quick,
+                "iterations": args.iterations,
+                "video_iterations": args.video_iterations,
+                "video_sample_rate": VIDEO_SAMPLE_RATE,
+                "seed": SEED
+            },
+            "peak_rss_mb": max([startup_peak_rss, peak_rss_mb()] +
+                               [stats["peak_rss_mb"] for stats in results.values() if stats["peak_rss_mb"] is not None]),
+            "results": results
+        }
+
+        if args.output:
+            with open(args.output, "w") as f:
+                json.dump(report, f, indent=2)
+            print(f"💾 Results written to {args.output}")
+        else:
+            print(json.dumps(report, indent=2))
+
+        if args.baseline:
+            with open(args.baseline) as f:
+                baseline = json.load(f)
+            if baseline.get("environment", {}).get("model") != args.model or baseline.get("config") != report["config"]:
+                print("⚠️  Baseline was recorded with a different model or settings; comparisons may not be meaningful")
+            regressions = compare(results, baseline, args.tolerance, args.min_delta_ms)
+            if regressions:
+                print(f"❌ {len(regressions)} regression(s) beyond {args.tolerance:.0%}:")
+                for r in regressions:
+                    print(f"   {r['case']} {r['metric']}: {r['baseline']} → {r['current']} ms (+{r['change_pct']}%)")
+                sys.exit(1)
+            print(f"✓  No regressions beyond {args.tolerance:.0%} against {args.baseline}")
+    finally:
+        if args.keep:
+            print(f"📁 Synthetic media and model kept in {workdir}")
+        else:
+            shutil.rmtree(workdir, ignore_errors=True)
@@ -0,0 +1,183 @@
+"""
+CPU thread budget for every layer of the analysis stack
+
+Torch's intra-op pool, OpenCV's internal threads, the BLAS library behind
+NumPy and the analysis threads each used to size themselves from the
+machine's core count, independently of each other and of the container's
+CPU limit. Four analysis threads each running a 16-thread OpenCV call in a
+2-CPU container mostly measured context switches.
+
+plan_budget() shares out the CPUs this process may really use - its
+affinity mask, capped by the cgroup CPU quota - as follows:
+
+- the CPUs are split evenly between the server processes (the uvicorn
+  workers run.py started, plus the model server when there is one)
+- analysis threads: one per CPU of the process's share (at least 2, so one
+  can stay reserved for images)
+- OpenCV and BLAS: the share divided by the analysis threads, since that
+  many analyses call into them at once
+- torch: the whole share when micro-batching runs one forward pass at a
+  time, otherwise divided like OpenCV
+- process backend: the share split between the pool workers, which run one
+  task at a time with OpenCV single-threaded
+
+Any layer can be fixed with its own setting instead. BLAS reads its thread
+count when NumPy is first imported, so run.py exports blas_env() before
+the app loads; the rest is applied at runtime by apply_budget().
+
+`python cpu_budget.py` prints the plan for the current environment.
+"""
+import math
+import os
+from typing import Dict, List, Optional
+
+BLAS_ENV_VARS = ("OMP_NUM_THREADS", "OPENBLAS_NUM_THREADS", "MKL_NUM_THREADS")
+
+# Set by run.py to the number of uvicorn workers it launched
+WORKER_PROCESSES_VAR = "TRUTHLENS_WORKER_PROCESSES"
+
+
+def cgroup_cpu_limit() -> Optional[float]:
+    """CPUs allowed by the cgroup quota (v2 cpu.max or v1 cfs_quota), None if unlimited"""
+    try:
+        with open("/sys/fs/cgroup/cpu.max") as f:
+            quota, period = f.read().split()
+        if quota != "max":
+            return int(quota) / int(period)
+        return None
+    except (OSError, ValueError):
+        pass
+
+    for base in ("/sys/fs/cgroup/cpu", "/sys/fs/cgroup/cpu,cpuacct"):
+        try:
+            with open(f"{base}/cpu.cfs_quota_us") as f:
+                quota = int(f.read())
+            with open(f"{base}/cpu.cfs_period_us") as f:
+                period = int(f.read())
+        except (OSError, ValueError):
+            continue
+        return quota / period if quota > 0 and period > 0 else None
+    return None
+
+
+def usable_cores() -> List[int]:
+    """Cores this process may run on"""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def detect_cpus(limit: float = 0) -> Dict:
+    """Usable CPU count, from an explicit limit or the affinity mask and cgroup quota"""
+    cores = len(usable_cores())
+    quota = cgroup_cpu_limit()
+    if limit > 0:
+        cpus, source = limit, "CPU_LIMIT"
+    elif quota is not None and quota < cores:
+        cpus, source = quota, "cgroup quota"
+    else:
+        cpus, source = cores, "affinity"
+    return {
+        # A 1.5 CPU quota still runs two threads at once part of the time
+        "cpus": max(1, math.ceil(cpus)),
+        "source": source,
+        "cores": cores,
+        "cgroup_quota": round(quota, 2) if quota is not None else None
+    }
+
+
+def plan_budget(cpus: int, processes: int = 1, analysis_threads: int = 0, torch_threads: int = 0,
+                opencv_threads: int = 0, blas_threads: int = 0, pool_workers: int = 0,
+                process_backend: bool = False, microbatch: bool = True) -> Dict:
+    """Thread counts for each layer of one server process (0 = derive from the CPUs)"""
+    share = max(1, cpus // max(1, processes))
+    analysis = analysis_threads or max(2, share)
+    per_analysis = max(1, share // analysis)
+
+    budget = {
+        "cpus": cpus,
+        "processes": processes,
+        "cpus_per_process": share,
+        "analysis_threads": analysis,
+        "opencv_threads": opencv_threads or per_analysis,
+        "blas_threads": blas_threads or per_analysis,
+        "torch_threads": torch_threads or (share if microbatch else per_analysis),
+        "pool_workers": 0,
+        "pool_worker_threads": 0
+    }
+    if process_backend:
+        workers = pool_workers or share
+        budget["pool_workers"] = workers
+        budget["pool_worker_threads"] = max(1, share // workers)
+    return budget
+
+
+def blas_env(budget: Dict) -> Dict[str, str]:
+    """Environment for BLAS/OpenMP thread counts (only effective before NumPy is imported)"""
+    return {name: str(budget["blas_threads"]) for name in BLAS_ENV_VARS}
+
+
+def apply_budget(budget: Dict, torch_module=None):
+    """Set OpenCV's thread count, and torch's when its module is given"""
+    import cv2
+    cv2.setNumThreads(budget["opencv_threads"])
+    if torch_module is not None:
+        torch_module.set_num_threads(budget["torch_threads"])
+
+
+def core_sets(cores: List[int], groups: int) -> List[List[int]]:
+    """Split cores into `groups` disjoint, contiguous sets (sharing cores if there are too few)"""
+    groups = max(1, groups)
+    if len(cores) < groups:
+        return [[cores[i % len(cores)]] for i in range(groups)]
+    size = len(cores) // groups
+    return [cores[i * size:(i + 1) * size] for i in range(groups)]
+
+
+def pin_to(cores: List[int]):
+    """Restrict the calling process to cores (no-op where affinity isn't supported)"""
+    if hasattr(os, "sched_setaffinity") and cores:
+        os.sched_setaffinity(0, cores)
+
+
+def effective_threads() -> Dict:
+    """Thread counts the libraries actually report (torch only when already imported)"""
+    import sys
+    import cv2
+
+    threads = {
+        "opencv": cv2.getNumThreads(),
+        "blas_env": {name: os.environ.get(name) for name in BLAS_ENV_VARS}
+    }
+    if "torch" in sys.modules:
+        threads["torch"] = sys.modules["torch"].get_num_threads()
+    return threads
+
+
+def budget_from_env(env=os.environ) -> Dict:
+    """Detected CPUs and the budget for one server process, from the app's settings"""
+    detected = detect_cpus(float(env.get("CPU_LIMIT", "0")))
+    # Only run.py knows how many workers it really started: WORKERS is ignored when the
+    # app runs as a single `uvicorn main:app` process. The model server is one more.
+    processes = int(env.get(WORKER_PROCESSES_VAR, "1")) + bool(env.get("MODEL_SERVER_SOCKET"))
+    budget = plan_budget(
+        detected["cpus"], processes,
+        analysis_threads=int(env.get("ANALYSIS_THREADS", "0")),
+        torch_threads=int(env.get("TORCH_THREADS", "0")),
+        opencv_threads=int(env.get("OPENCV_THREADS", "0")),
+        blas_threads=int(env.get("BLAS_THREADS", "0")),
+        pool_workers=int(env.get("PROCESS_POOL_WORKERS", "0")),
+        process_backend=env.get("ANALYSIS_BACKEND", "thread") == "process",
+        microbatch=env.get("ML_MICROBATCH", "true").lower() == "true"
+    )
+    budget["pinning"] = env.get("CPU_PINNING", "false").lower() == "true"
+    budget["detected"] = detected
+    return budget
+
+
+if __name__ == "__main__":
+    import json
+    from dotenv import load_dotenv
+
+    load_dotenv()
+    print(json.dumps(budget_from_env(), indent=2))
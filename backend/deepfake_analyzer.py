@@ -0,0 +1,850 @@
+"""
+Deepfake analysis: the detectors, the ML model and the video sampling loop
+
+Everything an analysis needs and nothing the web app adds on top - no
+executors, job queue, result cache or middleware - so process pool workers
+and tools can import it without starting any of that. main.py serves the
+`analyzer` defined here.
+"""
+import cv2
+import numpy as np
+from typing import Callable, Dict, List, Optional
+import os
+from PIL import Image
+import threading
+from collections import deque
+from bisect import bisect_right
+import logging
+from dotenv import load_dotenv
+from frame_source import FrameSource, is_remote
+from adaptive_sampling import SEEK_GAP, AdaptiveSampler
+from frame_dedup import SCAN_FACTOR, DuplicateIndex, select_frames, signature
+from face_detection import FaceTracker
+from frame_context import FrameBuffers, FrameContext, parse_levels
+from model_server import ModelClient
+from metrics import DETECTOR_SECONDS, FRAMES_ANALYZED, MODEL_BATCH_SIZE, timed_frames
+
+load_dotenv()
+
+# Analysis configuration from environment
+ML_MODEL_NAME = os.getenv('ML_MODEL_NAME', 'dima806/deepfake_vs_real_image_detection')
+ML_DEVICE = os.getenv('ML_DEVICE', 'auto')
+ML_MODEL_DIR = os.getenv('ML_MODEL_DIR', 'models/snapshot')  # Local snapshot written by prepare_model.py
+ML_BACKEND = os.getenv('ML_BACKEND', 'torch')  # torch, int8, bf16, compile, onnx, onnx-int8
+ML_ONNX_DIR = os.getenv('ML_ONNX_DIR', 'models/onnx')
+MODEL_SERVER_SOCKET = os.getenv('MODEL_SERVER_SOCKET') or ''  # Empty = each worker loads its own model
+ML_FAST_PREPROCESS = os.getenv('ML_FAST_PREPROCESS', 'true').lower() == 'true'
+ML_BATCH_SIZE = max(1, int(os.getenv('ML_BATCH_SIZE', '8')))
+KEYFRAME_SAMPLING = os.getenv('KEYFRAME_SAMPLING', 'false').lower() == 'true'
+ADAPTIVE_SAMPLING = os.getenv('ADAPTIVE_SAMPLING', 'false').lower() == 'true'
+ADAPTIVE_ERROR_TOLERANCE = float(os.getenv('ADAPTIVE_ERROR_TOLERANCE', '0.05'))
+ADAPTIVE_MIN_FRAMES = int(os.getenv('ADAPTIVE_MIN_FRAMES', '8'))
+FRAME_DEDUP = os.getenv('FRAME_DEDUP', 'true').lower() == 'true'
+FRAME_DEDUP_THRESHOLD = float(os.getenv('FRAME_DEDUP_THRESHOLD', '1.0'))  # Mean gray-level difference of a duplicate
+SHOT_AWARE_SAMPLING = os.getenv('SHOT_AWARE_SAMPLING', 'false').lower() == 'true'
+SHOT_CUT_THRESHOLD = float(os.getenv('SHOT_CUT_THRESHOLD', '30'))  # Mean gray-level jump that marks a cut
+ANALYSIS_MAX_DIM = int(os.getenv('ANALYSIS_MAX_DIM', '1920'))  # Longest side the heuristics work at (0 = native)
+# Pyramid level per detector: 0 = ANALYSIS_MAX_DIM, 1 = half of that, ..., 'native' = as decoded
+DETECTOR_LEVELS = parse_levels(os.getenv('DETECTOR_LEVELS', 'compression_artifacts=native'))
+FACE_DETECT_MAX_DIM = int(os.getenv('FACE_DETECT_MAX_DIM', '640'))
+FACE_REDETECT_INTERVAL = int(os.getenv('FACE_REDETECT_INTERVAL', '5'))
+
+logger = logging.getLogger(__name__)
+
+# Global ML model cache
+ml_model_cache = {
+    "model": None,
+    "processor": None,
+    "device": None,
+    "backend": None,
+    "preprocessor": None,
+    "loaded": False,
+    "available": False
+}
+ml_model_lock = threading.Lock()
+
+def load_ml_model(torch_threads: int = 0):
+    """Load the ML model on first use (lazy loading); concurrent callers wait for one load
+
+    torch_threads sizes torch's intra-op pool when the model is loaded in
+    this process (0 = torch's default).
+    """
+    if not ml_model_cache["loaded"]:
+        with ml_model_lock:
+            if not ml_model_cache["loaded"]:
+                if MODEL_SERVER_SOCKET:
+                    ml_model_cache["available"] = connect_model_server()
+                else:
+                    ml_model_cache["available"] = load_local_model(torch_threads)
+                if ml_model_cache["available"] and ML_FAST_PREPROCESS:
+                    from preprocessing import FramePreprocessor
+                    ml_model_cache["preprocessor"] = FramePreprocessor.from_processor(
+                        ml_model_cache["processor"], ml_model_cache["device"]
+                    )
+                ml_model_cache["loaded"] = True
+    return ml_model_cache["available"]
+
+
+def load_local_model(torch_threads: int = 0):
+    """Load the model into this process"""
+    try:
+        logger.info("Loading AI model, this may take a minute on first run")
+        
+        # torch and transformers take seconds to import - only pay for them here
+        import torch
+        from inference_backends import create_backend, load_pretrained
+        if torch_threads:
+            torch.set_num_threads(torch_threads)
+        
+        # Determine device from config or auto-detect
+        if ML_DEVICE == 'auto':
+            device = "cuda" if torch.cuda.is_available() else "cpu"
+        else:
+            device = ML_DEVICE
+        
+        ml_model_cache["device"] = device
+        
+        # Load pre-trained deepfake detection model from config
+        model_name = ML_MODEL_NAME
+        
+        logger.info("Loading model", extra={"model": model_name, "device": device})
+        processor, model = load_pretrained(model_name, ML_MODEL_DIR)
+        ml_model_cache["processor"] = processor
+        ml_model_cache["model"] = model
+        ml_model_cache["model"].to(device)
+        ml_model_cache["model"].eval()
+        
+        ml_model_cache["backend"] = create_backend(
+            ML_BACKEND, ml_model_cache["model"], ml_model_cache["processor"],
+            device, model_name, ML_ONNX_DIR
+        )
+        logger.info("AI model loaded", extra={"model": model_name, "ml_backend": ml_model_cache["backend"].name})
+        return True
+    except Exception as e:
+        logger.warning("Could not load ML model, falling back to heuristic methods only", extra={"error": str(e)})
+        return False
+
+
+def connect_model_server():
+    """Use the shared model server instead of loading the model in this process"""
+    try:
+        logger.info("Connecting to model server", extra={"address": MODEL_SERVER_SOCKET})
+        from inference_backends import load_pretrained
+        
+        # Only the image processor is loaded here; the weights stay in the server
+        ml_model_cache["processor"], _ = load_pretrained(ML_MODEL_NAME, ML_MODEL_DIR, processor_only=True)
+        ml_model_cache["device"] = "cpu"
+        ml_model_cache["backend"] = ModelClient(MODEL_SERVER_SOCKET)
+        logger.info("Model server connected", extra={"ml_backend": ml_model_cache["backend"].name})
+        return True
+    except Exception as e:
+        logger.warning("Could not reach model server, falling back to heuristic methods only", extra={"error": str(e)})
+        return False
+
+
+class DeepfakeAnalyzer:
+    """Multi-method deepfake detection analyzer"""
+    
+    def __init__(self):
+        self.methods_weights = {
+            "ml_model": 0.45,                    # AI/ML detection (highest weight)
+            "frequency_analysis": 0.20,
+            "facial_consistency": 0.15,
+            "compression_artifacts": 0.12,
+            "color_analysis": 0.08
+        }
+        # Note: temporal_coherence is analyzed separately for videos at the frame-to-frame level
+        
+        # Set to a ProcessAnalysisPool to analyze video frames in worker processes
+        self.process_pool = None
+        
+        # Set to an InferenceScheduler to batch ML requests across concurrent callers
+        self.inference_scheduler = None
+    
+    @property
+    def ml_available(self) -> bool:
+        """Whether the ML model loaded (loads it on first access)"""
+        return load_ml_model()
+    
+    def analyze_image(self, image: np.ndarray) -> Dict:
+        """Analyze a single image for deepfake indicators"""
+        return self.analyze_images([image])[0]
+    
+    def analyze_images(self, images: List[np.ndarray], face_tracker: Optional[FaceTracker] = None,
+                       buffers: Optional[FrameBuffers] = None) -> List[Dict]:
+        """Analyze several images, running the ML model once per batch
+        
+        Pass a FaceTracker when the images are consecutive video frames so
+        faces are followed between periodic detections, and the same
+        FrameBuffers for every batch of a video to reuse conversion memory.
+        """
+        buffers = buffers or FrameBuffers()
+        ml_results = [None] * len(images)
+        
+        # ML Model Detection (if available) - one forward pass per chunk
+        if self.ml_available:
+            if self.inference_scheduler is not None:
+                # Shares forward passes with whatever other requests are in flight
+                futures = [self.inference_scheduler.submit(image) for image in images]
+                ml_results = [future.result() for future in futures]
+            else:
+                ml_results = self._ml_detection_batch(images)
+        
+        return [
+            self._analyze_heuristics(image, ml_result, face_tracker, buffers)
+            for image, ml_result in zip(images, ml_results)
+        ]
+    
+    def _analyze_heuristics(self, image: np.ndarray, ml_result: Optional[Dict] = None,
+                            face_tracker: Optional[FaceTracker] = None,
+                            buffers: Optional[FrameBuffers] = None) -> Dict:
+        """Run the heuristic detectors on one image, alongside a precomputed ML result"""
+        results = {}
+        
+        try:
+            if ml_result is not None:
+                results["ml_model"] = ml_result
+            
+            # Gray/YCrCb/LAB and face boxes are computed once and shared by the detectors
+            frame = FrameContext(image, buffers, face_tracker, FACE_DETECT_MAX_DIM, ANALYSIS_MAX_DIM)
+            
+            for name, detector in (
+                ("frequency_analysis", self._frequency_analysis),
+                ("facial_consistency", self._facial_consistency),
+                ("compression_artifacts", self._compression_artifacts),
+                ("color_analysis", self._color_analysis)
+            ):
+                with DETECTOR_SECONDS.labels(name).time():
+                    results[name] = detector(frame)
+        except Exception:
+            logger.exception("Analysis error")
+            
+        return results
+    
+    def analyze_video(self, video_path: str, sample_rate: int = 30, batch_size: Optional[int] = None,
+                      keyframes_only: Optional[bool] = None,
+                      progress_callback: Optional[Callable[[Dict], None]] = None,
+                      adaptive: Optional[Dict] = None) -> Dict:
+        """Analyze video for deepfake indicators
+        
+        progress_callback, if given, is called after every analyzed frame with
+        the running progress and partial score. Exceptions it raises (e.g. to
+        cancel a job) stop the analysis.
+        
+        adaptive ({"error_tolerance", "max_frames"}, see adaptive_options)
+        analyzes the video in rounds and stops as soon as the verdict is
+        settled, instead of analyzing all sample_rate frames.
+        
+        With FRAME_DEDUP, frames nearly identical to one already analyzed
+        reuse its detector results (marked with "reused_from"). With
+        SHOT_AWARE_SAMPLING, the frames to analyze are spread over the
+        video's shots instead of evenly over time.
+        """
+        if keyframes_only is None:
+            keyframes_only = KEYFRAME_SAMPLING
+        
+        # Over the network, seeking past long gaps also saves fetching them
+        remote = is_remote(video_path)
+        jumps = adaptive or SHOT_AWARE_SAMPLING or remote
+        source = FrameSource(video_path, keyframes_only=keyframes_only, seek_gap=SEEK_GAP if jumps else 0)
+        
+        total_frames = source.total_frames
+        fps = source.fps
+        duration = total_frames / fps if fps > 0 else 0
+        
+        logger.info("Analyzing video", extra={
+            "total_frames": total_frames, "fps": fps, "duration_seconds": round(duration, 1),
+            "ml_available": self.ml_available
+        })
+        
+        frame_results = []
+        suspicious_frames = []
+        ml_detections = 0
+        batch_size = batch_size or ML_BATCH_SIZE
+        
+        # Only re-run the face cascade every few sampled frames
+        face_tracker = FaceTracker(FACE_REDETECT_INTERVAL, FACE_DETECT_MAX_DIM)
+        # Every frame of the video has the same shape, so conversions reuse one set of arrays
+        buffers = FrameBuffers()
+        
+        # Adaptive mode: frames of the even plan, which alone feed the video score
+        sampler = None
+        plan_frames = set()
+        
+        # Near-duplicate frames wait for the analysis of the frame they repeat
+        duplicates = DuplicateIndex(FRAME_DEDUP_THRESHOLD) if FRAME_DEDUP else None
+        frame_signatures = {}
+        analyses_by_frame = {}
+        reused = []
+        
+        def record_frame(idx: int, frame_analysis: Dict, reused_from: Optional[int] = None):
+            nonlocal ml_detections
+            
+            FRAMES_ANALYZED.labels("analyzed" if reused_from is None else "reused").inc()
+            
+            # Track if ML ran
+            if reused_from is None and "ml_model" in frame_analysis and frame_analysis["ml_model"]["score"] > 0:
+                ml_detections += 1
+            
+            frame_score = self._calculate_frame_score(frame_analysis)
+            
+            if sampler is not None:
+                # Keyframe snapping may move a frame forward; score it as the frame we asked for
+                requested = round_targets[max(bisect_right(round_targets, idx) - 1, 0)]
+                sampler.record(requested, frame_score)
+                if sampler.in_plan(requested):
+                    plan_frames.add(int(idx))
+            
+            timestamp = idx / fps if fps > 0 else 0
+            
+            frame_result = {
+                "frame_number": int(idx),
+                "timestamp": round(float(timestamp), 2),
+                "score": float(frame_score),
+                "details": frame_analysis
+            }
+            if reused_from is not None:
+                frame_result["reused_from"] = int(reused_from)
+            frame_results.append(frame_result)
+            
+            # Mark suspicious frames (score > 0.6)
+            if frame_score > 0.6:
+                suspicious_frames.append({
+                    "frame": int(idx),
+                    "timestamp": round(float(timestamp), 2),
+                    "confidence": float(frame_score)
+                })
+            
+            if progress_callback is not None:
+                frames_done = len(frame_results)
+                progress_callback({
+                    "stage": "analyzing",
+                    "frames_done": frames_done,
+                    "frames_total": frames_total,
+                    "percent": round(100.0 * frames_done / frames_total, 1) if frames_total else 100.0,
+                    "frame_number": int(idx),
+                    "timestamp": round(float(timestamp), 2),
+                    "frame_score": round(float(frame_score), 3),
+                    "running_score": round(float(np.mean([f["score"] for f in frame_results])), 3)
+                })
+        
+        def record_batch(batch: List[tuple], analyses: List[Dict]):
+            for (idx, _), frame_analysis in zip(batch, analyses):
+                analyses_by_frame[idx] = frame_analysis
+                record_frame(idx, frame_analysis)
+        
+        def shot_plan(budget: int) -> Optional[List[int]]:
+            """Frames to analyze spread over shots, from a scan of SCAN_FACTOR times as many candidates"""
+            if not SHOT_AWARE_SAMPLING or total_frames <= 0:
+                return None
+            candidates = np.linspace(0, total_frames - 1, min(budget * SCAN_FACTOR, total_frames), dtype=int)
+            with FrameSource(video_path, seek_gap=SEEK_GAP if remote else 0) as scan:
+                for idx, frame in scan.read(candidates):
+                    frame_signatures[idx] = signature(frame)
+            if not frame_signatures:
+                return None
+            return select_frames(list(frame_signatures), frame_signatures, budget, SHOT_CUT_THRESHOLD, FRAME_DEDUP_THRESHOLD)
+        
+        if adaptive and total_frames > 0:
+            max_frames = adaptive.get("max_frames") or sample_rate
+            sampler = AdaptiveSampler(
+                total_frames, max_frames,
+                error_tolerance=adaptive["error_tolerance"],
+                min_frames=ADAPTIVE_MIN_FRAMES,
+                plan=shot_plan(max_frames)
+            )
+            frames_total = sampler.max_frames
+            # One round keeps every process-pool worker busy with a full batch
+            round_size = batch_size * (self.process_pool.workers if self.process_pool is not None else 1)
+            rounds = iter(lambda: sampler.next_frames(round_size), [])
+        else:
+            frame_indices = shot_plan(sample_rate)
+            if frame_indices is None:
+                # Sample frames evenly throughout video
+                frame_indices = np.linspace(0, total_frames - 1, min(sample_rate, total_frames), dtype=int)
+            frames_total = len(set(int(i) for i in frame_indices))
+            rounds = [frame_indices]
+        round_targets = []
+        
+        # Chunks handed to the process pool, oldest first, so results stay in order
+        in_flight = deque()
+        
+        def process_batch(batch: List[tuple]):
+            frames = [frame for _, frame in batch]
+            
+            if self.process_pool is None:
+                # A pool worker starts every chunk with a fresh tracker; do the same so both
+                # backends run face detection on the same frames
+                face_tracker.reset()
+                # Analyze the whole chunk so the ML model runs one forward pass
+                record_batch(batch, self.analyze_images(frames, face_tracker, buffers))
+                return
+            
+            # Keep every worker busy, but only one chunk per worker in memory
+            in_flight.append((batch, self.process_pool.submit(frames)))
+            while len(in_flight) > self.process_pool.workers:
+                done_batch, future = in_flight.popleft()
+                record_batch(done_batch, future.result())
+        
+        try:
+            for indices in rounds:
+                round_targets = sorted(set(int(i) for i in indices))
+                batch = []
+                # Read forward once instead of seeking before every sampled frame
+                for idx, frame in timed_frames(source.read(round_targets)):
+                    if duplicates is not None:
+                        frame_signature = frame_signatures.get(idx)
+                        if frame_signature is None:
+                            frame_signature = signature(frame)
+                        original = duplicates.match(frame_signature)
+                        if original is not None:
+                            reused.append((idx, original))
+                            continue
+                        duplicates.add(frame_signature, idx)
+                    
+                    # Collect frames so memory stays bounded by the batch size
+                    batch.append((idx, frame))
+                    if len(batch) >= batch_size:
+                        process_batch(batch)
+                        batch = []
+                
+                if batch:
+                    process_batch(batch)
+                
+                # The next adaptive round depends on every result of this one
+                while in_flight:
+                    done_batch, future = in_flight.popleft()
+                    record_batch(done_batch, future.result())
+                
+                for idx, original in reused:
+                    record_frame(idx, analyses_by_frame[original], reused_from=original)
+                reused.clear()
+                
+                # Frames the source never delivered must not be asked for again
+                if sampler is not None and sampler.mark_unread(round_targets) == len(round_targets):
+                    sampler.stop_reason = "unreadable"
+                    break
+        finally:
+            source.release()
+            for _, future in in_flight:
+                future.cancel()
+        
+        if not frame_results:
+            raise ValueError("Could not decode any of the sampled video frames")
+        
+        # Reused and adaptive frames are recorded out of order
+        frame_results.sort(key=lambda f: f["frame_number"])
+        suspicious_frames.sort(key=lambda f: f["frame"])
+        frames_reused = sum("reused_from" in f for f in frame_results)
+        
+        # Frames around suspicious segments are reported, but don't skew the video score
+        scored_results = frame_results
+        if sampler is not None:
+            scored_results = [f for f in frame_results if f["frame_number"] in plan_frames]
+        
+        # Calculate overall video statistics
+        scores = [f["score"] for f in scored_results]
+        overall_score = np.mean(scores) if scores else 0
+        score_variance = np.var(scores) if scores else 0
+        
+        # Temporal coherence check
+        temporal_score = self._temporal_coherence_analysis(scored_results)
+        
+        # Aggregate final verdict - trust the ML model more, reduce temporal weight
+        # If ML is consistently high, that's suspicious even if temporally consistent
+        final_score = (overall_score * 0.85) + (temporal_score * 0.15)
+        
+        logger.info("Video analysis complete", extra={
+            "frames_analyzed": len(frame_results),
+            "ml_frames": ml_detections,
+            "frames_reused": frames_reused,
+            "sampling_stop": sampler.stop_reason if sampler is not None else None,
+            "frame_score": round(float(overall_score), 3),
+            "temporal_score": round(float(temporal_score), 3),
+            "final_score": round(float(final_score), 3)
+        })
+        
+        result = {
+            "video_info": {
+                "total_frames": int(total_frames),
+                "fps": round(float(fps), 2),
+                "duration_seconds": round(float(duration), 2),
+                "frames_analyzed": len(frame_results),
+                "frames_reused": frames_reused
+            },
+            "overall_analysis": {
+                "deepfake_probability": round(float(final_score * 100), 2),
+                "confidence_score": round(float(final_score), 3),
+                "verdict": self._get_verdict(final_score),
+                "risk_level": self._get_risk_level(final_score)
+            },
+            "statistics": {
+                "mean_score": round(float(np.mean(scores)), 3),
+                "max_score": round(float(np.max(scores)), 3),
+                "min_score": round(float(np.min(scores)), 3),
+                "score_variance": round(float(score_variance), 3),
+                "suspicious_frame_count": len(suspicious_frames)
+            },
+            "method_breakdown": self._get_method_breakdown(scored_results),
+            "suspicious_segments": suspicious_frames[:10],  # Top 10 most suspicious
+            "frame_by_frame": frame_results
+        }
+        
+        if sampler is not None:
+            result["sampling"] = sampler.summary()
+        
+        return result
+    
+    def _ml_detection(self, image: np.ndarray) -> Dict:
+        """AI/ML-based deepfake detection using pre-trained neural network"""
+        return self._ml_detection_batch([image])[0]
+    
+    def _ml_detection_batch(self, images: List[np.ndarray], batch_size: Optional[int] = None) -> List[Dict]:
+        """Run ML detection over several images, one forward pass per chunk"""
+        if not self.ml_available or ml_model_cache["backend"] is None:
+            return [{
+                "score": 0.0,
+                "confidence": 0.0,
+                "suspicious": False,
+                "details": "ML model not available",
+                "prediction": "unknown"
+            } for _ in images]
+        
+        batch_size = batch_size or ML_BATCH_SIZE
+        results = []
+        
+        for start in range(0, len(images), batch_size):
+            chunk = images[start:start + batch_size]
+            try:
+                probs = self._ml_forward(self._ml_preprocess(chunk))
+                results.extend(self._ml_postprocess(row) for row in probs)
+            except Exception as e:
+                logger.exception("ML detection error")
+                results.extend({
+                    "score": 0.0,
+                    "confidence": 0.0,
+                    "suspicious": False,
+                    "details": f"ML detection failed: {str(e)}",
+                    "prediction": "error"
+                } for _ in chunk)
+        
+        return results
+    
+    def _ml_preprocess(self, images: List[np.ndarray]) -> Dict:
+        """Convert BGR frames into a batch of model inputs"""
+        if ml_model_cache["preprocessor"] is not None:
+            # Straight from uint8 frames into the input tensor
+            return {k: v.to(ml_model_cache["device"]) for k, v in ml_model_cache["preprocessor"](images).items()}
+        
+        pil_images = []
+        for image in images:
+            # Convert OpenCV image (BGR) to PIL Image (RGB)
+            image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
+            pil_image = Image.fromarray(image_rgb)
+            
+            # Resize image to expected input size
+            pil_images.append(pil_image.resize((224, 224)))
+        
+        # Preprocess images with padding enabled
+        inputs = ml_model_cache["processor"](
+            images=pil_images, 
+            return_tensors="pt",
+            padding=True
+        )
+        return {k: v.to(ml_model_cache["device"]) for k, v in inputs.items()}
+    
+    def _ml_forward(self, inputs: Dict) -> np.ndarray:
+        """Run one forward pass and return per-image class probabilities"""
+        MODEL_BATCH_SIZE.observe(len(inputs["pixel_values"]))
+        with DETECTOR_SECONDS.labels("ml_model").time():
+            return ml_model_cache["backend"](inputs)
+    
+    def _ml_postprocess(self, probs: np.ndarray) -> Dict:
+        """Turn one row of class probabilities into an ML detection result"""
+        # Handle different model output formats
+        if probs.shape[-1] == 2:
+            fake_prob = float(probs[0])  # Probability of being fake
+            real_prob = float(probs[1])  # Probability of being real
+        else:
+            # Single output models
+            fake_prob = float(probs[0])
+            real_prob = 1.0 - fake_prob
+        
+        # Determine prediction
+        is_fake = fake_prob > real_prob
+        confidence = max(fake_prob, real_prob)
+        
+        # Score is the probability of being fake (0-1 scale)
+        score = float(fake_prob)
+        
+        return {
+            "score": round(score, 3),
+            "confidence": round(confidence, 3),
+            "fake_probability": round(fake_prob * 100, 2),
+            "real_probability": round(real_prob * 100, 2),
+            "suspicious": bool(is_fake),
+            "details": f"AI Model: {'FAKE' if is_fake else 'REAL'} ({confidence*100:.1f}% confidence)",
+            "prediction": "fake" if is_fake else "real"
+        }
+    
+    def _context(self, frame) -> FrameContext:
+        """Accept either a FrameContext or a bare BGR image"""
+        if isinstance(frame, FrameContext):
+            return frame
+        return FrameContext(frame, face_detect_max_dim=FACE_DETECT_MAX_DIM, analysis_max_dim=ANALYSIS_MAX_DIM)
+    
+    def _frequency_analysis(self, frame) -> Dict:
+        """Analyze frequency domain for deepfake artifacts"""
+        gray = self._context(frame).gray_at(DETECTOR_LEVELS.get("frequency_analysis", 0))
+        
+        # Apply FFT
+        f_transform = np.fft.fft2(gray)
+        f_shift = np.fft.fftshift(f_transform)
+        magnitude_spectrum = np.abs(f_shift)
+        
+        # Analyze high frequency components
+        h, w = magnitude_spectrum.shape
+        
+        # High frequency region (outer 30%) is everything outside the central band
+        total_energy = np.sum(magnitude_spectrum)
+        low_freq_energy = np.sum(magnitude_spectrum[int(h*0.3):int(h*0.7), int(w*0.3):int(w*0.7)])
+        high_freq_energy = total_energy - low_freq_energy
+        
+        high_freq_ratio = high_freq_energy / total_energy if total_energy > 0 else 0
+        
+        # Deepfakes often have unusual high-frequency patterns
+        # Normal images: 0.15-0.35, Deepfakes often: 0.40-0.60
+        anomaly_score = 0
+        if high_freq_ratio > 0.40:
+            anomaly_score = min((high_freq_ratio - 0.35) / 0.25, 1.0)
+        elif high_freq_ratio < 0.15:
+            anomaly_score = min((0.15 - high_freq_ratio) / 0.15, 1.0)
+        
+        return {
+            "score": round(float(anomaly_score), 3),
+            "high_freq_ratio": round(float(high_freq_ratio), 3),
+            "suspicious": bool(anomaly_score > 0.5),
+            "details": "Unusual frequency distribution detected" if anomaly_score > 0.5 else "Normal frequency distribution"
+        }
+    
+    def _facial_consistency(self, frame) -> Dict:
+        """Check for facial landmark consistency"""
+        frame = self._context(frame)
+        image = frame.image
+        
+        # Tracked across video frames, or detected on a downscaled copy
+        faces = frame.faces
+        
+        if len(faces) == 0:
+            return {
+                "score": 0.0,
+                "faces_detected": 0,
+                "suspicious": False,
+                "details": "No faces detected"
+            }
+        
+        anomaly_score = 0
+        details = []
+        
+        for (x, y, w, h) in faces:
+            face_roi = image[y:y+h, x:x+w]
+            
+            # Check for edge artifacts
+            edges = cv2.Canny(face_roi, 100, 200)
+            edge_density = np.sum(edges > 0) / (w * h)
+            
+            # Deepfakes often have unusual edge densities
+            if edge_density > 0.15 or edge_density < 0.03:
+                anomaly_score += 0.3
+                details.append("Unusual edge density detected")
+            
+            # Check face-background boundary
+            boundary_top = image[max(0, y-5):y, x:x+w]
+            boundary_bottom = image[y+h:min(image.shape[0], y+h+5), x:x+w]
+            
+            if boundary_top.size > 0 and boundary_bottom.size > 0:
+                face_mean = np.mean(face_roi)
+                boundary_mean = (np.mean(boundary_top) + np.mean(boundary_bottom)) / 2
+                
+                # Abrupt transitions can indicate face swapping
+                if abs(face_mean - boundary_mean) > 50:
+                    anomaly_score += 0.2
+                    details.append("Sharp boundary transition detected")
+        
+        anomaly_score = min(anomaly_score / len(faces), 1.0)
+        
+        return {
+            "score": round(float(anomaly_score), 3),
+            "faces_detected": int(len(faces)),
+            "suspicious": bool(anomaly_score > 0.4),
+            "details": "; ".join(details) if details else "Normal facial characteristics"
+        }
+    
+    def _compression_artifacts(self, frame) -> Dict:
+        """Detect compression artifacts that may indicate manipulation"""
+        # Luma from the YCrCb color space (8x8 blocks only line up at native resolution)
+        y_channel = self._context(frame).ycrcb_at(DETECTOR_LEVELS.get("compression_artifacts", 0))[:, :, 0]
+        
+        # Calculate blocking artifacts (8x8 DCT blocks from JPEG)
+        horizontal, vertical = self._blocking_boundaries(y_channel)
+        block_count = horizontal.size
+        
+        # A block shows blocking if either its bottom or right edge is visible
+        artifact_ratio = np.count_nonzero(horizontal | vertical) / block_count if block_count > 0 else 0
+        horizontal_ratio = np.count_nonzero(horizontal) / block_count if block_count > 0 else 0
+        vertical_ratio = np.count_nonzero(vertical) / block_count if block_count > 0 else 0
+        
+        # Deepfakes often have inconsistent compression
+        anomaly_score = min(artifact_ratio / 0.1, 1.0)
+        
+        return {
+            "score": round(float(anomaly_score), 3),
+            "artifact_density": round(float(artifact_ratio), 3),
+            "horizontal_density": round(float(horizontal_ratio), 3),
+            "vertical_density": round(float(vertical_ratio), 3),
+            "suspicious": bool(anomaly_score > 0.5),
+            "details": "Compression artifacts detected" if anomaly_score > 0.5 else "Normal compression pattern"
+        }
+    
+    @staticmethod
+    def _blocking_boundaries(y_channel: np.ndarray, block_size: int = 8, threshold: float = 15) -> tuple:
+        """Flag visible block edges below (horizontal) and right of (vertical) each block
+        
+        Returns two boolean arrays of shape (block_rows, block_cols). Every
+        boundary is taken with strided slices, so there is no per-block loop.
+        """
+        h, w = y_channel.shape
+        rows = len(range(0, h - block_size, block_size))
+        cols = len(range(0, w - block_size, block_size))
+        
+        if rows == 0 or cols == 0:
+            empty = np.zeros((rows, cols), dtype=bool)
+            return empty, empty
+        
+        y = y_channel.astype(np.int16)
+        span_h, span_w = rows * block_size, cols * block_size
+        
+        # Rows block_size, 2*block_size, ... against the row just above each
+        below = y[block_size:span_h + 1:block_size, :span_w]
+        above = y[block_size - 1:span_h:block_size, :span_w]
+        horizontal = np.abs(below - above).reshape(rows, cols, block_size).mean(axis=2) > threshold
+        
+        # Columns block_size, 2*block_size, ... against the column just left of each
+        right = y[:span_h, block_size:span_w + 1:block_size]
+        left = y[:span_h, block_size - 1:span_w:block_size]
+        vertical = np.abs(right - left).reshape(rows, block_size, cols).mean(axis=1) > threshold
+        
+        return horizontal, vertical
+    
+    def _color_analysis(self, frame) -> Dict:
+        """Analyze color distribution for inconsistencies"""
+        # LAB color space for perceptual analysis
+        lab = self._context(frame).lab_at(DETECTOR_LEVELS.get("color_analysis", 0))
+        
+        # Per-channel standard deviation in one pass, without splitting the channels
+        _, stds = cv2.meanStdDev(lab)
+        l_std, a_std, b_std = stds.ravel()
+        
+        # Deepfakes can have unusual color variance
+        # Normal images typically have balanced color distribution
+        color_balance = np.std([l_std, a_std, b_std])
+        
+        # High imbalance can indicate manipulation
+        anomaly_score = min(color_balance / 30.0, 1.0)
+        
+        return {
+            "score": round(float(anomaly_score), 3),
+            "color_balance": round(float(color_balance), 2),
+            "suspicious": bool(anomaly_score > 0.6),
+            "details": "Unusual color distribution" if anomaly_score > 0.6 else "Normal color characteristics"
+        }
+    
+    def _temporal_coherence_analysis(self, frame_results: List[Dict]) -> float:
+        """Analyze temporal consistency across frames"""
+        if len(frame_results) < 2:
+            return 0.0
+        
+        scores = [f["score"] for f in frame_results]
+        
+        # Calculate frame-to-frame score variance
+        score_diffs = [abs(scores[i+1] - scores[i]) for i in range(len(scores)-1)]
+        
+        # High variance can indicate inconsistent manipulation
+        variance_score = np.mean(score_diffs) if score_diffs else 0
+        
+        # Normalize to 0-1 range
+        return min(variance_score / 0.3, 1.0)
+    
+    def cache_params(self) -> Dict:
+        """Settings that change analysis output, used to key cached results"""
+        return {
+            "model": ML_MODEL_NAME if self.ml_available else None,
+            "ml_backend": ml_model_cache["backend"].name if self.ml_available else None,
+            "fast_preprocess": ml_model_cache["preprocessor"] is not None,
+            "weights": self.methods_weights,
+            "analysis_max_dim": ANALYSIS_MAX_DIM,
+            "detector_levels": DETECTOR_LEVELS,
+            "face_detect_max_dim": FACE_DETECT_MAX_DIM,
+            "face_redetect_interval": FACE_REDETECT_INTERVAL,
+            "frame_dedup": FRAME_DEDUP_THRESHOLD if FRAME_DEDUP else None,
+            "shot_cut": SHOT_CUT_THRESHOLD if SHOT_AWARE_SAMPLING else None
+        }
+    
+    def _calculate_frame_score(self, frame_analysis: Dict) -> float:
+        """Calculate weighted score for a single frame"""
+        total_score = 0
+        
+        for method, weight in self.methods_weights.items():
+            if method in frame_analysis:
+                total_score += frame_analysis[method]["score"] * weight
+        
+        return min(total_score, 1.0)
+    
+    def _get_method_breakdown(self, frame_results: List[Dict]) -> Dict:
+        """Get average scores for each detection method"""
+        breakdown = {}
+        
+        for method in self.methods_weights.keys():
+            scores = []
+            for frame in frame_results:
+                if method in frame["details"]:
+                    scores.append(frame["details"][method]["score"])
+            
+            if scores:
+                breakdown[method] = {
+                    "average_score": round(float(np.mean(scores)), 3),
+                    "weight": self.methods_weights[method],
+                    "contribution": round(float(np.mean(scores) * self.methods_weights[method] * 100), 2)
+                }
+        
+        return breakdown
+    
+    def _get_verdict(self, score: float) -> str:
+        """Get human-readable verdict"""
+        if score >= 0.75:
+            return "HIGHLY LIKELY FAKE"
+        elif score >= 0.60:
+            return "LIKELY FAKE"
+        elif score >= 0.40:
+            return "SUSPICIOUS"
+        elif score >= 0.25:
+            return "POSSIBLY AUTHENTIC"
+        else:
+            return "LIKELY AUTHENTIC"
+    
+    def _get_risk_level(self, score: float) -> str:
+        """Get risk level classification"""
+        if score >= 0.75:
+            return "CRITICAL"
+        elif score >= 0.60:
+            return "HIGH"
+        elif score >= 0.40:
+            return "MEDIUM"
+        elif score >= 0.25:
+            return "LOW"
+        else:
+            return "MINIMAL"
+
+
+# Initialize analyzer
+analyzer = DeepfakeAnalyzer()
@@ -0,0 +1,124 @@
+"""
+Face detection helpers for the facial consistency check
+
+The Haar cascade is parsed once per worker thread (CascadeClassifier is not
+safe to share between threads) and detection runs on a downscaled copy of the
+frame. For video, FaceTracker only runs the cascade every few frames and
+follows the faces with template matching in between. Video analysis resets
+the tracker at the start of every chunk of frames, so the process backend
+(each chunk on whichever worker is free) detects on the same frames as the
+thread backend.
+"""
+import threading
+import cv2
+import numpy as np
+from typing import List, Optional
+
+
+FACE_CASCADE_PATH = cv2.data.haarcascades + 'haarcascade_frontalface_default.xml'
+
+_thread_local = threading.local()
+
+
+def get_face_cascade() -> cv2.CascadeClassifier:
+    """Return this thread's cascade classifier, loading it on first use"""
+    cascade = getattr(_thread_local, "face_cascade", None)
+    if cascade is None:
+        cascade = cv2.CascadeClassifier(FACE_CASCADE_PATH)
+        _thread_local.face_cascade = cascade
+    return cascade
+
+
+def _downscale(gray: np.ndarray, max_dim: int) -> tuple:
+    """Shrink gray so its longest side is at most max_dim, returning (image, scale)"""
+    longest = max(gray.shape[:2])
+    if max_dim <= 0 or longest <= max_dim:
+        return gray, 1.0
+
+    scale = max_dim / longest
+    small = cv2.resize(gray, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+    return small, scale
+
+
+def _to_full_size(boxes: np.ndarray, scale: float, shape: tuple) -> np.ndarray:
+    """Map (x, y, w, h) boxes from the downscaled image back onto the full frame"""
+    if len(boxes) == 0:
+        return np.empty((0, 4), dtype=int)
+
+    full = np.round(np.asarray(boxes, dtype=float) / scale).astype(int)
+    h, w = shape[:2]
+    full[:, 0] = np.clip(full[:, 0], 0, w - 1)
+    full[:, 1] = np.clip(full[:, 1], 0, h - 1)
+    full[:, 2] = np.clip(full[:, 2], 1, w - full[:, 0])
+    full[:, 3] = np.clip(full[:, 3], 1, h - full[:, 1])
+    return full
+
+
+def detect_faces(gray: np.ndarray, max_dim: int = 640) -> np.ndarray:
+    """Detect faces on a downscaled copy of gray, returning full-size (x, y, w, h) boxes"""
+    small, scale = _downscale(gray, max_dim)
+    faces = get_face_cascade().detectMultiScale(small, 1.3, 5)
+    return _to_full_size(faces, scale, gray.shape)
+
+
+class FaceTracker:
+    """Follows faces across video frames, re-running the cascade every N frames"""
+
+    def __init__(self, redetect_interval: int = 5, max_dim: int = 640, match_threshold: float = 0.6):
+        self.redetect_interval = max(1, redetect_interval)
+        self.max_dim = max_dim
+        self.match_threshold = match_threshold
+
+        self._boxes = np.empty((0, 4), dtype=int)  # In downscaled coordinates
+        self._templates: List[np.ndarray] = []
+        self._frames_since_detect = 0
+
+    def reset(self):
+        """Forget the tracked faces, so the next frame runs the cascade"""
+        self._boxes = np.empty((0, 4), dtype=int)
+        self._templates = []
+        self._frames_since_detect = 0
+
+    def update(self, gray: np.ndarray) -> np.ndarray:
+        """Return full-size face boxes for the next frame of the video"""
+        small, scale = _downscale(gray, self.max_dim)
+
+        boxes = None
+        if self._templates and self._frames_since_detect < self.redetect_interval:
+            boxes = self._track(small)
+
+        # Re-detect on schedule, or as soon as every tracked face is lost
+        if boxes is None:
+            boxes = get_face_cascade().detectMultiScale(small, 1.3, 5)
+            boxes = np.asarray(boxes, dtype=int).reshape(-1, 4)
+            self._frames_since_detect = 0
+
+        self._boxes = boxes
+        self._templates = [small[y:y+h, x:x+w].copy() for (x, y, w, h) in boxes]
+        self._frames_since_detect += 1
+
+        return _to_full_size(boxes, scale, gray.shape)
+
+    def _track(self, small: np.ndarray) -> Optional[np.ndarray]:
+        """Find each previous face near its last position, or None if all are lost"""
+        img_h, img_w = small.shape[:2]
+        tracked = []
+
+        for (x, y, w, h), template in zip(self._boxes, self._templates):
+            # Search a window half a face larger than the last box on each side
+            x0, y0 = max(0, x - w // 2), max(0, y - h // 2)
+            x1, y1 = min(img_w, x + w + w // 2), min(img_h, y + h + h // 2)
+            window = small[y0:y1, x0:x1]
+
+            if window.shape[0] < h or window.shape[1] < w:
+                continue
+
+            scores = cv2.matchTemplate(window, template, cv2.TM_CCOEFF_NORMED)
+            _, best, _, (dx, dy) = cv2.minMaxLoc(scores)
+
+            if np.isfinite(best) and best >= self.match_threshold:
+                tracked.append((x0 + dx, y0 + dy, w, h))
+
+        if not tracked:
+            return None
+        return np.array(tracked, dtype=int)
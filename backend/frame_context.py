@@ -0,0 +1,164 @@
+"""
+Per-frame feature context shared by the heuristic detectors
+
+Each detector used to derive its own representation of the frame - the
+frequency and face detectors both converted to grayscale, the compression
+detector to YCrCb, the colour detector to LAB. A FrameContext computes each
+representation the first time a detector asks for it and hands the same
+array to every later caller.
+
+FrameBuffers keeps the output arrays between frames: consecutive frames of a
+video have the same shape, so the conversions write into the previous
+frame's memory instead of allocating new full-frame arrays.
+
+With analysis_max_dim, a 4K frame is shrunk once to the working resolution
+and every conversion works on that, so per-frame cost follows the working
+size rather than the source's. Detectors can also ask for a pyramid level
+below it (each one halves the frame) or for the native frame, for checks
+that depend on exact pixels such as 8x8 compression blocks.
+"""
+from typing import Dict, Optional, Tuple, Union
+
+import cv2
+import numpy as np
+
+from face_detection import FaceTracker, detect_faces
+
+
+# Pyramid level of the frame as decoded, before any downscaling
+NATIVE = "native"
+
+Level = Union[int, str]
+
+
+def parse_levels(spec: str) -> Dict[str, Level]:
+    """Parse "detector=level,..." (level a number or "native") into a dict"""
+    levels = {}
+    for entry in filter(None, (part.strip() for part in spec.split(","))):
+        name, _, value = entry.partition("=")
+        value = value.strip()
+        if value != NATIVE and not value.isdigit():
+            raise ValueError(f"Bad pyramid level for {name.strip()!r}: {value!r} (a number or 'native')")
+        levels[name.strip()] = value if value == NATIVE else int(value)
+    return levels
+
+
+class FrameBuffers:
+    """Reusable output arrays for FrameContext conversions (one set per video/thread)"""
+
+    def __init__(self):
+        self._arrays: Dict[str, np.ndarray] = {}
+
+    def get(self, name: str, shape: Tuple[int, ...], dtype=np.uint8) -> np.ndarray:
+        array = self._arrays.get(name)
+        if array is None or array.shape != shape or array.dtype != dtype:
+            array = np.empty(shape, dtype=dtype)
+            self._arrays[name] = array
+        return array
+
+
+class FrameContext:
+    """Lazily computed views of one BGR frame (gray, YCrCb, LAB, pyramid, faces)
+
+    image is the working-resolution frame (pyramid level 0) and native the
+    frame as passed in; they are the same array unless analysis_max_dim
+    shrank it. Face boxes are in working-resolution coordinates.
+
+    Arrays that come from FrameBuffers are overwritten by the next frame
+    using the same buffers, so don't keep them past the frame's analysis.
+    """
+
+    def __init__(self, image: np.ndarray, buffers: Optional[FrameBuffers] = None,
+                 face_tracker: Optional[FaceTracker] = None, face_detect_max_dim: int = 640,
+                 analysis_max_dim: int = 0):
+        self.native = image
+        self.buffers = buffers or FrameBuffers()
+        self.face_tracker = face_tracker
+        self.face_detect_max_dim = face_detect_max_dim
+
+        self._cache: Dict[str, object] = {}
+        self.image = self._shrink(image, analysis_max_dim)
+
+    def _shrink(self, image: np.ndarray, max_dim: int) -> np.ndarray:
+        """image with its longest side cut to max_dim (0 = unchanged), in one resize"""
+        h, w = image.shape[:2]
+        if max_dim <= 0 or max(h, w) <= max_dim:
+            return image
+
+        scale = max_dim / max(h, w)
+        size = (max(1, round(w * scale)), max(1, round(h * scale)))
+        dst = self.buffers.get("working", (size[1], size[0]) + image.shape[2:])
+        return cv2.resize(image, size, dst=dst, interpolation=cv2.INTER_AREA)
+
+    def _level(self, level: Level) -> Level:
+        # Without a downscale the native frame is level 0; share its conversions
+        return 0 if level == NATIVE and self.image is self.native else level
+
+    def bgr(self, level: Level = 0) -> np.ndarray:
+        """The frame at a pyramid level: 0 is the working resolution, each level
+        below halves it (cv2.pyrDown), NATIVE is the frame as decoded"""
+        level = self._level(level)
+        if level == NATIVE:
+            return self.native
+        if level <= 0:
+            return self.image
+
+        name = f"bgr{level}"
+        if name not in self._cache:
+            previous = self.bgr(level - 1)
+            h, w = previous.shape[:2]
+            dst = self.buffers.get(name, ((h + 1) // 2, (w + 1) // 2) + previous.shape[2:])
+            self._cache[name] = cv2.pyrDown(previous, dst=dst)
+        return self._cache[name]
+
+    def _convert(self, name: str, code: int, channels: int, level: Level = 0) -> np.ndarray:
+        level = self._level(level)
+        if level != 0:
+            name = f"{name}@{level}"
+        if name not in self._cache:
+            source = self.bgr(level)
+            h, w = source.shape[:2]
+            shape = (h, w) if channels == 1 else (h, w, channels)
+            self._cache[name] = cv2.cvtColor(source, code, dst=self.buffers.get(name, shape))
+        return self._cache[name]
+
+    def gray_at(self, level: Level) -> np.ndarray:
+        level = self._level(level)
+        if level == NATIVE or level <= 0:
+            return self._convert("gray", cv2.COLOR_BGR2GRAY, 1, level)
+
+        # Smaller levels halve the gray plane directly rather than a BGR level
+        name = f"gray@{level}"
+        if name not in self._cache:
+            previous = self.gray_at(level - 1)
+            h, w = previous.shape
+            self._cache[name] = cv2.pyrDown(previous, dst=self.buffers.get(name, ((h + 1) // 2, (w + 1) // 2)))
+        return self._cache[name]
+
+    def ycrcb_at(self, level: Level) -> np.ndarray:
+        return self._convert("ycrcb", cv2.COLOR_BGR2YCrCb, 3, level)
+
+    def lab_at(self, level: Level) -> np.ndarray:
+        return self._convert("lab", cv2.COLOR_BGR2LAB, 3, level)
+
+    @property
+    def gray(self) -> np.ndarray:
+        return self.gray_at(0)
+
+    @property
+    def ycrcb(self) -> np.ndarray:
+        return self.ycrcb_at(0)
+
+    @property
+    def lab(self) -> np.ndarray:
+        return self.lab_at(0)
+
+    @property
+    def faces(self) -> np.ndarray:
+        """Face boxes (x, y, w, h) in working-resolution (self.image) coordinates"""
+        if "faces" not in self._cache:
+            if self.face_tracker is not None:
+                self._cache["faces"] = self.face_tracker.update(self.gray)
+            else:
+                self._cache["faces"] = detect_faces(self.gray, self.face_detect_max_dim)
+        return self._cache["faces"]
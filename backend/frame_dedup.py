@@ -0,0 +1,112 @@
+"""
+Near-duplicate frame skipping and shot-aware frame selection
+
+Talking heads and slideshows give long runs of sampled frames that look the
+same, and every one of them used to go through all five detectors. Each
+frame gets a signature - a 32x32 grayscale thumbnail - and two frames are
+compared by the mean absolute difference of their thumbnails, in gray
+levels. Frames within a level or so of one already analyzed reuse its
+analysis.
+
+(A dHash was tried first, but noise flips its bits in flat areas, so stills
+from a compressed slideshow didn't match each other; the averaged thumbnail
+difference stays well under one level for them.)
+
+The same signatures split the video into shots: a large jump between two
+neighbouring frames is a cut. select_frames spreads the sampling budget
+over the shots by how much each one changes, so a static shot gets a single
+frame and the rest goes to visually distinct content.
+"""
+from typing import Dict, List, Optional, Sequence
+
+import cv2
+import numpy as np
+
+
+SIGNATURE_SIZE = 32
+
+# Candidate frames scanned per frame of the sampling budget
+SCAN_FACTOR = 4
+
+
+def signature(image: np.ndarray, size: int = SIGNATURE_SIZE) -> np.ndarray:
+    """size x size grayscale thumbnail of a BGR (or grayscale) frame"""
+    # Shrinking first keeps the colour conversion tiny
+    small = cv2.resize(image, (size, size), interpolation=cv2.INTER_AREA)
+    if small.ndim == 3:
+        small = cv2.cvtColor(small, cv2.COLOR_BGR2GRAY)
+    return small
+
+
+def difference(a: np.ndarray, b: np.ndarray) -> float:
+    """Mean absolute difference between two signatures, in gray levels"""
+    return float(cv2.absdiff(a, b).mean())
+
+
+class DuplicateIndex:
+    """Signatures of the frames analyzed so far, to find one a new frame duplicates"""
+
+    def __init__(self, threshold: float):
+        self.threshold = threshold
+        self._signatures: List[np.ndarray] = []
+        self._frames: List[int] = []
+
+    def match(self, frame_signature: np.ndarray) -> Optional[int]:
+        """Index of the closest analyzed frame within threshold, or None"""
+        if not self._signatures:
+            return None
+        diffs = np.abs(np.stack(self._signatures).astype(np.int16) - frame_signature).mean(axis=(1, 2))
+        best = int(np.argmin(diffs))
+        return self._frames[best] if diffs[best] <= self.threshold else None
+
+    def add(self, frame_signature: np.ndarray, frame_index: int):
+        self._signatures.append(frame_signature)
+        self._frames.append(int(frame_index))
+
+
+def split_shots(frames: Sequence[int], signatures: Dict[int, np.ndarray], cut_threshold: float) -> List[List[int]]:
+    """Group consecutive frames into shots, cutting where neighbouring signatures jump by more than cut_threshold"""
+    shots: List[List[int]] = []
+    for i, idx in enumerate(frames):
+        if i == 0 or difference(signatures[frames[i - 1]], signatures[idx]) > cut_threshold:
+            shots.append([])
+        shots[-1].append(idx)
+    return shots
+
+
+def select_frames(frames: Sequence[int], signatures: Dict[int, np.ndarray], budget: int,
+                  cut_threshold: float, duplicate_threshold: float) -> List[int]:
+    """Pick up to budget of the scanned frames, spread over shots by how much each one changes"""
+    frames = sorted(frames)
+    shots = split_shots(frames, signatures, cut_threshold)
+
+    if len(shots) >= budget:
+        # Cuts everywhere: the content is varied throughout, so just spread evenly
+        picks = np.linspace(0, len(shots) - 1, budget, dtype=int) if budget > 0 else []
+        return [shots[i][len(shots[i]) // 2] for i in sorted(set(picks))]
+
+    # A shot's weight is the number of visible changes inside it
+    weights = [
+        sum(difference(signatures[a], signatures[b]) > duplicate_threshold for a, b in zip(shot, shot[1:]))
+        for shot in shots
+    ]
+    if not any(weights):
+        weights = [len(shot) for shot in shots]
+
+    # Every shot gets a frame; the rest goes out by highest weight per frame already given
+    alloc = [1] * len(shots)
+    for _ in range(budget - len(shots)):
+        open_shots = [i for i in range(len(shots)) if alloc[i] < len(shots[i])]
+        if not open_shots:
+            break
+        best = max(open_shots, key=lambda i: weights[i] / alloc[i])
+        if weights[best] == 0:
+            break  # Only static shots left; more frames there would just be duplicates
+        alloc[best] += 1
+
+    selected = []
+    for shot, count in zip(shots, alloc):
+        # Centred positions, so a single frame sits mid-shot rather than on the cut
+        positions = ((np.arange(count) + 0.5) * len(shot) / count).astype(int)
+        selected.extend(shot[p] for p in positions)
+    return selected
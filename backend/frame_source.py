@@ -0,0 +1,175 @@
+"""
+Sequential frame reading for video analysis
+
+Seeking with CAP_PROP_POS_FRAMES makes the decoder jump back to the previous
+keyframe and decode forward again for every sampled frame. FrameSource walks
+the file once instead: grab() advances past frames we don't need and
+retrieve() only converts the frames we sample.
+
+Callers that jump around the file (adaptive sampling reads it in several
+rounds) can pass seek_gap: gaps longer than that many frames are crossed
+with a seek instead of decoding every frame in between.
+
+video_path can also be an http(s) URL. FFmpeg then reads it with range
+requests, so a seek skips the bytes in between instead of downloading them.
+"""
+import cv2
+import numpy as np
+from typing import Iterable, Iterator, Optional, Tuple
+
+
+# Give up on a stalled remote source instead of hanging the worker
+REMOTE_TIMEOUT_MS = 30000
+
+
+def is_remote(video_path: str) -> bool:
+    """Whether video_path is a URL rather than a local file"""
+    return "://" in video_path
+
+
+def open_capture(video_path: str) -> cv2.VideoCapture:
+    """VideoCapture for a file or URL (with timeouts), raising ValueError if it can't be opened"""
+    if is_remote(video_path):
+        cap = cv2.VideoCapture(video_path, cv2.CAP_FFMPEG, [
+            cv2.CAP_PROP_OPEN_TIMEOUT_MSEC, REMOTE_TIMEOUT_MS,
+            cv2.CAP_PROP_READ_TIMEOUT_MSEC, REMOTE_TIMEOUT_MS
+        ])
+    else:
+        cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        cap.release()
+        raise ValueError("Could not open video file")
+    return cap
+
+
+class FrameSource:
+    """Forward-only reader that yields sampled frames from a video file"""
+
+    def __init__(self, video_path: str, keyframes_only: bool = False, seek_gap: int = 0):
+        self.video_path = video_path
+        self.keyframes_only = keyframes_only
+        self.seek_gap = seek_gap  # 0 = never seek
+        self.cap = None
+        self._open()
+
+        self.total_frames = int(self.cap.get(cv2.CAP_PROP_FRAME_COUNT))
+        self.fps = self.cap.get(cv2.CAP_PROP_FPS)
+
+    def _open(self):
+        """(Re)open the capture at the first frame"""
+        if self.cap is not None:
+            self.cap.release()
+
+        self.cap = open_capture(self.video_path)
+
+        # Index of the frame the next grab() will return
+        self.position = 0
+
+    def _seek(self, target: int):
+        """Jump to target (the decoder restarts from the keyframe before it)"""
+        self.cap.set(cv2.CAP_PROP_POS_FRAMES, target)
+        self.position = target
+
+    def _advance_to(self, target: int) -> bool:
+        """Move so the next grab() returns target, returning False at the end of the file"""
+        if self.seek_gap > 0 and target - self.position > self.seek_gap:
+            self._seek(target)
+
+        # Skip ahead cheaply - grab() decodes but doesn't convert
+        while self.position < target:
+            if self._grab() is None:
+                return False
+        return True
+
+    def _grab(self) -> Optional[int]:
+        """Advance one frame without converting it, returning its index"""
+        if not self.cap.grab():
+            return None
+
+        idx = self.position
+        self.position += 1
+        return idx
+
+    def _is_keyframe(self) -> bool:
+        """Whether the last grabbed frame came from a keyframe packet (FFmpeg backend only)"""
+        return self.cap.get(cv2.CAP_PROP_LRF_HAS_KEY_FRAME) > 0
+
+    def read(self, frame_indices: Iterable[int]) -> Iterator[Tuple[int, np.ndarray]]:
+        """Yield (frame_index, frame) for the requested indices in one forward pass"""
+        targets = sorted(set(int(i) for i in frame_indices))
+        if not targets:
+            return
+
+        # Going backwards means decoding from the start again (unless seeking)
+        if targets[0] < self.position:
+            if self.seek_gap > 0:
+                self._seek(targets[0])
+            else:
+                self._open()
+
+        if self.keyframes_only:
+            yield from self._read_keyframes(targets)
+            return
+
+        for target in targets:
+            if not self._advance_to(target):
+                return
+
+            idx = self._grab()
+            if idx is None:
+                return
+
+            ret, frame = self.cap.retrieve()
+            if ret:
+                yield idx, frame
+
+    def _read_keyframes(self, targets: list) -> Iterator[Tuple[int, np.ndarray]]:
+        """Snap each target to the first keyframe before the next target
+
+        The target frame itself is kept as a fallback, so every target still
+        yields exactly one frame when the GOP is longer than the sample spacing
+        or the backend can't report keyframes.
+        """
+        # The last target gets a window as wide as the average sample spacing
+        spacing = (targets[-1] - targets[0]) // (len(targets) - 1) if len(targets) > 1 else self.total_frames
+
+        for i, target in enumerate(targets):
+            window_end = targets[i + 1] if i + 1 < len(targets) else target + max(spacing, 1)
+
+            if not self._advance_to(target):
+                return
+
+            idx = self._grab()
+            if idx is None:
+                return
+
+            ret, frame = self.cap.retrieve()
+            if not ret:
+                continue
+
+            best = (idx, frame)
+
+            # Walk forward until we hit a keyframe or the next target's window
+            while not self._is_keyframe() and self.position < window_end:
+                idx = self._grab()
+                if idx is None:
+                    break
+
+                if self._is_keyframe():
+                    ret, keyframe = self.cap.retrieve()
+                    if ret:
+                        best = (idx, keyframe)
+
+            yield best
+
+    def release(self):
+        """Release the underlying capture"""
+        if self.cap is not None:
+            self.cap.release()
+            self.cap = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.release()
@@ -0,0 +1,131 @@
+"""
+Dynamic micro-batching for ML inference
+
+Concurrent requests each used to run the model at batch size 1. The
+scheduler puts every ML request from every in-flight request on one queue;
+a single thread takes whatever is waiting (up to max_batch_size, waiting at
+most max_wait_ms for stragglers), runs one forward pass and hands each
+caller its own result through a future. On shutdown, requests still
+queued fail with RuntimeError rather than leaving their callers waiting.
+"""
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Callable, Dict, List
+
+import numpy as np
+
+
+class InferenceScheduler:
+    """Gathers ML requests from concurrent callers into batched forward passes"""
+
+    def __init__(self, run_batch: Callable[[List[np.ndarray]], List[Dict]],
+                 max_batch_size: int = 8, max_wait_ms: float = 5.0):
+        self.run_batch = run_batch
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_wait = max_wait_ms / 1000.0
+
+        self._queue: "queue.Queue[tuple]" = queue.Queue()
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._items = 0
+        self._batch_sizes: Dict[int, int] = {}
+        self._max_queue_depth = 0
+
+        self._running = True
+        self._thread = threading.Thread(target=self._loop, name="inference-scheduler", daemon=True)
+        self._thread.start()
+
+    def submit(self, image: np.ndarray) -> Future:
+        """Queue one image; the future resolves to its ML detection result"""
+        future = Future()
+        if not self._running:
+            future.set_exception(RuntimeError("Inference scheduler is shut down"))
+            return future
+        self._queue.put((image, future))
+
+        depth = self._queue.qsize()
+        with self._stats_lock:
+            if depth > self._max_queue_depth:
+                self._max_queue_depth = depth
+        return future
+
+    def _fail_pending(self):
+        """Fail every request still queued (after the loop has stopped)"""
+        while True:
+            try:
+                item = self._queue.get_nowait()
+            except queue.Empty:
+                return
+            if item is not None and item[1].set_running_or_notify_cancel():
+                item[1].set_exception(RuntimeError("Inference scheduler is shut down"))
+
+    def _loop(self):
+        try:
+            self._run()
+        finally:
+            self._fail_pending()
+
+    def _run(self):
+        while self._running:
+            item = self._queue.get()
+            if item is None:
+                break
+
+            # Collect more work until the batch is full or the wait window closes
+            batch = [item]
+            deadline = time.monotonic() + self.max_wait
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    item = self._queue.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if item is None:
+                    self._running = False
+                    break
+                batch.append(item)
+
+            # Drop requests whose callers gave up while they were queued
+            batch = [(image, future) for image, future in batch if future.set_running_or_notify_cancel()]
+            if not batch:
+                continue
+
+            try:
+                results = self.run_batch([image for image, _ in batch])
+                for (_, future), result in zip(batch, results):
+                    future.set_result(result)
+            except Exception as e:
+                for _, future in batch:
+                    future.set_exception(e)
+
+            with self._stats_lock:
+                self._batches += 1
+                self._items += len(batch)
+                self._batch_sizes[len(batch)] = self._batch_sizes.get(len(batch), 0) + 1
+
+    def stats(self) -> Dict:
+        """Queue depth and batch-size statistics"""
+        with self._stats_lock:
+            return {
+                "queue_depth": self._queue.qsize(),
+                "max_queue_depth": self._max_queue_depth,
+                "batches": self._batches,
+                "items": self._items,
+                "mean_batch_size": round(self._items / self._batches, 2) if self._batches else 0.0,
+                "batch_size_counts": dict(sorted(self._batch_sizes.items())),
+                "max_batch_size": self.max_batch_size,
+                "max_wait_ms": self.max_wait * 1000.0
+            }
+
+    def shutdown(self, timeout: float = 5.0):
+        """Stop after the batch in progress; queued requests fail instead of hanging"""
+        self._running = False
+        self._queue.put(None)
+        self._thread.join(timeout)
+        # Anything submitted while the loop was exiting
+        if not self._thread.is_alive():
+            self._fail_pending()
@@ -0,0 +1,249 @@
+"""
+Background analysis jobs
+
+Long video and YouTube analyses run as jobs instead of holding the HTTP
+request open. A submit call returns a job id straight away; clients poll the
+job or subscribe to its event stream for per-frame progress and partial
+scores. The number of unfinished jobs is bounded and finished jobs are only
+retained for a limited time.
+"""
+import asyncio
+import logging
+import threading
+import time
+import uuid
+from concurrent.futures import Executor, Future
+from typing import AsyncIterator, Callable, Dict, List, Optional
+
+
+logger = logging.getLogger(__name__)
+
+
+class JobCancelled(Exception):
+    """Raised inside a running job once it has been cancelled"""
+
+
+class JobQueueFull(Exception):
+    """Raised when too many jobs are already waiting or running"""
+
+
+TERMINAL_STATES = ("completed", "failed", "cancelled")
+
+
+class Job:
+    """State of a single analysis job"""
+
+    def __init__(self, kind: str, params: Optional[Dict] = None):
+        self.id = uuid.uuid4().hex
+        self.kind = kind
+        self.params = params or {}
+        self.status = "queued"
+        self.created = time.time()
+        self.started: Optional[float] = None
+        self.finished: Optional[float] = None
+        self.progress: Dict = {}
+        self.result: Optional[Dict] = None
+        self.error: Optional[str] = None
+
+        self.future: Optional[Future] = None
+        self._cancel_requested = threading.Event()
+        self._subscribers: List[asyncio.Queue] = []
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._lock = threading.Lock()
+
+    @property
+    def done(self) -> bool:
+        return self.status in TERMINAL_STATES
+
+    @property
+    def cancel_requested(self) -> bool:
+        return self._cancel_requested.is_set()
+
+    def check_cancelled(self):
+        """Call between units of work; raises JobCancelled once cancel() was requested"""
+        if self._cancel_requested.is_set():
+            raise JobCancelled()
+
+    def report_progress(self, progress: Dict):
+        """Record progress from the worker thread and notify subscribers"""
+        self.check_cancelled()
+        self.progress = progress
+        self._publish("progress", progress)
+
+    def to_dict(self, include_result: bool = True) -> Dict:
+        """Public view of the job"""
+        data = {
+            "job_id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "params": self.params,
+            "created": self.created,
+            "started": self.started,
+            "finished": self.finished,
+            "progress": self.progress
+        }
+        if self.error is not None:
+            data["error"] = self.error
+        if include_result and self.result is not None:
+            data["result"] = self.result
+        return data
+
+    def _set_status(self, status: str):
+        self.status = status
+        if status == "running":
+            self.started = time.time()
+        elif status in TERMINAL_STATES:
+            self.finished = time.time()
+
+        if status == "completed":
+            self._publish("result", self.to_dict())
+        elif status in TERMINAL_STATES:
+            self._publish(status, self.to_dict())
+        else:
+            self._publish("status", self.to_dict(include_result=False))
+
+    def _publish(self, event: str, data: Dict):
+        """Hand an event to every subscriber's queue on the event loop"""
+        with self._lock:
+            if self._loop is None:
+                return
+            for queue in self._subscribers:
+                self._loop.call_soon_threadsafe(queue.put_nowait, (event, data))
+
+    async def events(self, heartbeat: float = 15.0) -> AsyncIterator[tuple]:
+        """Yield (event, data) pairs until the job reaches a terminal state
+
+        A "ping" event is yielded whenever nothing happened for heartbeat
+        seconds, so idle streams aren't cut off by proxies.
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        with self._lock:
+            self._loop = asyncio.get_running_loop()
+            self._subscribers.append(queue)
+
+        try:
+            # Start every stream with a snapshot so late subscribers catch up
+            if self.done:
+                yield ("result" if self.status == "completed" else self.status), self.to_dict()
+                return
+            yield "status", self.to_dict(include_result=False)
+
+            while True:
+                try:
+                    event, data = await asyncio.wait_for(queue.get(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield "ping", {"job_id": self.id}
+                    continue
+                yield event, data
+                if event in ("result",) + TERMINAL_STATES:
+                    return
+        finally:
+            with self._lock:
+                self._subscribers.remove(queue)
+
+
+class JobManager:
+    """Runs jobs on an executor with a bounded backlog and limited result retention"""
+
+    def __init__(self, executor: Executor, max_pending: int = 16,
+                 max_retained: int = 100, retention_seconds: int = 3600):
+        self.executor = executor
+        self.max_pending = max_pending
+        self.max_retained = max_retained
+        self.retention_seconds = retention_seconds
+
+        self._jobs: Dict[str, Job] = {}
+        self._lock = threading.Lock()
+
+    def check_capacity(self):
+        """Raise JobQueueFull if a submit would be refused right now"""
+        with self._lock:
+            self._prune()
+            pending = sum(1 for job in self._jobs.values() if not job.done)
+        if pending >= self.max_pending:
+            raise JobQueueFull(f"{pending} jobs already pending")
+
+    def submit(self, kind: str, work: Callable[[Job], Dict], params: Optional[Dict] = None,
+               cleanup: Optional[Callable[[], None]] = None) -> Job:
+        """Queue work(job) and return the job immediately
+
+        work receives the Job so it can call job.report_progress() and
+        job.check_cancelled(). cleanup runs once the job has finished,
+        whatever the outcome.
+        """
+        with self._lock:
+            self._prune()
+            pending = sum(1 for job in self._jobs.values() if not job.done)
+            if pending >= self.max_pending:
+                raise JobQueueFull(f"{pending} jobs already pending")
+
+            job = Job(kind, params)
+            self._jobs[job.id] = job
+
+        def run():
+            if job.cancel_requested:
+                raise JobCancelled()
+            job._set_status("running")
+            return work(job)
+
+        def finish(future: Future):
+            try:
+                if future.cancelled():
+                    job._set_status("cancelled")
+                    return
+
+                error = future.exception()
+                if error is None:
+                    job.result = future.result()
+                    job._set_status("completed")
+                elif isinstance(error, JobCancelled):
+                    job._set_status("cancelled")
+                else:
+                    job.error = str(error)
+                    job._set_status("failed")
+            finally:
+                if cleanup is not None:
+                    try:
+                        cleanup()
+                    except Exception:
+                        logger.exception("Job cleanup failed", extra={"job_id": job.id})
+
+        job.future = self.executor.submit(run)
+        job.future.add_done_callback(finish)
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        with self._lock:
+            self._prune()
+            return self._jobs.get(job_id)
+
+    def cancel(self, job_id: str) -> Optional[Job]:
+        """Cancel a queued job outright, or ask a running one to stop at its next frame"""
+        job = self.get(job_id)
+        if job is None or job.done:
+            return job
+
+        job._cancel_requested.set()
+        if job.future is not None:
+            job.future.cancel()
+        return job
+
+    def stats(self) -> Dict:
+        with self._lock:
+            counts: Dict[str, int] = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+        return {"max_pending": self.max_pending, "jobs": counts}
+
+    def _prune(self):
+        """Forget finished jobs past the retention window or beyond the retention count"""
+        now = time.time()
+        finished = sorted(
+            (job for job in self._jobs.values() if job.done),
+            key=lambda job: job.finished
+        )
+
+        excess = len(finished) - self.max_retained
+        for i, job in enumerate(finished):
+            if i < excess or now - job.finished > self.retention_seconds:
+                del self._jobs[job.id]
@@ -0,0 +1,243 @@
+"""
+Live stream analysis for the /ws/live WebSocket
+
+A live stream can't be sampled ahead of time like a file: frames arrive at
+the sender's pace, and falling behind means every verdict describes an
+older moment of the broadcast. A LiveSession keeps latency bounded instead
+of analyzing everything:
+
+- arriving frames go into a one-frame mailbox; a frame still waiting when a
+  newer one arrives is dropped without being decoded
+- at most max_fps frames per second are analyzed, one at a time - the
+  newest frame is taken when the next slot opens
+- a frame that waited longer than the latency budget is dropped as stale
+- scores go into a SlidingWindow of the last window_seconds (capped at
+  max_frames), so memory stays bounded however long the stream runs
+
+After every analyzed frame the session yields an update with the frame's
+score, the window's score and verdict, the end-to-end latency and drop
+counts; a frame that fails to decode or analyze yields an error instead and
+the stream carries on. summary() is the last message, sent however the
+stream ends.
+
+The frames come from the WebSocket (encoded images in binary messages) or
+from read_source(), which reads an RTSP URL or a local video file on a
+thread, at the file's own frame rate, as a stand-in for a live feed.
+"""
+import asyncio
+import logging
+import threading
+import time
+from collections import deque
+from typing import AsyncIterator, Awaitable, Callable, Deque, Dict, List, Optional, Tuple
+
+import cv2
+
+from frame_source import is_remote, open_capture
+from metrics import LIVE_FRAMES, LIVE_LATENCY_SECONDS
+
+
+logger = logging.getLogger(__name__)
+
+# (frame data - encoded bytes or a decoded frame, stream timestamp, monotonic arrival time)
+LiveFrame = Tuple[object, float, float]
+
+
+class SlidingWindow:
+    """Frame scores from the last `seconds` of a stream, at most max_frames of them"""
+
+    def __init__(self, seconds: float, max_frames: int):
+        self.seconds = seconds
+        self.frames: Deque[Dict] = deque(maxlen=max(1, max_frames))
+
+    def add(self, timestamp: float, score: float):
+        self.frames.append({"timestamp": timestamp, "score": score})
+        while self.frames and timestamp - self.frames[0]["timestamp"] > self.seconds:
+            self.frames.popleft()
+
+    def __len__(self) -> int:
+        return len(self.frames)
+
+
+class FrameMailbox:
+    """Holds only the newest frame; one replaced before it was taken counts as dropped"""
+
+    def __init__(self):
+        self._frame: Optional[LiveFrame] = None
+        self._ready = asyncio.Event()
+        self.closed = False
+        self.dropped = 0
+
+    @property
+    def waiting(self) -> bool:
+        """Whether a frame is waiting to be taken"""
+        return self._frame is not None
+
+    def drop(self):
+        self.dropped += 1
+        LIVE_FRAMES.labels("dropped").inc()
+
+    def put(self, frame: LiveFrame):
+        if self._frame is not None:
+            self.drop()
+        self._frame = frame
+        self._ready.set()
+
+    def close(self):
+        """No more frames; take() returns the pending one, then None"""
+        self.closed = True
+        self._ready.set()
+
+    async def take(self) -> Optional[LiveFrame]:
+        while self._frame is None:
+            if self.closed:
+                return None
+            self._ready.clear()
+            await self._ready.wait()
+        frame, self._frame = self._frame, None
+        return frame
+
+
+class LiveSession:
+    """Analyzes the newest frame of a stream within a frame-rate and latency budget
+
+    analyze(data) runs the detectors on one frame and returns its analysis
+    with a "score"; it raises ValueError for frames that can't be decoded,
+    and may raise anything else (a saturated executor, a failed model call).
+    score_window(frames) turns the window's frames into the stream's score
+    and verdict.
+    """
+
+    def __init__(self, analyze: Callable[[object], Awaitable[Dict]],
+                 score_window: Callable[[List[Dict]], Dict], max_fps: float = 5.0,
+                 latency_budget_ms: float = 1000, window_seconds: float = 10.0, max_frames: int = 300):
+        self.analyze = analyze
+        self.score_window = score_window
+        self.interval = 1.0 / max_fps if max_fps > 0 else 0.0
+        self.latency_budget = latency_budget_ms / 1000.0
+        self.window = SlidingWindow(window_seconds, max_frames)
+        self.mailbox = FrameMailbox()
+
+        self.received = 0
+        self.analyzed = 0
+        self.stale = 0
+        self.failed = 0
+        self.over_budget = 0
+        self.verdict: Optional[str] = None
+
+    def offer(self, data, timestamp: float):
+        """Hand over an arriving frame (from the event loop thread)"""
+        self.received += 1
+        self.mailbox.put((data, timestamp, time.monotonic()))
+
+    def skip(self):
+        """Count a frame dropped before it was even decoded"""
+        self.received += 1
+        self.mailbox.drop()
+
+    def close(self):
+        self.mailbox.close()
+
+    def counts(self) -> Dict:
+        return {
+            "received": self.received,
+            "analyzed": self.analyzed,
+            "dropped": self.mailbox.dropped,
+            "stale": self.stale,
+            "failed": self.failed,
+            "over_budget": self.over_budget
+        }
+
+    async def updates(self) -> AsyncIterator[Dict]:
+        """An update per analyzed frame, or an error per frame that couldn't be analyzed"""
+        next_slot = 0.0
+        while True:
+            wait = next_slot - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+            frame = await self.mailbox.take()
+            if frame is None:
+                break
+            data, timestamp, arrived = frame
+
+            started = time.monotonic()
+            if started - arrived > self.latency_budget:
+                self.stale += 1
+                LIVE_FRAMES.labels("stale").inc()
+                continue
+            next_slot = started + self.interval
+
+            try:
+                analysis = await self.analyze(data)
+            except Exception as e:
+                if not isinstance(e, ValueError):
+                    logger.warning("Live frame analysis failed", exc_info=True)
+                self.failed += 1
+                LIVE_FRAMES.labels("failed").inc()
+                yield {"type": "error", "timestamp": round(timestamp, 3), "detail": str(e) or type(e).__name__}
+                continue
+
+            self.analyzed += 1
+            LIVE_FRAMES.labels("analyzed").inc()
+            self.window.add(timestamp, analysis["score"])
+            window = self.score_window(list(self.window.frames))
+
+            latency = time.monotonic() - arrived
+            LIVE_LATENCY_SECONDS.observe(latency)
+            if latency > self.latency_budget:
+                self.over_budget += 1
+
+            changed = window["verdict"] != self.verdict
+            self.verdict = window["verdict"]
+            yield {
+                "type": "update",
+                "timestamp": round(timestamp, 3),
+                "frame_score": round(float(analysis["score"]), 3),
+                "window": {**window, "frames": len(self.window)},
+                "verdict_changed": changed,
+                "latency_ms": round(latency * 1000, 1),
+                "counts": self.counts()
+            }
+
+    def summary(self) -> Dict:
+        """The final message: last verdict, window and counts"""
+        window = None
+        if len(self.window):
+            window = {**self.score_window(list(self.window.frames)), "frames": len(self.window)}
+        return {"type": "summary", "verdict": self.verdict, "window": window, "counts": self.counts()}
+
+
+def read_source(path: str, session: LiveSession, loop: asyncio.AbstractEventLoop,
+                stop: threading.Event):
+    """Feed frames from an RTSP URL or video file into session until it ends or stop is set (blocking)
+
+    Files are played back at their own frame rate, so they behave like a
+    live feed. Only frames the session can still use are converted: while
+    the previous one waits in the mailbox, frames are grabbed but not
+    retrieved.
+    """
+    cap = open_capture(path)
+    try:
+        fps = cap.get(cv2.CAP_PROP_FPS) or 25.0
+        realtime = not is_remote(path)
+        started = time.monotonic()
+        index = 0
+        while not stop.is_set() and cap.grab():
+            timestamp = index / fps
+            index += 1
+            if realtime:
+                delay = started + timestamp - time.monotonic()
+                if delay > 0:
+                    stop.wait(delay)
+
+            # Read from this thread it's only a hint, but a wrong guess costs one frame at most
+            if session.mailbox.waiting:
+                loop.call_soon_threadsafe(session.skip)
+                continue
+            ok, frame = cap.retrieve()
+            if ok:
+                loop.call_soon_threadsafe(session.offer, frame, timestamp)
+    finally:
+        cap.release()
+        loop.call_soon_threadsafe(session.close)
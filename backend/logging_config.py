@@ -0,0 +1,56 @@
+"""
+Logging setup for the API, model server and worker processes
+
+LOG_FORMAT=json writes one JSON object per line - timestamp, level,
+logger, message and any fields passed with `extra=` - so log shippers can
+index them. LOG_FORMAT=text (the development default) prints the message
+followed by the same fields as key=value pairs.
+"""
+import json
+import logging
+import sys
+import time
+
+
+# Attributes every LogRecord has; anything else came from extra=
+_RECORD_ATTRS = set(vars(logging.makeLogRecord({}))) | {"message", "asctime", "taskName"}
+
+
+def _extra_fields(record: logging.LogRecord) -> dict:
+    return {k: v for k, v in vars(record).items() if k not in _RECORD_ATTRS}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            "level": record.levelname,
+            "logger": record.name,
+            "message": record.getMessage(),
+            **_extra_fields(record)
+        }
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)-7s %(name)s: %(message)s", "%H:%M:%S")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = _extra_fields(record)
+        if fields:
+            line += "  " + " ".join(f"{k}={v}" for k, v in fields.items())
+        return line
+
+
+def setup_logging(log_format: str = "text", level: str = "INFO"):
+    """Send all logging to stdout in the given format (safe to call more than once)"""
+    handler = logging.StreamHandler(sys.stdout)
+    handler.setFormatter(JsonFormatter() if log_format == "json" else TextFormatter())
+
+    root = logging.getLogger()
+    root.handlers[:] = [handler]
+    root.setLevel(level.upper())
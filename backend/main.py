@@ -1,25 +1,45 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException
+import time
+PROCESS_STARTED = time.time()  # Reported by /ready as start-to-ready time
+
+from fastapi import FastAPI, File, UploadFile, HTTPException, WebSocket
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse
+from fastapi.responses import JSONResponse, Response, StreamingResponse
 from pydantic import BaseModel, HttpUrl
 import cv2
 import numpy as np
-from typing import Dict, List, Optional
-import tempfile
+from typing import Callable, Dict, List, Optional
 import os
 from pathlib import Path
 import base64
 from io import BytesIO
-from PIL import Image
 import asyncio
-from concurrent.futures import ThreadPoolExecutor
-import json
-import torch
-from torchvision import transforms
-from transformers import AutoImageProcessor, AutoModelForImageClassification
+import threading
+from functools import partial
+import logging
 import warnings
 warnings.filterwarnings('ignore')
 from dotenv import load_dotenv
+from face_detection import FaceTracker
+from frame_context import FrameBuffers
+import deepfake_analyzer
+from deepfake_analyzer import (
+    ADAPTIVE_ERROR_TOLERANCE, ADAPTIVE_MIN_FRAMES, ADAPTIVE_SAMPLING, FACE_DETECT_MAX_DIM, FACE_REDETECT_INTERVAL,
+    KEYFRAME_SAMPLING, ML_BATCH_SIZE, analyzer, ml_model_cache
+)
+from result_cache import ResultCache, content_hash, make_cache_key, youtube_video_id
+from jobs import JobManager, JobQueueFull
+from uploads import UploadLimitMiddleware, map_upload, save_upload, sniff_media_type
+from batch import iter_items, run_pipeline
+from live_stream import LiveSession, read_source
+from admission import AdmissionExecutor, AdmissionMiddleware, Saturated
+from cpu_budget import apply_budget, budget_from_env, effective_threads
+from response_format import dumps, encode_response, frame_view_options, shape_result
+from process_pool import ProcessAnalysisPool
+from inference_scheduler import InferenceScheduler
+from model_server import ModelClient
+from logging_config import setup_logging
+from metrics import CACHE_LOOKUPS, DECODE_SECONDS, DOWNLOAD_SECONDS, MetricsMiddleware, render as render_metrics
+from starlette.concurrency import run_in_threadpool
 
 # Load environment variables
 load_dotenv()
@@ -28,26 +48,112 @@ load_dotenv()
 HOST = os.getenv('HOST', '0.0.0.0')
 PORT = int(os.getenv('PORT', '8000'))
 CORS_ORIGINS = os.getenv('CORS_ORIGINS', 'http://localhost:3000,http://localhost:5173').split(',')
-ML_MODEL_NAME = os.getenv('ML_MODEL_NAME', 'dima806/deepfake_vs_real_image_detection')
-ML_DEVICE = os.getenv('ML_DEVICE', 'auto')
 DEFAULT_SAMPLE_RATE = int(os.getenv('DEFAULT_SAMPLE_RATE', '30'))
+ML_MICROBATCH = os.getenv('ML_MICROBATCH', 'true').lower() == 'true'
+ML_MICROBATCH_MAX_WAIT_MS = float(os.getenv('ML_MICROBATCH_MAX_WAIT_MS', '5'))
+MAX_VIDEO_SIZE_MB = int(os.getenv('MAX_VIDEO_SIZE_MB', '500'))
+MAX_IMAGE_SIZE_MB = int(os.getenv('MAX_IMAGE_SIZE_MB', '25'))
+ANALYSIS_BACKEND = os.getenv('ANALYSIS_BACKEND', 'thread')  # 'thread' or 'process'
 YOUTUBE_DOWNLOAD_DIR = os.getenv('YOUTUBE_DOWNLOAD_DIR', '/tmp')
+YOUTUBE_MAX_HEIGHT = int(os.getenv('YOUTUBE_MAX_HEIGHT', '720'))  # 0 = no cap
+YOUTUBE_STREAMING = os.getenv('YOUTUBE_STREAMING', 'true').lower() == 'true'
+RESULT_CACHE_ENABLED = os.getenv('RESULT_CACHE_ENABLED', 'true').lower() == 'true'
+RESULT_CACHE_SIZE = int(os.getenv('RESULT_CACHE_SIZE', '256'))
+RESULT_CACHE_MEMORY_MB = float(os.getenv('RESULT_CACHE_MEMORY_MB', '128'))
+RESULT_CACHE_DB = os.getenv('RESULT_CACHE_DB') or ''  # Empty = memory tier only
+RESULT_CACHE_MAX_MB = int(os.getenv('RESULT_CACHE_MAX_MB', '512'))
+RESULT_CACHE_TTL = int(os.getenv('RESULT_CACHE_TTL', '86400'))
+# Threads for the analysis executor, torch, OpenCV, BLAS and pool workers, from the
+# usable CPUs (affinity and cgroup quota); each layer can be fixed, see cpu_budget.py
+CPU_BUDGET = budget_from_env()
+ANALYSIS_THREADS = CPU_BUDGET["analysis_threads"]  # Threads running image/video analyses
+IMAGE_RESERVED_THREADS = int(os.getenv('IMAGE_RESERVED_THREADS', '1'))  # Of those, kept free for image requests
+IMAGE_QUEUE_SIZE = int(os.getenv('IMAGE_QUEUE_SIZE', '32'))  # Waiting image analyses before 503
+VIDEO_QUEUE_SIZE = int(os.getenv('VIDEO_QUEUE_SIZE', '8'))  # Waiting video/YouTube analyses before 503
+BATCH_MAX_CONCURRENT = int(os.getenv('BATCH_MAX_CONCURRENT', '2'))  # /analyze/batch streams at once
+LIVE_MAX_STREAMS = int(os.getenv('LIVE_MAX_STREAMS', '4'))  # /ws/live streams at once
+LIVE_MAX_FPS = float(os.getenv('LIVE_MAX_FPS', '5'))  # Frames analyzed per second and stream; the rest are dropped
+LIVE_LATENCY_BUDGET_MS = int(os.getenv('LIVE_LATENCY_BUDGET_MS', '1000'))  # Older frames are dropped
+LIVE_WINDOW_SECONDS = float(os.getenv('LIVE_WINDOW_SECONDS', '10'))  # Span of the sliding-window verdict
+LIVE_WINDOW_MAX_FRAMES = int(os.getenv('LIVE_WINDOW_MAX_FRAMES', '300'))
+LIVE_SOURCES_ENABLED = os.getenv('LIVE_SOURCES_ENABLED', 'false').lower() == 'true'  # Let clients name an RTSP URL/file
+BATCH_MAX_ITEMS = int(os.getenv('BATCH_MAX_ITEMS', '10000'))
+BATCH_MAX_SIZE_MB = int(os.getenv('BATCH_MAX_SIZE_MB', '2048'))
+BATCH_PIPELINE_DEPTH = int(os.getenv('BATCH_PIPELINE_DEPTH', '2'))  # Chunks of ML_BATCH_SIZE images in flight
+JOB_MAX_PENDING = int(os.getenv('JOB_MAX_PENDING', '16'))
+JOB_RETENTION_COUNT = int(os.getenv('JOB_RETENTION_COUNT', '100'))
+JOB_RETENTION_SECONDS = int(os.getenv('JOB_RETENTION_SECONDS', '3600'))
 ENVIRONMENT = os.getenv('ENVIRONMENT', 'development')
+# Empty in .env.example, so `or`: a set-but-empty variable means the default too
+LOG_FORMAT = os.getenv('LOG_FORMAT') or ('json' if ENVIRONMENT == 'production' else 'text')
+LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+
+setup_logging(LOG_FORMAT, LOG_LEVEL)
+logger = logging.getLogger(__name__)
 
 try:
     import yt_dlp
     YOUTUBE_ENABLED = True
 except ImportError:
     YOUTUBE_ENABLED = False
-    print("⚠️  yt-dlp not installed. YouTube URL analysis disabled.")
+    logger.warning("yt-dlp not installed, YouTube URL analysis disabled")
 
 
 class YouTubeURLRequest(BaseModel):
     url: str
     sample_rate: Optional[int] = None  # Will use DEFAULT_SAMPLE_RATE if not provided
+    keyframes_only: Optional[bool] = None  # Will use KEYFRAME_SAMPLING if not provided
+    adaptive: Optional[bool] = None  # Will use ADAPTIVE_SAMPLING if not provided
+    error_tolerance: Optional[float] = None  # Will use ADAPTIVE_ERROR_TOLERANCE if not provided
+    max_frames: Optional[int] = None  # Adaptive frame budget, defaults to sample_rate
+    frame_format: Optional[str] = None  # 'full' (default) or 'columnar', see response_format
+    float32: Optional[bool] = None  # Columnar arrays as packed float32 buffers
+    output: Optional[str] = None  # 'json' (default) or 'msgpack'
+    frame_offset: Optional[int] = None  # Page of frame_by_frame to return
+    frame_limit: Optional[int] = None
 
 app = FastAPI(title="Deepfake Detection API")
 
+# Reject oversized uploads before (and while) the body is read.
+# Added before CORS so its 413/415 (and the admission 503/429) responses
+# still carry CORS headers.
+MAX_VIDEO_BYTES = MAX_VIDEO_SIZE_MB * 1024 * 1024
+MAX_IMAGE_BYTES = MAX_IMAGE_SIZE_MB * 1024 * 1024
+MAX_BATCH_BYTES = BATCH_MAX_SIZE_MB * 1024 * 1024
+app.add_middleware(
+    UploadLimitMiddleware,
+    limits={
+        "/analyze/image": MAX_IMAGE_BYTES,
+        "/analyze/batch": MAX_BATCH_BYTES,
+        "/analyze/video": MAX_VIDEO_BYTES,
+        "/jobs/video": MAX_VIDEO_BYTES
+    }
+)
+
+
+def video_admission() -> Optional[HTTPException]:
+    try:
+        video_lane.check()
+    except Saturated as e:
+        return service_saturated(e)
+    return None
+
+
+def video_job_admission() -> Optional[HTTPException]:
+    try:
+        job_manager.check_capacity()
+    except JobQueueFull as e:
+        return job_queue_full(e)
+    return None
+
+
+# Outside the upload limits: a busy server answers 503/429 before reading
+# (and hashing) a video upload of up to MAX_VIDEO_SIZE_MB
+app.add_middleware(
+    AdmissionMiddleware,
+    checks={"/analyze/video": video_admission, "/jobs/video": video_job_admission}
+)
+
 # CORS middleware - configured from environment
 app.add_middleware(
     CORSMiddleware,
@@ -57,507 +163,107 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
-# Thread pool for CPU-intensive tasks
-executor = ThreadPoolExecutor(max_workers=4)
+# Outermost, so rejected uploads are counted and timed too
+app.add_middleware(MetricsMiddleware)
+
+# OpenCV's threads now; torch's once it is imported
+apply_budget(CPU_BUDGET)
+
+# Analysis threads, shared by lanes in priority order: interactive images
+# and live streams first, then videos, background jobs and bulk batches.
+# Queues are bounded (JobManager bounds the job lane; a live stream has one
+# frame in flight) and a full one answers 503.
+executor = AdmissionExecutor(ANALYSIS_THREADS, reserved=IMAGE_RESERVED_THREADS)
+image_lane = executor.add_lane("image", 0, max_queued=IMAGE_QUEUE_SIZE, interactive=True)
+live_lane = executor.add_lane("live", 1, max_queued=LIVE_MAX_STREAMS, interactive=True)
+video_lane = executor.add_lane("video", 2, max_queued=VIDEO_QUEUE_SIZE)
+job_lane = executor.add_lane("job", 3)
+batch_lane = executor.add_lane("batch", 4, max_queued=BATCH_MAX_CONCURRENT * BATCH_PIPELINE_DEPTH)
+batch_slots = asyncio.Semaphore(BATCH_MAX_CONCURRENT)
+live_slots = asyncio.Semaphore(LIVE_MAX_STREAMS)
+
+job_manager = JobManager(
+    job_lane,
+    max_pending=JOB_MAX_PENDING,
+    max_retained=JOB_RETENTION_COUNT,
+    retention_seconds=JOB_RETENTION_SECONDS
+)
+
+# Cache of finished analyses, keyed by content hash + analysis parameters
+result_cache = ResultCache(
+    max_entries=RESULT_CACHE_SIZE,
+    max_memory_mb=RESULT_CACHE_MEMORY_MB,
+    db_path=RESULT_CACHE_DB or None,
+    max_disk_mb=RESULT_CACHE_MAX_MB,
+    ttl_seconds=RESULT_CACHE_TTL
+) if RESULT_CACHE_ENABLED else None
 
-# Global ML model cache
-ml_model_cache = {
-    "model": None,
-    "processor": None,
-    "device": None
-}
+
+def cache_lookup(cache_key: str) -> Optional[Dict]:
+    """Cached result for cache_key, counting hits and misses for /metrics"""
+    cached = result_cache.get(cache_key)
+    CACHE_LOOKUPS.labels("hit" if cached is not None else "miss").inc()
+    return cached
+
+# Set once the model is loaded and the analysis backend is warm (see /ready)
+startup_complete = threading.Event()
 
 
 def load_ml_model():
-    """Load the ML model on first use (lazy loading)"""
-    if ml_model_cache["model"] is None:
-        try:
-            print("🤖 Loading AI model... This may take a minute on first run...")
-            
-            # Determine device from config or auto-detect
-            if ML_DEVICE == 'auto':
-                device = "cuda" if torch.cuda.is_available() else "cpu"
-            else:
-                device = ML_DEVICE
-            
-            ml_model_cache["device"] = device
-            print(f"   Using device: {device}")
-            
-            # Load pre-trained deepfake detection model from config
-            model_name = ML_MODEL_NAME
-            
-            print(f"   Loading model: {model_name}")
-            print("   Downloading model weights (first time only)...")
-            ml_model_cache["processor"] = AutoImageProcessor.from_pretrained(model_name)
-            ml_model_cache["model"] = AutoModelForImageClassification.from_pretrained(model_name)
-            ml_model_cache["model"].to(device)
-            ml_model_cache["model"].eval()
-            
-            print("✓  AI model loaded successfully!")
-            return True
-        except Exception as e:
-            print(f"⚠  Warning: Could not load ML model: {e}")
-            print("   Falling back to heuristic methods only")
-            return False
-    return True
-
-
-class DeepfakeAnalyzer:
-    """Multi-method deepfake detection analyzer"""
-    
-    def __init__(self):
-        self.methods_weights = {
-            "ml_model": 0.45,                    # AI/ML detection (highest weight)
-            "frequency_analysis": 0.20,
-            "facial_consistency": 0.15,
-            "compression_artifacts": 0.12,
-            "color_analysis": 0.08
-        }
-        # Note: temporal_coherence is analyzed separately for videos at the frame-to-frame level
-        self.ml_available = load_ml_model()
-    
-    def analyze_image(self, image: np.ndarray) -> Dict:
-        """Analyze a single image for deepfake indicators"""
-        results = {}
-        
-        try:
-            # ML Model Detection (if available)
-            if self.ml_available:
-                results["ml_model"] = self._ml_detection(image)
-            
-            results["frequency_analysis"] = self._frequency_analysis(image)
-            results["facial_consistency"] = self._facial_consistency(image)
-            results["compression_artifacts"] = self._compression_artifacts(image)
-            results["color_analysis"] = self._color_analysis(image)
-        except Exception as e:
-            print(f"Analysis error: {str(e)}")
-            
-        return results
-    
-    def analyze_video(self, video_path: str, sample_rate: int = 30) -> Dict:
-        """Analyze video for deepfake indicators"""
-        cap = cv2.VideoCapture(video_path)
-        
-        if not cap.isOpened():
-            raise ValueError("Could not open video file")
-        
-        total_frames = int(cap.get(cv2.CAP_PROP_FRAME_COUNT))
-        fps = cap.get(cv2.CAP_PROP_FPS)
-        duration = total_frames / fps if fps > 0 else 0
-        
-        print(f"📹 Analyzing video: {total_frames} frames, {fps} FPS, {duration:.1f}s duration")
-        print(f"   ML Model available: {self.ml_available}")
-        
-        # Sample frames evenly throughout video
-        frame_indices = np.linspace(0, total_frames - 1, min(sample_rate, total_frames), dtype=int)
-        
-        frame_results = []
-        suspicious_frames = []
-        ml_detections = 0
-        
-        for idx in frame_indices:
-            cap.set(cv2.CAP_PROP_POS_FRAMES, idx)
-            ret, frame = cap.read()
-            
-            if not ret:
-                continue
-            
-            # Analyze this frame
-            frame_analysis = self.analyze_image(frame)
-            
-            # Track if ML ran
-            if "ml_model" in frame_analysis and frame_analysis["ml_model"]["score"] > 0:
-                ml_detections += 1
-            
-            frame_score = self._calculate_frame_score(frame_analysis)
-            
-            timestamp = idx / fps if fps > 0 else 0
-            
-            frame_results.append({
-                "frame_number": int(idx),
-                "timestamp": round(float(timestamp), 2),
-                "score": float(frame_score),
-                "details": frame_analysis
-            })
-            
-            # Mark suspicious frames (score > 0.6)
-            if frame_score > 0.6:
-                suspicious_frames.append({
-                    "frame": int(idx),
-                    "timestamp": round(float(timestamp), 2),
-                    "confidence": float(frame_score)
-                })
-        
-        cap.release()
-        
-        print(f"✓ Analysis complete: ML ran on {ml_detections}/{len(frame_results)} frames")
-        
-        # Calculate overall video statistics
-        scores = [f["score"] for f in frame_results]
-        overall_score = np.mean(scores) if scores else 0
-        score_variance = np.var(scores) if scores else 0
-        
-        # Temporal coherence check
-        temporal_score = self._temporal_coherence_analysis(frame_results)
-        
-        print(f"📊 Score breakdown:")
-        print(f"   Overall frame score: {overall_score:.3f}")
-        print(f"   Temporal coherence: {temporal_score:.3f}")
-        
-        # Aggregate final verdict - trust the ML model more, reduce temporal weight
-        # If ML is consistently high, that's suspicious even if temporally consistent
-        final_score = (overall_score * 0.85) + (temporal_score * 0.15)
-        
-        print(f"   Final weighted score: {final_score:.3f} ({final_score*100:.1f}%)")
-        
-        return {
-            "video_info": {
-                "total_frames": int(total_frames),
-                "fps": round(float(fps), 2),
-                "duration_seconds": round(float(duration), 2),
-                "frames_analyzed": len(frame_results)
-            },
-            "overall_analysis": {
-                "deepfake_probability": round(float(final_score * 100), 2),
-                "confidence_score": round(float(final_score), 3),
-                "verdict": self._get_verdict(final_score),
-                "risk_level": self._get_risk_level(final_score)
-            },
-            "statistics": {
-                "mean_score": round(float(np.mean(scores)), 3),
-                "max_score": round(float(np.max(scores)), 3),
-                "min_score": round(float(np.min(scores)), 3),
-                "score_variance": round(float(score_variance), 3),
-                "suspicious_frame_count": len(suspicious_frames)
-            },
-            "method_breakdown": self._get_method_breakdown(frame_results),
-            "suspicious_segments": suspicious_frames[:10],  # Top 10 most suspicious
-            "frame_by_frame": frame_results
-        }
-    
-    def _ml_detection(self, image: np.ndarray) -> Dict:
-        """AI/ML-based deepfake detection using pre-trained neural network"""
-        try:
-            if not self.ml_available or ml_model_cache["model"] is None:
-                return {
-                    "score": 0.0,
-                    "confidence": 0.0,
-                    "suspicious": False,
-                    "details": "ML model not available",
-                    "prediction": "unknown"
-                }
-            
-            # Convert OpenCV image (BGR) to PIL Image (RGB)
-            image_rgb = cv2.cvtColor(image, cv2.COLOR_BGR2RGB)
-            pil_image = Image.fromarray(image_rgb)
-            
-            # Resize image to expected input size
-            pil_image = pil_image.resize((224, 224))
-            
-            # Preprocess image with padding enabled
-            inputs = ml_model_cache["processor"](
-                images=pil_image, 
-                return_tensors="pt",
-                padding=True
-            )
-            inputs = {k: v.to(ml_model_cache["device"]) for k, v in inputs.items()}
-            
-            # Run inference
-            with torch.no_grad():
-                outputs = ml_model_cache["model"](**inputs)
-                logits = outputs.logits
-                
-                # Get probabilities
-                probs = torch.nn.functional.softmax(logits, dim=-1)
-                
-                # Handle different model output formats
-                if probs.shape[-1] == 2:
-                    fake_prob = float(probs[0][0])  # Probability of being fake
-                    real_prob = float(probs[0][1])  # Probability of being real
-                else:
-                    # Single output models
-                    fake_prob = float(probs[0][0])
-                    real_prob = 1.0 - fake_prob
-                
-                # Determine prediction
-                is_fake = fake_prob > real_prob
-                confidence = max(fake_prob, real_prob)
-                
-                # Score is the probability of being fake (0-1 scale)
-                score = float(fake_prob)
-            
-            return {
-                "score": round(score, 3),
-                "confidence": round(confidence, 3),
-                "fake_probability": round(fake_prob * 100, 2),
-                "real_probability": round(real_prob * 100, 2),
-                "suspicious": bool(is_fake),
-                "details": f"AI Model: {'FAKE' if is_fake else 'REAL'} ({confidence*100:.1f}% confidence)",
-                "prediction": "fake" if is_fake else "real"
-            }
-            
-        except Exception as e:
-            print(f"ML detection error: {e}")
-            import traceback
-            traceback.print_exc()
-            return {
-                "score": 0.0,
-                "confidence": 0.0,
-                "suspicious": False,
-                "details": f"ML detection failed: {str(e)}",
-                "prediction": "error"
-            }
-    
-    def _frequency_analysis(self, image: np.ndarray) -> Dict:
-        """Analyze frequency domain for deepfake artifacts"""
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        
-        # Apply FFT
-        f_transform = np.fft.fft2(gray)
-        f_shift = np.fft.fftshift(f_transform)
-        magnitude_spectrum = np.abs(f_shift)
-        
-        # Analyze high frequency components
-        h, w = magnitude_spectrum.shape
-        center_h, center_w = h // 2, w // 2
-        
-        # Get high frequency region (outer 30%)
-        mask = np.zeros((h, w))
-        mask[0:int(h*0.3), :] = 1
-        mask[int(h*0.7):, :] = 1
-        mask[:, 0:int(w*0.3)] = 1
-        mask[:, int(w*0.7):] = 1
-        
-        high_freq_energy = np.sum(magnitude_spectrum * mask)
-        total_energy = np.sum(magnitude_spectrum)
-        
-        high_freq_ratio = high_freq_energy / total_energy if total_energy > 0 else 0
-        
-        # Deepfakes often have unusual high-frequency patterns
-        # Normal images: 0.15-0.35, Deepfakes often: 0.40-0.60
-        anomaly_score = 0
-        if high_freq_ratio > 0.40:
-            anomaly_score = min((high_freq_ratio - 0.35) / 0.25, 1.0)
-        elif high_freq_ratio < 0.15:
-            anomaly_score = min((0.15 - high_freq_ratio) / 0.15, 1.0)
-        
-        return {
-            "score": round(float(anomaly_score), 3),
-            "high_freq_ratio": round(float(high_freq_ratio), 3),
-            "suspicious": bool(anomaly_score > 0.5),
-            "details": "Unusual frequency distribution detected" if anomaly_score > 0.5 else "Normal frequency distribution"
-        }
-    
-    def _facial_consistency(self, image: np.ndarray) -> Dict:
-        """Check for facial landmark consistency"""
-        # Load face detector
-        face_cascade = cv2.CascadeClassifier(cv2.data.haarcascades + 'haarcascade_frontalface_default.xml')
-        gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-        
-        faces = face_cascade.detectMultiScale(gray, 1.3, 5)
-        
-        if len(faces) == 0:
-            return {
-                "score": 0.0,
-                "faces_detected": 0,
-                "suspicious": False,
-                "details": "No faces detected"
-            }
-        
-        anomaly_score = 0
-        details = []
-        
-        for (x, y, w, h) in faces:
-            face_roi = image[y:y+h, x:x+w]
-            
-            # Check for edge artifacts
-            edges = cv2.Canny(face_roi, 100, 200)
-            edge_density = np.sum(edges > 0) / (w * h)
-            
-            # Deepfakes often have unusual edge densities
-            if edge_density > 0.15 or edge_density < 0.03:
-                anomaly_score += 0.3
-                details.append("Unusual edge density detected")
-            
-            # Check face-background boundary
-            boundary_top = image[max(0, y-5):y, x:x+w]
-            boundary_bottom = image[y+h:min(image.shape[0], y+h+5), x:x+w]
-            
-            if boundary_top.size > 0 and boundary_bottom.size > 0:
-                face_mean = np.mean(face_roi)
-                boundary_mean = (np.mean(boundary_top) + np.mean(boundary_bottom)) / 2
-                
-                # Abrupt transitions can indicate face swapping
-                if abs(face_mean - boundary_mean) > 50:
-                    anomaly_score += 0.2
-                    details.append("Sharp boundary transition detected")
-        
-        anomaly_score = min(anomaly_score / len(faces), 1.0)
-        
-        return {
-            "score": round(float(anomaly_score), 3),
-            "faces_detected": int(len(faces)),
-            "suspicious": bool(anomaly_score > 0.4),
-            "details": "; ".join(details) if details else "Normal facial characteristics"
-        }
-    
-    def _compression_artifacts(self, image: np.ndarray) -> Dict:
-        """Detect compression artifacts that may indicate manipulation"""
-        # Convert to YCrCb color space
-        ycrcb = cv2.cvtColor(image, cv2.COLOR_BGR2YCrCb)
-        y_channel = ycrcb[:, :, 0]
-        
-        # Calculate blocking artifacts (8x8 DCT blocks from JPEG)
-        h, w = y_channel.shape
-        block_size = 8
-        
-        artifact_score = 0
-        block_count = 0
-        
-        for i in range(0, h - block_size, block_size):
-            for j in range(0, w - block_size, block_size):
-                block = y_channel[i:i+block_size, j:j+block_size]
-                
-                # Check for blocking artifacts at boundaries
-                if i + block_size < h:
-                    boundary_diff = np.mean(np.abs(
-                        y_channel[i+block_size, j:j+block_size].astype(float) - 
-                        y_channel[i+block_size-1, j:j+block_size].astype(float)
-                    ))
-                    
-                    if boundary_diff > 15:  # Visible blocking
-                        artifact_score += 1
-                
-                block_count += 1
-        
-        artifact_ratio = artifact_score / block_count if block_count > 0 else 0
-        
-        # Deepfakes often have inconsistent compression
-        anomaly_score = min(artifact_ratio / 0.1, 1.0)
-        
-        return {
-            "score": round(float(anomaly_score), 3),
-            "artifact_density": round(float(artifact_ratio), 3),
-            "suspicious": bool(anomaly_score > 0.5),
-            "details": "Compression artifacts detected" if anomaly_score > 0.5 else "Normal compression pattern"
-        }
-    
-    def _color_analysis(self, image: np.ndarray) -> Dict:
-        """Analyze color distribution for inconsistencies"""
-        # Convert to LAB color space for perceptual analysis
-        lab = cv2.cvtColor(image, cv2.COLOR_BGR2LAB)
-        
-        # Calculate color statistics
-        l_channel, a_channel, b_channel = cv2.split(lab)
-        
-        # Check for unusual color distributions
-        l_std = np.std(l_channel)
-        a_std = np.std(a_channel)
-        b_std = np.std(b_channel)
-        
-        # Deepfakes can have unusual color variance
-        # Normal images typically have balanced color distribution
-        color_balance = np.std([l_std, a_std, b_std])
-        
-        # High imbalance can indicate manipulation
-        anomaly_score = min(color_balance / 30.0, 1.0)
-        
-        return {
-            "score": round(float(anomaly_score), 3),
-            "color_balance": round(float(color_balance), 2),
-            "suspicious": bool(anomaly_score > 0.6),
-            "details": "Unusual color distribution" if anomaly_score > 0.6 else "Normal color characteristics"
-        }
-    
-    def _temporal_coherence_analysis(self, frame_results: List[Dict]) -> float:
-        """Analyze temporal consistency across frames"""
-        if len(frame_results) < 2:
-            return 0.0
-        
-        scores = [f["score"] for f in frame_results]
-        
-        # Calculate frame-to-frame score variance
-        score_diffs = [abs(scores[i+1] - scores[i]) for i in range(len(scores)-1)]
-        
-        # High variance can indicate inconsistent manipulation
-        variance_score = np.mean(score_diffs) if score_diffs else 0
-        
-        # Normalize to 0-1 range
-        return min(variance_score / 0.3, 1.0)
-    
-    def _calculate_frame_score(self, frame_analysis: Dict) -> float:
-        """Calculate weighted score for a single frame"""
-        total_score = 0
-        
-        for method, weight in self.methods_weights.items():
-            if method in frame_analysis:
-                total_score += frame_analysis[method]["score"] * weight
-        
-        return min(total_score, 1.0)
-    
-    def _get_method_breakdown(self, frame_results: List[Dict]) -> Dict:
-        """Get average scores for each detection method"""
-        breakdown = {}
-        
-        for method in self.methods_weights.keys():
-            scores = []
-            for frame in frame_results:
-                if method in frame["details"]:
-                    scores.append(frame["details"][method]["score"])
-            
-            if scores:
-                breakdown[method] = {
-                    "average_score": round(float(np.mean(scores)), 3),
-                    "weight": self.methods_weights[method],
-                    "contribution": round(float(np.mean(scores) * self.methods_weights[method] * 100), 2)
-                }
-        
-        return breakdown
-    
-    def _get_verdict(self, score: float) -> str:
-        """Get human-readable verdict"""
-        if score >= 0.75:
-            return "HIGHLY LIKELY FAKE"
-        elif score >= 0.60:
-            return "LIKELY FAKE"
-        elif score >= 0.40:
-            return "SUSPICIOUS"
-        elif score >= 0.25:
-            return "POSSIBLY AUTHENTIC"
-        else:
-            return "LIKELY AUTHENTIC"
-    
-    def _get_risk_level(self, score: float) -> str:
-        """Get risk level classification"""
-        if score >= 0.75:
-            return "CRITICAL"
-        elif score >= 0.60:
-            return "HIGH"
-        elif score >= 0.40:
-            return "MEDIUM"
-        elif score >= 0.25:
-            return "LOW"
-        else:
-            return "MINIMAL"
+    """Load the model (see deepfake_analyzer.load_ml_model) with torch sized by the CPU budget"""
+    return deepfake_analyzer.load_ml_model(CPU_BUDGET["torch_threads"])
+
+
+async def wait_for_model():
+    """Wait for the model to finish loading without blocking the event loop"""
+    if not ml_model_cache["loaded"]:
+        await run_in_threadpool(load_ml_model)
 
 
-# Initialize analyzer
-analyzer = DeepfakeAnalyzer()
+def warm_up():
+    """Load the model and start the analysis backend, then mark the service ready"""
+    load_ml_model()
+    if ANALYSIS_BACKEND == 'process':
+        analyzer.process_pool = ProcessAnalysisPool(
+            CPU_BUDGET["pool_workers"], CPU_BUDGET["pool_worker_threads"], pin=CPU_BUDGET["pinning"]
+        )
+        analyzer.process_pool.warm_up()
+    if not analyzer.ml_available:
+        logger.warning("AI model disabled, using heuristics only (accuracy 50-70%)")
+    startup_complete.set()
+    logger.info("Ready", extra={
+        "startup_seconds": round(time.time() - PROCESS_STARTED, 1),
+        "ai_enabled": analyzer.ml_available,
+        "analysis_workers": analyzer.process_pool.workers if analyzer.process_pool is not None else None
+    })
 
 
 @app.on_event("startup")
 async def startup_event():
-    """Pre-load ML model on startup"""
-    print("\n" + "="*60)
-    print("🚀 Starting Deepfake Detection Platform")
-    print("="*60)
-    if analyzer.ml_available:
-        print("✓  AI Model: ENABLED (Deep Learning)")
-        print("   Accuracy: 75-90%")
-    else:
-        print("⚠  AI Model: DISABLED (Heuristics only)")
-        print("   Accuracy: 50-70%")
-    print("="*60 + "\n")
+    """Start loading the ML model in the background; /ready reports when it's done"""
+    logger.info("Starting Deepfake Detection Platform", extra={"environment": ENVIRONMENT})
+    logger.info("CPU budget", extra={
+        **{k: v for k, v in CPU_BUDGET.items() if k != "detected"},
+        **{f"detected_{k}": v for k, v in CPU_BUDGET["detected"].items()}
+    })
+    if ML_MICROBATCH:
+        analyzer.inference_scheduler = InferenceScheduler(
+            analyzer._ml_detection_batch,
+            max_batch_size=ML_BATCH_SIZE,
+            max_wait_ms=ML_MICROBATCH_MAX_WAIT_MS
+        )
+    # In the background so /health answers while the model loads.
+    # The process pool is created here rather than at import: its workers import this module too
+    asyncio.get_event_loop().run_in_executor(None, warm_up)
+
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    executor.shutdown(wait=False)
+    if analyzer.process_pool is not None:
+        analyzer.process_pool.shutdown()
+    if analyzer.inference_scheduler is not None:
+        analyzer.inference_scheduler.shutdown()
 
 
 @app.get("/")
@@ -566,9 +272,59 @@ async def root():
         "service": "Deepfake Detection API",
         "version": "2.0.0",
         "status": "operational",
-        "ai_enabled": analyzer.ml_available,
+        "ai_enabled": ml_model_cache["available"],
         "detection_methods": list(analyzer.methods_weights.keys()),
-        "accuracy": "75-90%" if analyzer.ml_available else "50-70%"
+        "accuracy": "75-90%" if ml_model_cache["available"] else "50-70%"
+    }
+
+
+def service_saturated(e: Saturated) -> HTTPException:
+    return HTTPException(status_code=503, detail=f"Service busy: {e}", headers={"Retry-After": str(e.retry_after)})
+
+
+def analyze_one_image(image: np.ndarray) -> Dict:
+    """Analyze one image in-thread or on the process pool (blocking)"""
+    if analyzer.process_pool is not None:
+        return analyzer.process_pool.submit([image]).result()[0]
+    return analyzer.analyze_image(image)
+
+
+def analyze_image_upload(fileobj) -> tuple:
+    """(result, cached) for an uploaded image (blocking)"""
+    # Map the spooled upload instead of reading it into memory
+    with map_upload(fileobj, "image", MAX_IMAGE_BYTES) as data:
+        # Repeat uploads of the same bytes return the stored result
+        cache_key = None
+        if result_cache is not None:
+            cache_key = make_cache_key("image", content_hash(data), analyzer.cache_params())
+            cached = cache_lookup(cache_key)
+            if cached is not None:
+                return cached, True
+        
+        with DECODE_SECONDS.labels("image").time():
+            image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+    
+    if image is None:
+        raise HTTPException(status_code=400, detail="Could not decode image")
+    
+    # Concurrent requests still share model batches
+    result = image_result(analyze_one_image(image))
+    if cache_key is not None:
+        result_cache.set(cache_key, result)
+    return result, False
+
+
+def image_result(analysis: Dict) -> Dict:
+    """Response body for one analyzed image"""
+    score = analyzer._calculate_frame_score(analysis)
+    return {
+        "analysis": {
+            "deepfake_probability": round(float(score * 100), 2),
+            "confidence_score": round(float(score), 3),
+            "verdict": analyzer._get_verdict(score),
+            "risk_level": analyzer._get_risk_level(score)
+        },
+        "method_breakdown": analysis
     }
 
 
@@ -579,36 +335,289 @@ async def analyze_image(file: UploadFile = File(...)):
     if not file.content_type.startswith("image/"):
         raise HTTPException(status_code=400, detail="File must be an image")
     
+    # Cache keys depend on which model loaded
+    await wait_for_model()
+    
     try:
-        # Read image
-        contents = await file.read()
-        nparr = np.frombuffer(contents, np.uint8)
-        image = cv2.imdecode(nparr, cv2.IMREAD_COLOR)
-        
-        if image is None:
-            raise HTTPException(status_code=400, detail="Could not decode image")
+        # Hashing, decoding and the detectors all run on the image lane, which
+        # goes ahead of queued videos, so a large upload never stalls the event loop
+        loop = asyncio.get_event_loop()
+        result, cached = await loop.run_in_executor(image_lane, analyze_image_upload, file.file)
+        return {"filename": file.filename, **result, "cached": cached}
+    
+    except HTTPException:
+        raise
+    except Saturated as e:
+        raise service_saturated(e)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
+
+
+def analyze_batch_chunk(chunk: List[tuple]) -> List[Dict]:
+    """Decode and analyze one chunk of /analyze/batch items (blocking), one result per item
+    
+    Cached images are answered from the cache and bad ones get an "error";
+    the rest share one analyze_images call, so one model forward pass.
+    """
+    results = {}
+    pending = []  # (line, image, cache_key)
+    
+    for index, name, data, error in chunk:
+        line = {"index": index, "filename": name}
+        
+        if error is None and sniff_media_type(data[:256]) != "image":
+            error = "File content is not a supported image format"
+        
+        if error is None:
+            cache_key = None
+            if result_cache is not None:
+                cache_key = make_cache_key("image", content_hash(data), analyzer.cache_params())
+                cached = cache_lookup(cache_key)
+                if cached is not None:
+                    results[index] = {**line, **cached, "cached": True}
+                    continue
+            
+            with DECODE_SECONDS.labels("image").time():
+                image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+            if image is not None:
+                pending.append((line, image, cache_key))
+                continue
+            error = "Could not decode image"
         
-        # Analyze image
-        analysis = analyzer.analyze_image(image)
-        score = analyzer._calculate_frame_score(analysis)
+        results[index] = {**line, "error": error}
+    
+    if pending:
+        images = [image for _, image, _ in pending]
+        if analyzer.process_pool is not None:
+            analyses = analyzer.process_pool.submit(images).result()
+        else:
+            analyses = analyzer.analyze_images(images)
         
-        return {
-            "filename": file.filename,
-            "analysis": {
-                "deepfake_probability": round(float(score * 100), 2),
-                "confidence_score": round(float(score), 3),
-                "verdict": analyzer._get_verdict(score),
-                "risk_level": analyzer._get_risk_level(score)
-            },
-            "method_breakdown": analysis
+        for (line, _, cache_key), analysis in zip(pending, analyses):
+            result = image_result(analysis)
+            if cache_key is not None:
+                result_cache.set(cache_key, result)
+            results[line["index"]] = {**line, **result, "cached": False}
+    
+    return [results[index] for index, _, _, _ in chunk]
+
+
+@app.post("/analyze/batch")
+async def analyze_batch(files: List[UploadFile] = File(...)):
+    """Analyze many images - several file parts, or one tar/zip archive of them
+    
+    Streams one NDJSON line per image as soon as it is analyzed, in
+    completion order ("index" gives the upload order), then a final
+    {"done": true, "items", "failed"} line. A bad image gets an "error"
+    line without failing the batch.
+    """
+    if batch_slots.locked():
+        raise service_saturated(Saturated("batch", 60))
+    
+    # Cache keys depend on which model loaded
+    await wait_for_model()
+    
+    items = iter_items(files, MAX_IMAGE_BYTES, BATCH_MAX_ITEMS)
+    
+    async def stream():
+        # Holding a slot keeps the batch lane's queue within its bound
+        async with batch_slots:
+            async for line in run_pipeline(items, analyze_batch_chunk, batch_lane, ML_BATCH_SIZE,
+                                           BATCH_PIPELINE_DEPTH):
+                yield line
+    
+    return StreamingResponse(
+        stream(),
+        media_type="application/x-ndjson",
+        headers={"X-Accel-Buffering": "no"}
+    )
+
+
+def adaptive_options(adaptive: Optional[bool], error_tolerance: Optional[float],
+                     max_frames: Optional[int]) -> Optional[Dict]:
+    """Adaptive sampling settings from the request and config, or None for fixed sampling"""
+    if not (adaptive if adaptive is not None else ADAPTIVE_SAMPLING):
+        return None
+    
+    error_tolerance = error_tolerance if error_tolerance is not None else ADAPTIVE_ERROR_TOLERANCE
+    if not 0 < error_tolerance < 1:
+        raise HTTPException(status_code=400, detail="error_tolerance must be between 0 and 1")
+    if max_frames is not None and max_frames < 1:
+        raise HTTPException(status_code=400, detail="max_frames must be at least 1")
+    
+    return {"error_tolerance": error_tolerance, "max_frames": max_frames}
+
+
+def video_cache_key(kind: str, source_id: str, sample_rate: int, keyframes_only: bool,
+                    adaptive: Optional[Dict] = None, max_height: Optional[int] = None) -> Optional[str]:
+    """Result cache key for a video, or None when caching is disabled"""
+    if result_cache is None:
+        return None
+    params = {**analyzer.cache_params(), "sample_rate": sample_rate, "keyframes_only": keyframes_only}
+    if adaptive is not None:
+        params["adaptive"] = {**adaptive, "min_frames": ADAPTIVE_MIN_FRAMES}
+    if max_height is not None:
+        params["max_height"] = max_height
+    return make_cache_key(kind, source_id, params)
+
+
+def run_video_analysis(video_path: str, filename: str, sample_rate: int, keyframes_only: bool,
+                       cache_key: Optional[str] = None,
+                       progress_callback: Optional[Callable[[Dict], None]] = None,
+                       adaptive: Optional[Dict] = None) -> Dict:
+    """Analyze a saved video file, answering from the result cache when possible"""
+    if cache_key is not None:
+        cached = cache_lookup(cache_key)
+        if cached is not None:
+            cached["filename"] = filename
+            cached["cached"] = True
+            return cached
+    
+    result = analyzer.analyze_video(
+        video_path, sample_rate,
+        keyframes_only=keyframes_only,
+        progress_callback=progress_callback,
+        adaptive=adaptive
+    )
+    
+    if cache_key is not None:
+        result_cache.set(cache_key, result)
+    
+    result["filename"] = filename
+    result["cached"] = False
+    return result
+
+
+def youtube_format(max_height: int) -> str:
+    """yt-dlp format selector for a single file no taller than max_height
+
+    Video-only formats are fine (the audio is never analyzed) and usually the
+    smallest download; H.264 is preferred since every OpenCV build decodes it.
+    """
+    if max_height <= 0:
+        return 'best[ext=mp4]/best'
+    cap = f'[height<={max_height}]'
+    return (f'bestvideo{cap}[vcodec^=avc1]/bestvideo{cap}[ext=mp4]/best{cap}[ext=mp4]/best{cap}'
+            f'/worstvideo/worst')  # Nothing small enough: take the smallest there is
+
+
+def run_youtube_analysis(url: str, sample_rate: int, keyframes_only: bool,
+                         progress_callback: Optional[Callable[[Dict], None]] = None,
+                         adaptive: Optional[Dict] = None) -> Dict:
+    """Stream (or download) and analyze a YouTube video (blocking - run it off the event loop)
+
+    With YOUTUBE_STREAMING the selected format's URL goes straight to the
+    analyzer, which reads only the parts of the file around the sampled
+    frames while it analyzes them. Formats that aren't a plain HTTP file
+    (HLS/DASH manifests) are downloaded first.
+    """
+    # Known videos are answered before anything is downloaded
+    cache_key = video_cache_key("youtube", youtube_video_id(url), sample_rate, keyframes_only, adaptive,
+                                max_height=YOUTUBE_MAX_HEIGHT)
+    if cache_key is not None:
+        cached = cache_lookup(cache_key)
+        if cached is not None:
+            cached["url"] = url
+            cached["cached"] = True
+            return cached
+    
+    video_path = None
+    
+    try:
+        # Configure yt-dlp options
+        ydl_opts = {
+            'format': youtube_format(YOUTUBE_MAX_HEIGHT),
+            'outtmpl': f'{YOUTUBE_DOWNLOAD_DIR}/youtube_video_%(id)s.%(ext)s',
+            'quiet': True,
+            'no_warnings': True,
+            'extract_flat': False,
         }
+        
+        if progress_callback is not None:
+            progress_callback({"stage": "downloading"})
+        
+        def analyze(source: str) -> Dict:
+            return analyzer.analyze_video(
+                source, sample_rate,
+                keyframes_only=keyframes_only,
+                progress_callback=progress_callback,
+                adaptive=adaptive
+            )
+        
+        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
+            # Resolve the selected format without fetching it
+            info = ydl.extract_info(url, download=False)
+            video_title = info.get('title', 'Unknown')
+            video_duration = info.get('duration', 0)
+            fmt = {"format": info.get('format_id'), "height": info.get('height')}
+            
+            result = None
+            if YOUTUBE_STREAMING and info.get('protocol') in ('http', 'https') and info.get('url'):
+                logger.info("Streaming video", extra={"url": url, **fmt})
+                try:
+                    result = analyze(info['url'])
+                    mode = "stream"
+                except ValueError as e:
+                    # The server refused FFmpeg's requests; a regular download may still work
+                    logger.warning("Could not stream video, downloading it instead", extra={"url": url, "error": str(e)})
+            
+            if result is None:
+                logger.info("Downloading video", extra={"url": url, **fmt})
+                started = time.perf_counter()
+                info = ydl.extract_info(url, download=True)
+                video_path = ydl.prepare_filename(info)
+                download_seconds = time.perf_counter() - started
+                DOWNLOAD_SECONDS.observe(download_seconds)
+                logger.info("Downloaded video", extra={"title": video_title, "download_seconds": round(download_seconds, 2)})
+                
+                result = analyze(video_path)
+                mode = "download"
+        
+        # Add YouTube metadata
+        result["filename"] = video_title
+        result["source"] = "youtube"
+        result["duration"] = video_duration
+        result["ingest"] = {"mode": mode, **fmt}
+        
+        if cache_key is not None:
+            result_cache.set(cache_key, result)
+        
+        result["url"] = url
+        result["cached"] = False
+        return result
     
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
+    finally:
+        # Cleanup downloaded video
+        if video_path and os.path.exists(video_path):
+            try:
+                os.unlink(video_path)
+            except Exception as e:
+                logger.warning("Could not delete temp file", extra={"path": video_path, "error": str(e)})
+
+
+def render_video_result(result: Dict, view: Dict) -> Response:
+    """Encode a video result with its frames laid out and paged as requested (see frame_view_options)"""
+    return encode_response(shape_result(result, view, list(analyzer.methods_weights)), view["output"])
+
+
+def remove_file(path: str):
+    """Delete a temporary file, ignoring errors"""
+    try:
+        os.unlink(path)
+    except OSError:
+        pass
+
+
+async def save_video_upload(file: UploadFile) -> tuple:
+    """Stream an uploaded video to a temporary file in chunks, returning (path, content hash)"""
+    return await run_in_threadpool(save_upload, file.file, "video", MAX_VIDEO_BYTES)
 
 
 @app.post("/analyze/video")
-async def analyze_video(file: UploadFile = File(...), sample_rate: int = None):
+async def analyze_video(file: UploadFile = File(...), sample_rate: int = None, keyframes_only: bool = None,
+                        adaptive: bool = None, error_tolerance: float = None, max_frames: int = None,
+                        frame_format: str = None, float32: bool = None, output: str = None,
+                        frame_offset: int = None, frame_limit: int = None):
     """Analyze a video for deepfake indicators"""
     
     if not file.content_type.startswith("video/"):
@@ -616,35 +625,34 @@ async def analyze_video(file: UploadFile = File(...), sample_rate: int = None):
     
     # Use provided sample_rate or default from config
     sample_rate = sample_rate if sample_rate else DEFAULT_SAMPLE_RATE
+    keyframes_only = keyframes_only if keyframes_only is not None else KEYFRAME_SAMPLING
+    adaptive = adaptive_options(adaptive, error_tolerance, max_frames)
+    view = frame_view_options(frame_format, float32, output, frame_offset, frame_limit)
     
     # Save video to temporary file
-    with tempfile.NamedTemporaryFile(delete=False, suffix=".mp4") as tmp_file:
-        contents = await file.read()
-        tmp_file.write(contents)
-        tmp_path = tmp_file.name
+    tmp_path, digest = await save_video_upload(file)
     
     try:
+        await wait_for_model()
+        cache_key = video_cache_key("video", digest, sample_rate, keyframes_only, adaptive)
+        
         # Analyze video (run in thread pool to avoid blocking)
         loop = asyncio.get_event_loop()
         result = await loop.run_in_executor(
-            executor,
-            analyzer.analyze_video,
-            tmp_path,
-            sample_rate
+            video_lane,
+            partial(run_video_analysis, tmp_path, file.filename, sample_rate, keyframes_only, cache_key,
+                    adaptive=adaptive)
         )
-        
-        result["filename"] = file.filename
-        return result
+        return render_video_result(result, view)
     
+    except Saturated as e:
+        raise service_saturated(e)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
     
     finally:
         # Cleanup
-        try:
-            os.unlink(tmp_path)
-        except:
-            pass
+        remove_file(tmp_path)
 
 
 @app.post("/analyze/youtube")
@@ -657,62 +665,297 @@ async def analyze_youtube(request: YouTubeURLRequest):
             detail="YouTube analysis not available. Install yt-dlp: pip install yt-dlp"
         )
     
-    video_path = None
+    # Use sample_rate from request or default from config
+    sample_rate = request.sample_rate if request.sample_rate else DEFAULT_SAMPLE_RATE
+    keyframes_only = request.keyframes_only if request.keyframes_only is not None else KEYFRAME_SAMPLING
+    adaptive = adaptive_options(request.adaptive, request.error_tolerance, request.max_frames)
+    view = frame_view_options(request.frame_format, request.float32, request.output,
+                              request.frame_offset, request.frame_limit)
     
     try:
-        # Use sample_rate from request or default from config
-        sample_rate = request.sample_rate if request.sample_rate else DEFAULT_SAMPLE_RATE
-        
-        # Configure yt-dlp options
-        ydl_opts = {
-            'format': 'best[ext=mp4]/best',  # Prefer mp4
-            'outtmpl': f'{YOUTUBE_DOWNLOAD_DIR}/youtube_video_%(id)s.%(ext)s',
-            'quiet': True,
-            'no_warnings': True,
-            'extract_flat': False,
-        }
-        
-        print(f"📥 Downloading video from: {request.url}")
-        
-        # Download video
-        with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-            info = ydl.extract_info(request.url, download=True)
-            video_path = ydl.prepare_filename(info)
-            video_title = info.get('title', 'Unknown')
-            video_duration = info.get('duration', 0)
-            
-        print(f"✓ Downloaded: {video_title}")
-        
-        # Analyze video (run in thread pool to avoid blocking)
+        # Download and analyze in the thread pool so the event loop stays free
         loop = asyncio.get_event_loop()
         result = await loop.run_in_executor(
-            executor,
-            analyzer.analyze_video,
-            video_path,
-            sample_rate
+            video_lane,
+            partial(run_youtube_analysis, request.url, sample_rate, keyframes_only, adaptive=adaptive)
         )
-        
-        # Add YouTube metadata
-        result["filename"] = video_title
-        result["source"] = "youtube"
-        result["url"] = request.url
-        result["duration"] = video_duration
-        
-        return result
+        return render_video_result(result, view)
     
+    except Saturated as e:
+        raise service_saturated(e)
     except yt_dlp.utils.DownloadError as e:
         raise HTTPException(status_code=400, detail=f"Failed to download video: {str(e)}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"Analysis failed: {str(e)}")
+
+
+def job_queue_full(e: JobQueueFull) -> HTTPException:
+    return HTTPException(status_code=429, detail=f"Job queue is full: {e}", headers={"Retry-After": "30"})
+
+
+@app.post("/jobs/video", status_code=202)
+async def submit_video_job(file: UploadFile = File(...), sample_rate: int = None, keyframes_only: bool = None,
+                           adaptive: bool = None, error_tolerance: float = None, max_frames: int = None):
+    """Queue a video analysis and return its job id immediately"""
     
-    finally:
-        # Cleanup downloaded video
-        if video_path and os.path.exists(video_path):
+    if not file.content_type.startswith("video/"):
+        raise HTTPException(status_code=400, detail="File must be a video")
+    
+    sample_rate = sample_rate if sample_rate else DEFAULT_SAMPLE_RATE
+    keyframes_only = keyframes_only if keyframes_only is not None else KEYFRAME_SAMPLING
+    adaptive = adaptive_options(adaptive, error_tolerance, max_frames)
+    
+    tmp_path, digest = await save_video_upload(file)
+    await wait_for_model()
+    cache_key = video_cache_key("video", digest, sample_rate, keyframes_only, adaptive)
+    
+    try:
+        job = job_manager.submit(
+            "video",
+            lambda job: run_video_analysis(
+                tmp_path, file.filename, sample_rate, keyframes_only, cache_key,
+                progress_callback=job.report_progress,
+                adaptive=adaptive
+            ),
+            params={"filename": file.filename, "sample_rate": sample_rate, "keyframes_only": keyframes_only,
+                    "adaptive": adaptive},
+            cleanup=partial(remove_file, tmp_path)
+        )
+    except JobQueueFull as e:
+        remove_file(tmp_path)
+        raise job_queue_full(e)
+    
+    return job.to_dict()
+
+
+@app.post("/jobs/youtube", status_code=202)
+async def submit_youtube_job(request: YouTubeURLRequest):
+    """Queue a YouTube download + analysis and return its job id immediately"""
+    
+    if not YOUTUBE_ENABLED:
+        raise HTTPException(
+            status_code=503, 
+            detail="YouTube analysis not available. Install yt-dlp: pip install yt-dlp"
+        )
+    
+    sample_rate = request.sample_rate if request.sample_rate else DEFAULT_SAMPLE_RATE
+    keyframes_only = request.keyframes_only if request.keyframes_only is not None else KEYFRAME_SAMPLING
+    adaptive = adaptive_options(request.adaptive, request.error_tolerance, request.max_frames)
+    
+    try:
+        job = job_manager.submit(
+            "youtube",
+            lambda job: run_youtube_analysis(
+                request.url, sample_rate, keyframes_only,
+                progress_callback=job.report_progress,
+                adaptive=adaptive
+            ),
+            params={"url": request.url, "sample_rate": sample_rate, "keyframes_only": keyframes_only,
+                    "adaptive": adaptive}
+        )
+    except JobQueueFull as e:
+        raise job_queue_full(e)
+    
+    return job.to_dict()
+
+
+@app.get("/jobs/{job_id}")
+async def get_job(job_id: str, frame_format: str = None, float32: bool = None, output: str = None,
+                  frame_offset: int = None, frame_limit: int = None):
+    """Job status, progress and - once completed - its result (framed like /analyze/video)"""
+    view = frame_view_options(frame_format, float32, output, frame_offset, frame_limit)
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    data = job.to_dict()
+    if "result" in data:
+        data["result"] = shape_result(data["result"], view, list(analyzer.methods_weights))
+    return encode_response(data, view["output"])
+
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """Server-Sent Events stream of a job's progress, ending with its result"""
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    
+    async def stream():
+        async for event, data in job.events():
+            yield f"event: {event}\ndata: {dumps(data)}\n\n"
+    
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.delete("/jobs/{job_id}")
+async def cancel_job(job_id: str):
+    """Cancel a queued or running job"""
+    job = job_manager.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job.to_dict(include_result=False)
+
+
+def analyze_live_frame(data, face_tracker: FaceTracker, buffers: FrameBuffers) -> Dict:
+    """Decode (if still encoded) and score one live stream frame (blocking)"""
+    if isinstance(data, bytes):
+        if len(data) > MAX_IMAGE_BYTES:
+            raise ValueError("Frame exceeds the image size limit")
+        image = cv2.imdecode(np.frombuffer(data, np.uint8), cv2.IMREAD_COLOR)
+        if image is None:
+            raise ValueError("Could not decode frame")
+    else:
+        image = data
+    
+    if analyzer.process_pool is not None:
+        analysis = analyzer.process_pool.submit([image]).result()[0]
+    else:
+        # Consecutive frames: faces are tracked between detections, buffers reused
+        analysis = analyzer.analyze_images([image], face_tracker, buffers)[0]
+    return {"score": analyzer._calculate_frame_score(analysis)}
+
+
+def live_window_score(frames: List[Dict]) -> Dict:
+    """Score and verdict of a live stream's sliding window, weighted like a whole video"""
+    mean_score = float(np.mean([f["score"] for f in frames]))
+    temporal_score = analyzer._temporal_coherence_analysis(frames)
+    final_score = (mean_score * 0.85) + (temporal_score * 0.15)
+    return {
+        "deepfake_probability": round(final_score * 100, 2),
+        "confidence_score": round(final_score, 3),
+        "verdict": analyzer._get_verdict(final_score),
+        "risk_level": analyzer._get_risk_level(final_score),
+        "temporal_score": round(float(temporal_score), 3)
+    }
+
+
+@app.websocket("/ws/live")
+async def live_stream(websocket: WebSocket, max_fps: float = None, source: str = None):
+    """
+    Analyze a live stream, pushing a verdict update after every analyzed frame
+    
+    Send frames as binary messages (JPEG/PNG), or pass ?source= an RTSP URL
+    or server-side video file (LIVE_SOURCES_ENABLED). Frames that arrive
+    faster than max_fps (capped at LIVE_MAX_FPS) or that can't be analyzed
+    within LIVE_LATENCY_BUDGET_MS are dropped. Send the text message "end"
+    or close the socket to stop; a "summary" message ends the stream.
+    """
+    await websocket.accept()
+    if source and not LIVE_SOURCES_ENABLED:
+        await websocket.send_text(dumps({"type": "error", "detail": "Stream sources are disabled"}))
+        await websocket.close(code=1008)
+        return
+    if live_slots.locked():
+        await websocket.send_text(dumps({"type": "error", "detail": "Too many live streams, try again later"}))
+        await websocket.close(code=1013)
+        return
+    
+    async with live_slots:
+        await wait_for_model()
+        loop = asyncio.get_event_loop()
+        face_tracker = FaceTracker(FACE_REDETECT_INTERVAL, FACE_DETECT_MAX_DIM)
+        buffers = FrameBuffers()
+        
+        async def analyze(data) -> Dict:
+            return await loop.run_in_executor(live_lane, analyze_live_frame, data, face_tracker, buffers)
+        
+        fps = min(max_fps, LIVE_MAX_FPS) if max_fps and max_fps > 0 else LIVE_MAX_FPS
+        session = LiveSession(
+            analyze, live_window_score, max_fps=fps, latency_budget_ms=LIVE_LATENCY_BUDGET_MS,
+            window_seconds=LIVE_WINDOW_SECONDS, max_frames=LIVE_WINDOW_MAX_FRAMES
+        )
+        stop = threading.Event()
+        started = time.monotonic()
+        
+        async def receive():
+            """Frames (or the end) from the client; runs until it disconnects"""
+            while True:
+                message = await websocket.receive()
+                if message["type"] == "websocket.disconnect":
+                    break
+                if message.get("bytes") is not None and not source:
+                    session.offer(message["bytes"], time.monotonic() - started)
+                elif (message.get("text") or "").strip() == "end":
+                    break
+            stop.set()
+            session.close()
+        
+        async def read():
             try:
-                os.unlink(video_path)
-                print("✓ Cleaned up temporary video file")
-            except Exception as e:
-                print(f"Warning: Could not delete temp file: {e}")
+                await loop.run_in_executor(None, read_source, source, session, loop, stop)
+            except ValueError as e:
+                await websocket.send_text(dumps({"type": "error", "detail": str(e)}))
+                session.close()
+        
+        tasks = [asyncio.ensure_future(receive())]
+        if source:
+            tasks.append(asyncio.ensure_future(read()))
+        try:
+            await websocket.send_text(dumps({
+                "type": "ready", "max_fps": fps, "latency_budget_ms": LIVE_LATENCY_BUDGET_MS,
+                "window_seconds": LIVE_WINDOW_SECONDS
+            }))
+            try:
+                async for update in session.updates():
+                    await websocket.send_text(dumps(update))
+            finally:
+                # Also when the session failed: the client still gets its summary
+                await websocket.send_text(dumps(session.summary()))
+                await websocket.close()
+        except Exception as e:
+            # The client went away, or the session itself failed after its summary
+            logger.info("Live stream ended", extra={"reason": str(e) or type(e).__name__})
+        finally:
+            stop.set()
+            for task in tasks:
+                task.cancel()
+        logger.info("Live stream finished", extra=session.counts())
+
+
+@app.get("/cache/stats")
+async def cache_stats():
+    """Result cache hit/miss counters"""
+    if result_cache is None:
+        return {"enabled": False}
+    return {"enabled": True, **result_cache.stats()}
+
+
+@app.get("/stats/admission")
+async def admission_stats():
+    """Queued and running analyses per admission lane"""
+    return executor.stats()
+
+
+@app.get("/stats/cpu")
+async def cpu_stats():
+    """Planned thread budget per layer and the counts the libraries report"""
+    return {"budget": CPU_BUDGET, "effective": effective_threads()}
+
+
+@app.get("/stats/inference")
+async def inference_stats():
+    """Micro-batching queue depth and batch-size statistics"""
+    stats = {"enabled": False}
+    if analyzer.inference_scheduler is not None:
+        stats = {"enabled": True, **analyzer.inference_scheduler.stats()}
+    if isinstance(ml_model_cache["backend"], ModelClient):
+        try:
+            stats["model_server"] = await run_in_threadpool(ml_model_cache["backend"].stats)
+        except Exception as e:
+            stats["model_server"] = {"error": str(e)}
+    return stats
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus metrics (text exposition format)"""
+    body, content_type = render_metrics()
+    return Response(body, media_type=content_type)
 
 
 @app.get("/health")
@@ -720,6 +963,22 @@ async def health_check():
     return {"status": "healthy", "service": "deepfake-detection"}
 
 
+@app.get("/ready")
+async def readiness_check():
+    """Readiness probe: 503 until the model is loaded and the analysis backend is warm"""
+    if not startup_complete.is_set():
+        return JSONResponse(
+            {"status": "starting", "uptime_seconds": round(time.time() - PROCESS_STARTED, 2)},
+            status_code=503
+        )
+    return {
+        "status": "ready",
+        "ai_enabled": ml_model_cache["available"],
+        "ml_backend": ml_model_cache["backend"].name if ml_model_cache["available"] else None,
+        "uptime_seconds": round(time.time() - PROCESS_STARTED, 2)
+    }
+
+
 if __name__ == "__main__":
     import uvicorn
     uvicorn.run(app, host="0.0.0.0", port=8000)
@@ -0,0 +1,140 @@
+"""
+Prometheus metrics for the API
+
+GET /metrics serves these in the Prometheus text format:
+
+- per-detector latency (ml_model is one forward pass, the rest one frame)
+- frame decode time for videos and images, YouTube download time
+- frames analyzed (and reused from near-duplicates), model batch sizes
+- result cache lookups by outcome, for the hit rate
+- HTTP requests in flight, request latency by route and status
+- analyses waiting for / running on each admission lane, and rejections
+- live stream frames by outcome and their arrival-to-update latency
+
+With several processes (uvicorn workers, ANALYSIS_BACKEND=process) every
+process has its own counters. Setting PROMETHEUS_MULTIPROC_DIR to an empty
+directory makes them share it, and /metrics then reports the sum over all
+processes; run.py sets this up when it starts more than one process.
+"""
+import os
+import time
+from typing import Iterable, Iterator, Tuple
+
+# prometheus_client switches to multiprocess mode whenever the variable exists, even
+# empty (as .env.example and docker-compose's env_file leave it)
+if not os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+    os.environ.pop("PROMETHEUS_MULTIPROC_DIR", None)
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+)
+
+
+MULTIPROCESS = bool(os.getenv("PROMETHEUS_MULTIPROC_DIR"))
+
+_FAST_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+_REQUEST_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+DETECTOR_SECONDS = Histogram(
+    "truthlens_detector_seconds", "Detector latency (ml_model: one forward pass)",
+    ["detector"], buckets=_FAST_BUCKETS
+)
+DECODE_SECONDS = Histogram(
+    "truthlens_decode_seconds", "Time to decode one image or read one sampled video frame",
+    ["source"], buckets=_FAST_BUCKETS
+)
+DOWNLOAD_SECONDS = Histogram(
+    "truthlens_youtube_download_seconds", "YouTube download time",
+    buckets=(0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0, 600.0)
+)
+MODEL_BATCH_SIZE = Histogram(
+    "truthlens_model_batch_size", "Images per model forward pass",
+    buckets=(1, 2, 4, 8, 16, 32, 64)
+)
+FRAMES_ANALYZED = Counter(
+    "truthlens_frames_analyzed_total", "Video frames analyzed ('reused' took a near-duplicate's result)",
+    ["result"]
+)
+CACHE_LOOKUPS = Counter("truthlens_cache_lookups_total", "Result cache lookups", ["result"])
+
+REQUESTS_IN_FLIGHT = Gauge(
+    "truthlens_requests_in_flight", "HTTP requests being handled", multiprocess_mode="livesum"
+)
+REQUEST_SECONDS = Histogram(
+    "truthlens_request_seconds", "HTTP request latency",
+    ["method", "route", "status"], buckets=_REQUEST_BUCKETS
+)
+EXECUTOR_QUEUE_DEPTH = Gauge(
+    "truthlens_executor_queue_depth", "Analyses waiting for an executor thread",
+    ["lane"], multiprocess_mode="livesum"
+)
+EXECUTOR_ACTIVE = Gauge(
+    "truthlens_executor_active", "Analyses running on executor threads",
+    ["lane"], multiprocess_mode="livesum"
+)
+LIVE_FRAMES = Counter(
+    "truthlens_live_frames_total", "Live stream frames by outcome (analyzed, dropped, stale, failed)", ["result"]
+)
+LIVE_LATENCY_SECONDS = Histogram(
+    "truthlens_live_latency_seconds", "Live stream frame arrival to verdict update",
+    buckets=(0.05, 0.1, 0.25, 0.5, 0.75, 1.0, 1.5, 2.5, 5.0)
+)
+ADMISSION_REJECTED = Counter(
+    "truthlens_admission_rejected_total", "Requests turned away because their lane's queue was full", ["lane"]
+)
+
+
+def timed_frames(frames: Iterable[Tuple[int, object]]) -> Iterator[Tuple[int, object]]:
+    """Pass (index, frame) pairs through, recording how long each took to read"""
+    iterator = iter(frames)
+    while True:
+        started = time.perf_counter()
+        try:
+            item = next(iterator)
+        except StopIteration:
+            return
+        DECODE_SECONDS.labels("video").observe(time.perf_counter() - started)
+        yield item
+
+
+def render() -> Tuple[bytes, str]:
+    """Current metrics in the Prometheus text format, with its content type"""
+    if MULTIPROCESS:
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
+
+
+class MetricsMiddleware:
+    """ASGI middleware counting in-flight requests and timing each one by route"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        status = 500
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        REQUESTS_IN_FLIGHT.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            REQUESTS_IN_FLIGHT.dec()
+            # The router records the matched route; templates keep label cardinality bounded
+            route = getattr(scope.get("route"), "path", "unmatched")
+            REQUEST_SECONDS.labels(scope["method"], route, str(status)).observe(time.perf_counter() - started)
+
@@ -0,0 +1,204 @@
+"""
+Shared model server for multi-worker deployments
+
+Every process that imports main.py used to load its own copy of the model,
+so N uvicorn workers meant N copies in memory. With MODEL_SERVER_SOCKET set,
+one dedicated process owns the model and the workers become thin clients:
+
+- workers still run the (cheap) image processor and send the preprocessed
+  pixel tensors over a local Unix socket as raw float32 bytes
+- the server coalesces requests from all workers into shared forward passes
+  (InferenceScheduler) and returns the class probabilities
+
+Run it on its own with `python model_server.py`, or let run.py start it.
+"""
+import logging
+import os
+import threading
+import time
+from multiprocessing.connection import Client, Listener
+from typing import Dict, List
+
+import numpy as np
+
+from inference_scheduler import InferenceScheduler
+
+
+logger = logging.getLogger(__name__)
+
+CONNECT_TIMEOUT = 60.0
+
+
+def _send_array(conn, array: np.ndarray):
+    array = np.ascontiguousarray(array, dtype=np.float32)
+    conn.send(("array", array.shape))
+    conn.send_bytes(memoryview(array).cast("B"))
+
+
+def _recv_array(conn, shape) -> np.ndarray:
+    return np.frombuffer(conn.recv_bytes(), dtype=np.float32).reshape(shape)
+
+
+class ModelClient:
+    """Drop-in inference backend that forwards batches to the model server"""
+
+    def __init__(self, address: str, connect_timeout: float = CONNECT_TIMEOUT):
+        self.address = address
+        self.connect_timeout = connect_timeout
+        self._local = threading.local()
+
+        info = self._request(("info",))
+        self.name = f"server:{info['backend']}"
+        self.model_name = info["model"]
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            deadline = time.monotonic() + self.connect_timeout
+            while True:
+                try:
+                    conn = Client(self.address, family="AF_UNIX")
+                    break
+                except (FileNotFoundError, ConnectionRefusedError):
+                    # The server may still be loading the model
+                    if time.monotonic() > deadline:
+                        raise
+                    time.sleep(0.5)
+            self._local.conn = conn
+        return conn
+
+    def _request(self, message, array: np.ndarray = None):
+        """One request/response round trip on this thread's connection"""
+        conn = self._connection()
+        try:
+            conn.send(message)
+            if array is not None:
+                _send_array(conn, array)
+
+            status, payload = conn.recv()
+            if status == "array":
+                return _recv_array(conn, payload)
+            if status == "error":
+                raise RuntimeError(f"Model server error: {payload}")
+            return payload
+        except (EOFError, OSError):
+            # Server went away; reconnect on the next call
+            conn.close()
+            self._local.conn = None
+            raise
+
+    def __call__(self, inputs: Dict) -> np.ndarray:
+        pixel_values = inputs["pixel_values"].detach().cpu().numpy()
+        return self._request(("infer",), pixel_values)
+
+    def stats(self) -> Dict:
+        return self._request(("stats",))
+
+
+class ModelServer:
+    """Owns the model and serves forward passes to worker processes"""
+
+    def __init__(self, address: str, backend, model_name: str,
+                 max_batch_size: int = 4, max_wait_ms: float = 5.0):
+        """max_batch_size counts worker requests, each already up to ML_BATCH_SIZE images"""
+        self.address = address
+        self.backend = backend
+        self.model_name = model_name
+        self.scheduler = InferenceScheduler(self._run_batch, max_batch_size, max_wait_ms)
+
+    def _run_batch(self, arrays: List[np.ndarray]) -> List[np.ndarray]:
+        """One forward pass over the requests of several workers"""
+        import torch
+
+        probs = self.backend({"pixel_values": torch.from_numpy(np.concatenate(arrays))})
+        splits = np.cumsum([len(array) for array in arrays])[:-1]
+        return np.split(probs, splits)
+
+    def _handle(self, conn):
+        with conn:
+            while True:
+                try:
+                    message = conn.recv()
+                except (EOFError, OSError):
+                    return
+
+                try:
+                    if message[0] == "infer":
+                        _, shape = conn.recv()
+                        probs = self.scheduler.submit(_recv_array(conn, shape)).result()
+                        _send_array(conn, probs)
+                    elif message[0] == "info":
+                        conn.send(("ok", {"backend": self.backend.name, "model": self.model_name}))
+                    elif message[0] == "stats":
+                        conn.send(("ok", self.scheduler.stats()))
+                    else:
+                        conn.send(("error", f"unknown request {message[0]!r}"))
+                except (EOFError, OSError):
+                    return
+                except Exception as e:
+                    conn.send(("error", str(e)))
+
+    def serve_forever(self):
+        if os.path.exists(self.address):
+            os.unlink(self.address)
+
+        # Created owner-only from the start: a chmod after bind() would leave a window
+        # in which any local user could connect
+        previous_umask = os.umask(0o177)
+        try:
+            listener = Listener(self.address, family="AF_UNIX")
+        finally:
+            os.umask(previous_umask)
+
+        with listener:
+            logger.info("Model server listening", extra={"address": self.address})
+            while True:
+                conn = listener.accept()
+                threading.Thread(target=self._handle, args=(conn,), daemon=True).start()
+
+
+def server_running(address: str) -> bool:
+    """True if a model server is already accepting connections at address"""
+    try:
+        Client(address, family="AF_UNIX").close()
+        return True
+    except OSError:
+        return False
+
+
+if __name__ == "__main__":
+    import torch
+    from dotenv import load_dotenv
+    from cpu_budget import budget_from_env
+    from inference_backends import create_backend, load_pretrained
+    from logging_config import setup_logging
+
+    load_dotenv()
+    environment = os.getenv('ENVIRONMENT', 'development')
+    setup_logging(os.getenv('LOG_FORMAT') or ('json' if environment == 'production' else 'text'), os.getenv('LOG_LEVEL', 'INFO'))
+
+    address = os.getenv('MODEL_SERVER_SOCKET') or '/tmp/truthlens-model.sock'
+    model_name = os.getenv('ML_MODEL_NAME', 'dima806/deepfake_vs_real_image_detection')
+    device = os.getenv('ML_DEVICE', 'auto')
+    if device == 'auto':
+        device = "cuda" if torch.cuda.is_available() else "cpu"
+
+    # One batch at a time gets this process's whole share of the CPUs
+    torch.set_num_threads(int(os.getenv('TORCH_THREADS', '0')) or budget_from_env()["cpus_per_process"])
+
+    logger.info("Model server loading model", extra={
+        "model": model_name, "device": device, "torch_threads": torch.get_num_threads()
+    })
+    processor, model = load_pretrained(model_name, os.getenv('ML_MODEL_DIR', 'models/snapshot'))
+    model = model.to(device).eval()
+    backend = create_backend(
+        os.getenv('ML_BACKEND', 'torch'), model, processor, device, model_name,
+        os.getenv('ML_ONNX_DIR', 'models/onnx')
+    )
+    logger.info("Model server ready", extra={"ml_backend": backend.name})
+
+    ModelServer(
+        address, backend, model_name,
+        max_batch_size=int(os.getenv('MODEL_SERVER_MAX_REQUESTS', '4')),
+        max_wait_ms=float(os.getenv('ML_MICROBATCH_MAX_WAIT_MS', '5'))
+    ).serve_forever()
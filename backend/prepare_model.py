@@ -0,0 +1,43 @@
+#!/usr/bin/env python
+"""
+Prepare a local model snapshot for fast starts
+
+Downloads ML_MODEL_NAME once and writes the processor config and the weights
+(as safetensors) to ML_MODEL_DIR. Later starts load that directory directly:
+no HuggingFace hub resolution, and the weights are memory-mapped. When
+ML_BACKEND is onnx/onnx-int8 the ONNX export is built here as well.
+
+Run at image build time (see Dockerfile) or once per node:
+    python prepare_model.py
+"""
+import json
+import os
+import sys
+from dotenv import load_dotenv
+
+load_dotenv()
+
+
+if __name__ == "__main__":
+    from inference_backends import SNAPSHOT_MARKER, create_backend, load_pretrained
+
+    model_name = os.getenv('ML_MODEL_NAME', 'dima806/deepfake_vs_real_image_detection')
+    snapshot_dir = os.getenv('ML_MODEL_DIR', 'models/snapshot')
+    backend = os.getenv('ML_BACKEND', 'torch')
+
+    if not snapshot_dir:
+        sys.exit("❌ ML_MODEL_DIR is empty - nowhere to write the snapshot")
+
+    print(f"📦 Preparing snapshot of {model_name} in {snapshot_dir}")
+    processor, model = load_pretrained(model_name)
+
+    os.makedirs(snapshot_dir, exist_ok=True)
+    processor.save_pretrained(snapshot_dir)
+    model.save_pretrained(snapshot_dir, safe_serialization=True)
+    with open(os.path.join(snapshot_dir, SNAPSHOT_MARKER), "w") as f:
+        json.dump({"model": model_name}, f)
+
+    if backend in ("onnx", "onnx-int8"):
+        create_backend(backend, model.eval(), processor, "cpu", model_name, os.getenv('ML_ONNX_DIR', 'models/onnx'))
+
+    print("✓  Snapshot ready")
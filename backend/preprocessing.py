@@ -0,0 +1,95 @@
+"""
+Tensor-native preprocessing for the ML detector
+
+The original path converted every frame BGR→RGB, wrapped it in a PIL image,
+resized it with PIL and then let the HuggingFace processor convert, rescale
+and normalize it again. FramePreprocessor reads the processor's size and
+mean/std once and goes straight from the uint8 BGR frame to the model input:
+
+- one cv2.resize per frame (INTER_AREA when shrinking, which tracks PIL's
+  antialiased bicubic closely; INTER_CUBIC when enlarging)
+- channel swap, rescale and normalize in a single lookup-table pass per
+  channel, written into a preallocated (pinned, for CUDA) batch tensor
+"""
+import threading
+from typing import Dict, List, Optional
+
+import cv2
+import numpy as np
+import torch
+
+
+class FramePreprocessor:
+    """Batches uint8 BGR frames into normalized pixel_values for an image processor's model"""
+
+    def __init__(self, height: int, width: int, mean: List[float], std: List[float],
+                 rescale_factor: float = 1 / 255, pin_memory: bool = False):
+        self.height = height
+        self.width = width
+        self.pin_memory = pin_memory
+
+        # (value * rescale - mean) / std for every uint8 value, per RGB channel
+        values = np.arange(256, dtype=np.float64) * rescale_factor
+        self._luts = [
+            ((values - m) / s).astype(np.float32)
+            for m, s in zip(mean, std)
+        ]
+
+        self._local = threading.local()
+
+    @classmethod
+    def from_processor(cls, processor, device: str = "cpu") -> Optional["FramePreprocessor"]:
+        """Build from a HuggingFace image processor, or None if its pipeline isn't a plain resize + normalize"""
+        size = getattr(processor, "size", None) or {}
+        if "height" not in size or "width" not in size:
+            return None  # shortest_edge / crop_pct style resizing
+        if getattr(processor, "do_center_crop", False) or not getattr(processor, "do_resize", True):
+            return None
+
+        rescale = processor.rescale_factor if getattr(processor, "do_rescale", True) else 1.0
+        if getattr(processor, "do_normalize", True):
+            mean, std = processor.image_mean, processor.image_std
+        else:
+            mean, std = [0.0, 0.0, 0.0], [1.0, 1.0, 1.0]
+
+        return cls(
+            size["height"], size["width"], mean, std,
+            rescale_factor=rescale,
+            pin_memory=device.startswith("cuda")
+        )
+
+    def _buffer(self, batch_size: int) -> torch.Tensor:
+        """Per-thread batch tensor, grown as needed and reused between calls"""
+        buffer = getattr(self._local, "buffer", None)
+        if buffer is None or buffer.shape[0] < batch_size:
+            buffer = torch.empty((batch_size, 3, self.height, self.width), dtype=torch.float32)
+            if self.pin_memory:
+                buffer = buffer.pin_memory()
+            self._local.buffer = buffer
+        return buffer
+
+    def resize(self, image: np.ndarray) -> np.ndarray:
+        h, w = image.shape[:2]
+        if (h, w) == (self.height, self.width):
+            return image
+        shrinking = h >= self.height and w >= self.width
+        interpolation = cv2.INTER_AREA if shrinking else cv2.INTER_CUBIC
+        return cv2.resize(image, (self.width, self.height), interpolation=interpolation)
+
+    def __call__(self, images: List[np.ndarray]) -> Dict[str, torch.Tensor]:
+        """Return {"pixel_values": (N, 3, H, W) float32}, a view of this thread's reused buffer
+
+        The tensor is overwritten by this thread's next call, so consume it first.
+        """
+        batch = self._buffer(len(images))[:len(images)]
+        out = batch.numpy()
+
+        for i, image in enumerate(images):
+            resized = self.resize(image)
+            if resized.ndim == 2:
+                resized = cv2.cvtColor(resized, cv2.COLOR_GRAY2BGR)
+            # BGR input: RGB channel c is BGR channel 2 - c
+            for c in range(3):
+                np.take(self._luts[c], resized[:, :, 2 - c], out=out[i, c])
+
+        return {"pixel_values": batch}
@@ -0,0 +1,147 @@
+"""
+Process-pool backend for the CPU-bound detectors
+
+The heuristics interleave NumPy/OpenCV calls with Python loops and dict
+building that hold the GIL, so threads don't scale across cores. With
+ANALYSIS_BACKEND=process, frames are analyzed in worker processes instead:
+
+- each worker imports deepfake_analyzer (not the app) once, so the ML model
+  is loaded once per worker process rather than per task
+- frames travel through multiprocessing.shared_memory - the parent copies a
+  chunk of frames into one block and workers map it, so pixel data is never
+  pickled; only the small result dicts come back through the pipe
+- each worker gets its share of the CPU budget as torch threads, and with
+  pinning its own set of cores, so workers don't compete for the same ones
+- face tracking starts over with a detection at every chunk, since the next
+  chunk may run on another worker; the thread backend does the same, so both
+  give the same results
+"""
+import multiprocessing as mp
+import os
+from concurrent.futures import Future, ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import List, Optional
+
+import numpy as np
+
+from cpu_budget import core_sets, pin_to, usable_cores
+
+
+# Set in each worker process by _init_worker
+_worker_analyzer = None
+_worker_face_tracker_args = None
+_worker_buffers = None
+
+
+def _init_worker(threads_per_worker: int, worker_cores: Optional[List[List[int]]], started):
+    """Load the analyzer (and its model) once when a worker process starts"""
+    global _worker_analyzer, _worker_face_tracker_args, _worker_buffers
+
+    if worker_cores:
+        # Workers take the core sets in the order they start
+        with started.get_lock():
+            index = started.value
+            started.value += 1
+        pin_to(worker_cores[index % len(worker_cores)])
+
+    import cv2
+    # Not main: that would start the app's executors, job queue and result cache in every worker
+    import deepfake_analyzer
+    # A worker runs one task at a time
+    cv2.setNumThreads(1)
+    deepfake_analyzer.load_ml_model(threads_per_worker)
+
+    _worker_analyzer = deepfake_analyzer.analyzer
+    _worker_face_tracker_args = (deepfake_analyzer.FACE_REDETECT_INTERVAL, deepfake_analyzer.FACE_DETECT_MAX_DIM)
+    # A worker runs one task at a time, so its conversion buffers are reused across tasks
+    _worker_buffers = deepfake_analyzer.FrameBuffers()
+
+
+def _ping() -> int:
+    return os.getpid()
+
+
+def _analyze_shared(shm_name: str, layout: List[tuple]) -> List[dict]:
+    """Analyze the frames packed into a shared memory block (runs in a worker)"""
+    from face_detection import FaceTracker
+
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        frames = [
+            np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf, offset=offset)
+            for offset, shape, dtype in layout
+        ]
+
+        # Frames in one chunk are consecutive samples of the same video. Chunks run on
+        # any worker, so tracking starts over with a detection (the thread backend resets
+        # its tracker at chunk boundaries to match)
+        face_tracker = FaceTracker(*_worker_face_tracker_args) if len(frames) > 1 else None
+        results = _worker_analyzer.analyze_images(frames, face_tracker, _worker_buffers)
+
+        # Views into the block must be gone before it can be closed
+        del frames
+        return results
+    finally:
+        shm.close()
+
+
+class ProcessAnalysisPool:
+    """Runs analyze_images in worker processes, passing frames through shared memory"""
+
+    def __init__(self, workers: Optional[int] = None, threads_per_worker: Optional[int] = None,
+                 pin: bool = False):
+        cores = usable_cores()
+        self.workers = workers or len(cores)
+        self.threads_per_worker = threads_per_worker or max(1, len(cores) // self.workers)
+        self.core_sets = core_sets(cores, self.workers) if pin else None
+
+        # spawn: forking a process that already runs torch/OpenCV threads can deadlock
+        context = mp.get_context("spawn")
+        self._executor = ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=context,
+            initializer=_init_worker,
+            initargs=(self.threads_per_worker, self.core_sets, context.Value("i", 0))
+        )
+
+    def warm_up(self):
+        """Start every worker now so the model loads before the first request"""
+        for future in [self._executor.submit(_ping) for _ in range(self.workers)]:
+            future.result()
+
+    def submit(self, frames: List[np.ndarray]) -> Future:
+        """Analyze frames in a worker; the future resolves to one result dict per frame"""
+        if not frames:
+            future = Future()
+            future.set_result([])
+            return future
+
+        frames = [np.ascontiguousarray(frame) for frame in frames]
+        total = sum(frame.nbytes for frame in frames)
+
+        shm = shared_memory.SharedMemory(create=True, size=max(total, 1))
+        layout = []
+        offset = 0
+        try:
+            for frame in frames:
+                view = np.ndarray(frame.shape, dtype=frame.dtype, buffer=shm.buf, offset=offset)
+                view[...] = frame
+                layout.append((offset, frame.shape, frame.dtype.str))
+                offset += frame.nbytes
+            del view
+
+            future = self._executor.submit(_analyze_shared, shm.name, layout)
+        except BaseException:
+            shm.close()
+            shm.unlink()
+            raise
+
+        def release(_):
+            shm.close()
+            shm.unlink()
+
+        future.add_done_callback(release)
+        return future
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
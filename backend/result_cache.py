@@ -0,0 +1,182 @@
+"""
+Content-addressed cache for analysis results
+
+Results are keyed by a hash of the uploaded bytes (or the YouTube video id)
+together with every parameter that changes the output. An in-memory LRU tier
+answers repeat submissions without touching disk; an optional SQLite tier
+survives restarts and is shared between worker processes on the same node.
+Both tiers evict least recently used entries by payload size - one video
+result with frame_by_frame can be several MB - and the memory tier also by
+entry count.
+"""
+import hashlib
+import json
+import re
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, Optional
+
+
+YOUTUBE_ID_PATTERN = re.compile(r'(?:v=|/shorts/|/embed/|/live/|youtu\.be/)([A-Za-z0-9_-]{11})')
+
+
+def content_hash(data) -> str:
+    """SHA-256 of an uploaded file's bytes (any buffer - bytes, mmap, memoryview)"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def youtube_video_id(url: str) -> str:
+    """Extract the 11 character video id from a YouTube URL, or fall back to the URL"""
+    match = YOUTUBE_ID_PATTERN.search(url)
+    return match.group(1) if match else url.strip()
+
+
+def make_cache_key(kind: str, source_id: str, params: Dict) -> str:
+    """Combine the content id with the analysis parameters into one key"""
+    payload = json.dumps({"kind": kind, "source": source_id, "params": params}, sort_keys=True)
+    return hashlib.sha256(payload.encode()).hexdigest()
+
+
+class ResultCache:
+    """Two-tier result cache: in-memory LRU plus optional SQLite with size and TTL limits"""
+
+    def __init__(self, max_entries: int = 256, db_path: Optional[str] = None,
+                 max_disk_mb: int = 512, ttl_seconds: int = 86400, max_memory_mb: float = 128):
+        self.max_entries = max_entries
+        self.max_memory_bytes = int(max_memory_mb * 1024 * 1024)
+        self.max_disk_bytes = max_disk_mb * 1024 * 1024
+        self.ttl_seconds = ttl_seconds
+
+        self._memory: "OrderedDict[str, tuple]" = OrderedDict()
+        self._memory_bytes = 0
+        self._lock = threading.Lock()
+
+        self.memory_hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        self._db = None
+        if db_path:
+            self._db = sqlite3.connect(db_path, check_same_thread=False)
+            self._db.execute("PRAGMA journal_mode=WAL")
+            self._db.execute("""
+                CREATE TABLE IF NOT EXISTS results (
+                    key TEXT PRIMARY KEY,
+                    value BLOB NOT NULL,
+                    size INTEGER NOT NULL,
+                    created REAL NOT NULL,
+                    accessed REAL NOT NULL
+                )
+            """)
+            self._db.execute("CREATE INDEX IF NOT EXISTS results_accessed ON results (accessed)")
+            self._db.commit()
+
+    def _expired(self, created: float, now: float) -> bool:
+        return self.ttl_seconds > 0 and now - created > self.ttl_seconds
+
+    def get(self, key: str) -> Optional[Dict]:
+        """Return a fresh copy of the cached result, or None on a miss"""
+        now = time.time()
+
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is not None:
+                created, payload = entry
+                if not self._expired(created, now):
+                    self._memory.move_to_end(key)
+                    self.memory_hits += 1
+                    return json.loads(payload)
+                self._forget(key)
+
+            if self._db is not None:
+                row = self._db.execute(
+                    "SELECT value, created FROM results WHERE key = ?", (key,)
+                ).fetchone()
+
+                if row is not None:
+                    payload, created = row
+                    if not self._expired(created, now):
+                        self._db.execute("UPDATE results SET accessed = ? WHERE key = ?", (now, key))
+                        self._db.commit()
+                        self._remember(key, created, payload)
+                        self.disk_hits += 1
+                        return json.loads(payload)
+
+                    self._db.execute("DELETE FROM results WHERE key = ?", (key,))
+                    self._db.commit()
+
+            self.misses += 1
+            return None
+
+    def set(self, key: str, value: Dict):
+        """Store a result in both tiers"""
+        payload = json.dumps(value)
+        now = time.time()
+
+        with self._lock:
+            self._remember(key, now, payload)
+
+            if self._db is not None:
+                self._db.execute(
+                    "INSERT OR REPLACE INTO results (key, value, size, created, accessed) VALUES (?, ?, ?, ?, ?)",
+                    (key, payload, len(payload), now, now)
+                )
+                self._evict_disk(now)
+                self._db.commit()
+
+    def _forget(self, key: str):
+        """Remove an entry from the memory tier"""
+        _, payload = self._memory.pop(key)
+        self._memory_bytes -= len(payload)
+
+    def _remember(self, key: str, created: float, payload: str):
+        """Insert into the memory tier, dropping least recently used entries over the count or size limit"""
+        if key in self._memory:
+            self._forget(key)
+        if len(payload) > self.max_memory_bytes:
+            return  # Would evict everything else; the disk tier (if any) still has it
+
+        self._memory[key] = (created, payload)
+        self._memory_bytes += len(payload)
+        while len(self._memory) > self.max_entries or self._memory_bytes > self.max_memory_bytes:
+            self._forget(next(iter(self._memory)))
+
+    def _evict_disk(self, now: float):
+        """Drop expired rows, then the least recently used ones until under the size limit"""
+        if self.ttl_seconds > 0:
+            self._db.execute("DELETE FROM results WHERE created < ?", (now - self.ttl_seconds,))
+
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+        if total <= self.max_disk_bytes:
+            return
+
+        for key, size in self._db.execute("SELECT key, size FROM results ORDER BY accessed").fetchall():
+            if total <= self.max_disk_bytes:
+                break
+            self._db.execute("DELETE FROM results WHERE key = ?", (key,))
+            total -= size
+
+    def stats(self) -> Dict:
+        """Hit/miss counters and tier sizes"""
+        with self._lock:
+            lookups = self.memory_hits + self.disk_hits + self.misses
+            stats = {
+                "memory_hits": self.memory_hits,
+                "disk_hits": self.disk_hits,
+                "misses": self.misses,
+                "hit_rate": round((self.memory_hits + self.disk_hits) / lookups, 3) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_bytes,
+                "disk_enabled": self._db is not None
+            }
+
+            if self._db is not None:
+                count, size = self._db.execute(
+                    "SELECT COUNT(*), COALESCE(SUM(size), 0) FROM results"
+                ).fetchone()
+                stats["disk_entries"] = count
+                stats["disk_bytes"] = size
+
+        return stats
@@ -3,12 +3,40 @@
 Deepfake Detection API Server
 Starts the FastAPI server with configuration from .env file
 """
+import logging
 import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
 from dotenv import load_dotenv
+from cpu_budget import WORKER_PROCESSES_VAR, blas_env, budget_from_env
+from logging_config import setup_logging
 
 # Load environment variables
 load_dotenv()
 
+logger = logging.getLogger("run")
+
+
+def start_model_server(address: str):
+    """Start the shared model server and wait until it accepts connections"""
+    from model_server import server_running
+
+    if server_running(address):
+        logger.info("Model server already running", extra={"address": address})
+        return None
+
+    logger.info("Starting model server", extra={"address": address})
+    process = subprocess.Popen([sys.executable, "model_server.py"], cwd=os.path.dirname(os.path.abspath(__file__)))
+    while not server_running(address):
+        if process.poll() is not None:
+            sys.exit("❌ Model server exited during startup")
+        time.sleep(0.5)
+    return process
+
+
 if __name__ == "__main__":
     import uvicorn
     
@@ -16,21 +44,53 @@ if __name__ == "__main__":
     port = int(os.getenv('PORT', '8000'))
     workers = int(os.getenv('WORKERS', '4'))
     environment = os.getenv('ENVIRONMENT', 'development')
+    model_server_socket = os.getenv('MODEL_SERVER_SOCKET') or ''
     
-    # Reload only in development
+    setup_logging(os.getenv('LOG_FORMAT') or ('json' if environment == 'production' else 'text'), os.getenv('LOG_LEVEL', 'INFO'))
+    
+    # Reload only in development (uvicorn can't combine reload with workers)
     reload = environment == 'development'
+    if reload:
+        workers = 1
+    
+    logger.info("Starting Deepfake Detection API", extra={
+        "environment": environment, "host": host, "port": port, "workers": workers, "reload": reload
+    })
+    
+    # BLAS sizes its thread pool when NumPy is imported, so set it before any
+    # process loads the app; main.py sizes the other layers for this many workers
+    os.environ[WORKER_PROCESSES_VAR] = str(workers)
+    budget = budget_from_env()
+    for name, value in blas_env(budget).items():
+        os.environ.setdefault(name, value)
+    logger.info("CPU budget", extra={
+        "cpus": budget["cpus"], "cpu_source": budget["detected"]["source"],
+        "cpus_per_process": budget["cpus_per_process"], "blas_threads": os.environ["OMP_NUM_THREADS"]
+    })
+    
+    # Several processes (workers, analysis pool) write their metrics to one directory for /metrics
+    metrics_dir = None
+    if (workers > 1 or os.getenv('ANALYSIS_BACKEND') == 'process') and not os.getenv('PROMETHEUS_MULTIPROC_DIR'):
+        metrics_dir = tempfile.mkdtemp(prefix="truthlens-metrics-")
+        os.environ['PROMETHEUS_MULTIPROC_DIR'] = metrics_dir
+    
+    # One process holds the model; every worker talks to it
+    model_server = start_model_server(model_server_socket) if model_server_socket else None
     
-    print(f"\n🚀 Starting Deepfake Detection API")
-    print(f"   Environment: {environment}")
-    print(f"   Host: {host}")
-    print(f"   Port: {port}")
-    print(f"   Workers: {workers}")
-    print(f"   Auto-reload: {reload}\n")
-    
-    uvicorn.run(
-        "main:app",
-        host=host,
-        port=port,
-        reload=reload,
-        log_level="info"
-    )
+    try:
+        uvicorn.run(
+            "main:app",
+            host=host,
+            port=port,
+            reload=reload,
+            workers=workers,
+            log_level="info",
+            # Leave logging to setup_logging so access logs get the same format
+            log_config=None
+        )
+    finally:
+        if model_server is not None:
+            model_server.terminate()
+            model_server.wait()
+        if metrics_dir is not None:
+            shutil.rmtree(metrics_dir, ignore_errors=True)
@@ -0,0 +1,1107 @@
+"""
+Offline tests for the DeepfakeAnalyzer detectors.
+Run from the backend directory with: python -m pytest test_analyzer.py
+"""
+import os
+
+# Never reach out to the HuggingFace hub from tests
+os.environ.setdefault("HF_HUB_OFFLINE", "1")
+
+import cv2
+import numpy as np
+import pytest
+
+import main
+
+
+def legacy_compression_artifacts(image: np.ndarray) -> float:
+    """Reference copy of the original block-by-block loop (horizontal boundaries only)"""
+    ycrcb = cv2.cvtColor(image, cv2.COLOR_BGR2YCrCb)
+    y_channel = ycrcb[:, :, 0]
+
+    h, w = y_channel.shape
+    block_size = 8
+
+    artifact_score = 0
+    block_count = 0
+
+    for i in range(0, h - block_size, block_size):
+        for j in range(0, w - block_size, block_size):
+            if i + block_size < h:
+                boundary_diff = np.mean(np.abs(
+                    y_channel[i+block_size, j:j+block_size].astype(float) -
+                    y_channel[i+block_size-1, j:j+block_size].astype(float)
+                ))
+
+                if boundary_diff > 15:
+                    artifact_score += 1
+
+            block_count += 1
+
+    return artifact_score / block_count if block_count > 0 else 0
+
+
+def blocky_image(h: int, w: int, seed: int = 0) -> np.ndarray:
+    """Image made of flat 8x8 tiles so block edges are clearly visible"""
+    rng = np.random.default_rng(seed)
+    tiles = rng.integers(0, 256, ((h + 7) // 8, (w + 7) // 8, 3), dtype=np.uint8)
+    return np.repeat(np.repeat(tiles, 8, axis=0), 8, axis=1)[:h, :w].copy()
+
+
+@pytest.mark.parametrize("shape", [(64, 64), (67, 101), (8, 8), (9, 17), (240, 320)])
+@pytest.mark.parametrize("kind", ["noise", "blocky", "jpeg"])
+def test_compression_artifacts_matches_legacy_loop(shape, kind):
+    h, w = shape
+    rng = np.random.default_rng(h * w)
+
+    if kind == "noise":
+        image = rng.integers(0, 256, (h, w, 3), dtype=np.uint8)
+    elif kind == "blocky":
+        image = blocky_image(h, w)
+    else:
+        smooth = cv2.GaussianBlur(rng.integers(0, 256, (h, w, 3), dtype=np.uint8), (0, 0), 3)
+        ok, encoded = cv2.imencode(".jpg", smooth, [cv2.IMWRITE_JPEG_QUALITY, 5])
+        image = cv2.imdecode(encoded, cv2.IMREAD_COLOR)
+
+    result = main.analyzer._compression_artifacts(image)
+    expected = legacy_compression_artifacts(image)
+
+    assert result["horizontal_density"] == round(float(expected), 3)
+    assert result["artifact_density"] >= result["horizontal_density"]
+    assert result["artifact_density"] >= result["vertical_density"]
+
+
+def test_compression_artifacts_detects_vertical_boundaries():
+    # Vertical stripes change only across columns, which the old loop never looked at
+    image = np.zeros((64, 64, 3), dtype=np.uint8)
+    image[:, 8::16] = 255
+    for col in range(8, 64, 16):
+        image[:, col:col + 8] = 255
+
+    result = main.analyzer._compression_artifacts(image)
+
+    assert legacy_compression_artifacts(image) == 0
+    assert result["horizontal_density"] == 0
+    assert result["vertical_density"] > 0
+    assert result["artifact_density"] == result["vertical_density"]
+
+
+def test_onnx_backend_matches_torch(tmp_path):
+    """ONNX Runtime scores stay within a fraction of a point of fp32 PyTorch"""
+    pytest.importorskip("onnxruntime")
+    import torch
+    from transformers import ViTConfig, ViTForImageClassification, ViTImageProcessor
+    from inference_backends import compare_backends
+
+    torch.manual_seed(0)
+    config = ViTConfig(image_size=224, patch_size=32, hidden_size=32, num_hidden_layers=2,
+                       num_attention_heads=2, intermediate_size=64, num_labels=2)
+    model = ViTForImageClassification(config).eval()
+
+    rng = np.random.default_rng(0)
+    images = [rng.integers(0, 256, (120, 160, 3), dtype=np.uint8) for _ in range(6)]
+
+    report = compare_backends(model, ViTImageProcessor(), "cpu", "tiny-vit", ["onnx"],
+                              images, onnx_dir=str(tmp_path), batch_size=4)
+    onnx = report["backends"]["onnx"]
+    assert onnx["effective_backend"] == "onnx"
+    assert onnx["max_drift_pct"] < 0.1
+    assert onnx["prediction_flips"] == 0
+
+
+@pytest.mark.parametrize("shape", [(224, 224), (360, 640), (1080, 1920), (120, 160)])
+def test_fast_preprocessing_matches_processor(shape):
+    """FramePreprocessor stays within a few uint8 levels of the PIL + processor path"""
+    from PIL import Image
+    from transformers import ViTImageProcessor
+    from preprocessing import FramePreprocessor
+
+    processor = ViTImageProcessor()
+    rng = np.random.default_rng(1)
+    frames = [
+        cv2.GaussianBlur(rng.integers(0, 256, (*shape, 3), dtype=np.uint8), (0, 0), 3)
+        for _ in range(3)
+    ]
+
+    reference = processor(
+        images=[Image.fromarray(cv2.cvtColor(f, cv2.COLOR_BGR2RGB)).resize((224, 224)) for f in frames],
+        return_tensors="pt"
+    )["pixel_values"].numpy()
+    fast = FramePreprocessor.from_processor(processor)(frames)["pixel_values"].numpy()
+
+    assert fast.shape == reference.shape
+    # One uint8 level is 1/255/std = 0.0078 after ViT normalization
+    assert np.abs(fast - reference).mean() < 0.01
+    assert np.abs(fast - reference).max() < 0.1
+
+
+def test_frame_context_downscales_once_and_keeps_native_levels():
+    from frame_context import NATIVE, FrameBuffers, FrameContext, parse_levels
+
+    rng = np.random.default_rng(5)
+    image = rng.integers(0, 256, (1200, 1600, 3), dtype=np.uint8)
+
+    frame = FrameContext(image, FrameBuffers(), analysis_max_dim=800)
+    assert frame.image.shape == (600, 800, 3)
+    assert frame.gray.shape == (600, 800)
+    assert frame.gray_at(1).shape == (300, 400)
+    assert frame.lab_at(2).shape == (150, 200, 3)
+    assert np.array_equal(frame.ycrcb_at(NATIVE), cv2.cvtColor(image, cv2.COLOR_BGR2YCrCb))
+
+    # Already small enough: native and working resolution share their conversions
+    small = FrameContext(image[:400, :400])
+    assert small.image is small.native
+    assert small.ycrcb_at(NATIVE) is small.ycrcb
+
+    assert parse_levels("compression_artifacts=native, color_analysis=1") == {
+        "compression_artifacts": NATIVE, "color_analysis": 1
+    }
+    with pytest.raises(ValueError):
+        parse_levels("color_analysis=half")
+
+
+def test_coarse_to_fine_covers_every_position():
+    from adaptive_sampling import coarse_to_fine
+
+    for count in (1, 2, 5, 40, 64):
+        order = coarse_to_fine(count)
+        assert sorted(order) == list(range(count))
+        assert order[:2] == [0, count - 1][:count]
+
+
+def test_adaptive_sampler_stops_early_on_a_clear_verdict():
+    from adaptive_sampling import AdaptiveSampler
+
+    sampler = AdaptiveSampler(total_frames=3000, max_frames=100, min_frames=8)
+    rng = np.random.default_rng(0)
+    while True:
+        frames = sampler.next_frames(8)
+        if not frames:
+            break
+        for idx in frames:
+            sampler.record(idx, 0.1 + rng.normal(0, 0.01))
+
+    assert sampler.stop_reason == "converged"
+    assert len(sampler.scores) < 100
+
+
+def test_adaptive_sampler_refines_around_suspicious_frames():
+    from adaptive_sampling import AdaptiveSampler
+
+    sampler = AdaptiveSampler(total_frames=1000, max_frames=20, min_frames=8)
+    first = sampler.next_frames(8)
+    for idx in first:
+        sampler.record(idx, 0.9 if idx == max(first) else 0.1)
+
+    refinement = [idx for idx in sampler.next_frames(8) if not sampler.in_plan(idx)]
+    assert refinement
+    assert all(abs(idx - max(first)) < 1000 // 4 for idx in refinement)
+
+
+class ShortFrameSource:
+    """FrameSource stand-in whose frame count overstates the frames it can deliver"""
+
+    def __init__(self, video_path, keyframes_only=False, seek_gap=0, readable=60, total_frames=100):
+        self.total_frames = total_frames
+        self.fps = 25.0
+        self.readable = readable
+        self.requested = []
+
+    def read(self, targets):
+        rng = np.random.default_rng(len(self.requested))
+        for idx in targets:
+            self.requested.append(idx)
+            if idx < self.readable:
+                yield idx, rng.integers(0, 256, (64, 64, 3), dtype=np.uint8)
+
+    def release(self):
+        pass
+
+
+@pytest.mark.parametrize("readable", [60, 0])
+def test_adaptive_video_analysis_stops_when_planned_frames_never_decode(monkeypatch, readable):
+    """Frames past the real end are marked unreadable instead of being asked for forever"""
+    import threading
+    import deepfake_analyzer
+    from deepfake_analyzer import DeepfakeAnalyzer
+
+    sources = []
+
+    def make_source(*args, **kwargs):
+        sources.append(ShortFrameSource(*args, readable=readable, **kwargs))
+        return sources[-1]
+
+    monkeypatch.setattr(deepfake_analyzer, "FrameSource", make_source)
+    monkeypatch.setattr(deepfake_analyzer, "SHOT_AWARE_SAMPLING", False)
+    outcome = {}
+
+    def analyze():
+        try:
+            outcome["result"] = DeepfakeAnalyzer().analyze_video(
+                "clip.mp4", adaptive={"error_tolerance": 0.001, "max_frames": 60})
+        except ValueError as e:
+            outcome["error"] = str(e)
+
+    worker = threading.Thread(target=analyze, daemon=True)
+    worker.start()
+    worker.join(60)
+    assert not worker.is_alive(), "adaptive analysis never finished"
+
+    requested = sources[0].requested
+    assert len(requested) == len(set(requested)) <= 60
+    if not readable:
+        # One round that yields nothing ends the analysis
+        assert outcome == {"error": "Could not decode any of the sampled video frames"}
+        assert 0 < len(requested) <= 60
+        return
+
+    sampling = outcome["result"]["sampling"]
+    assert sampling["unreadable_frames"] == sum(idx >= readable for idx in requested) > 0
+    assert sampling["frames_analyzed"] + sampling["unreadable_frames"] == len(requested)
+    assert sampling["stop_reason"] in ("budget", "converged", "exhausted")
+
+
+def test_duplicate_index_matches_near_identical_frames():
+    from frame_dedup import DuplicateIndex, signature
+
+    rng = np.random.default_rng(2)
+    still = cv2.GaussianBlur(rng.integers(0, 256, (360, 640, 3), dtype=np.uint8), (0, 0), 5)
+    noisy = np.clip(still.astype(np.int16) + rng.integers(-3, 4, still.shape), 0, 255).astype(np.uint8)
+    other = cv2.GaussianBlur(rng.integers(0, 256, (360, 640, 3), dtype=np.uint8), (0, 0), 5)
+
+    index = DuplicateIndex(threshold=1.0)
+    index.add(signature(still), 10)
+    assert index.match(signature(noisy)) == 10
+    assert index.match(signature(other)) is None
+
+
+def test_select_frames_gives_static_shots_one_frame():
+    from frame_dedup import select_frames
+
+    # Frames 0-39 one still, 40-79 steadily changing, 80-119 another still
+    signatures = {}
+    for idx in range(120):
+        value = 20 if idx < 40 else 200 if idx >= 80 else 90 + (idx - 40)
+        signatures[idx] = np.full((32, 32), value, dtype=np.uint8)
+
+    selected = select_frames(list(signatures), signatures, budget=12, cut_threshold=30, duplicate_threshold=0.5)
+    assert sum(idx < 40 for idx in selected) == 1
+    assert sum(idx >= 80 for idx in selected) == 1
+    assert sum(40 <= idx < 80 for idx in selected) == 10
+
+
+def test_frame_source_streams_only_the_sampled_ranges(tmp_path):
+    """Over HTTP, sparse frames match the local file and most of the file is never fetched"""
+    import re
+    import socket
+    import threading
+    from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+    from frame_source import FrameSource
+
+    path = tmp_path / "clip.avi"
+    rng = np.random.default_rng(3)
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), 25, (320, 240))
+    for _ in range(400):
+        writer.write(rng.integers(0, 256, (240, 320, 3), dtype=np.uint8))
+    writer.release()
+    data = path.read_bytes()
+    served = []
+
+    class RangeHandler(BaseHTTPRequestHandler):
+        def log_message(self, *args):
+            pass
+
+        def do_GET(self):
+            # Little buffering, so bytes written is close to bytes the client read
+            self.connection.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 16384)
+            match = re.match(r"bytes=(\d+)-(\d*)", self.headers.get("Range", ""))
+            start = int(match.group(1)) if match else 0
+            end = int(match.group(2) or len(data) - 1) if match else len(data) - 1
+            self.send_response(206 if match else 200)
+            self.send_header("Accept-Ranges", "bytes")
+            self.send_header("Content-Length", str(end - start + 1))
+            if match:
+                self.send_header("Content-Range", f"bytes {start}-{end}/{len(data)}")
+            self.end_headers()
+            for offset in range(start, end + 1, 16384):
+                chunk = data[offset:min(offset + 16384, end + 1)]
+                try:
+                    self.wfile.write(chunk)
+                except OSError:
+                    break
+                served.append(len(chunk))
+
+    server = ThreadingHTTPServer(("127.0.0.1", 0), RangeHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        targets = [0, 130, 260, 390]
+        with FrameSource(str(path)) as local:
+            expected = dict(local.read(targets))
+        with FrameSource(f"http://127.0.0.1:{server.server_port}/clip.avi", seek_gap=50) as remote:
+            streamed = dict(remote.read(targets))
+    finally:
+        server.shutdown()
+
+    assert sorted(streamed) == targets
+    assert all(np.array_equal(streamed[i], expected[i]) for i in targets)
+    assert sum(served) < len(data) / 2
+
+
+def test_batch_endpoint_streams_a_line_per_archive_item():
+    """Every archive member gets its own NDJSON line; a bad one doesn't fail the batch"""
+    import io
+    import json
+    import zipfile
+    from fastapi.testclient import TestClient
+
+    rng = np.random.default_rng(4)
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        for i in range(3):
+            image = cv2.GaussianBlur(rng.integers(0, 256, (120, 160, 3), dtype=np.uint8), (0, 0), 3)
+            zf.writestr(f"images/{i}.png", cv2.imencode(".png", image)[1].tobytes())
+        zf.writestr("images/readme.txt", "not an image")
+
+    client = TestClient(main.app)
+    response = client.post("/analyze/batch", files={"files": ("batch.zip", archive.getvalue(), "application/zip")})
+    assert response.status_code == 200
+    lines = [json.loads(line) for line in response.text.splitlines()]
+
+    assert lines[-1] == {"done": True, "items": 4, "failed": 1}
+    by_index = {line["index"]: line for line in lines[:-1]}
+    assert sorted(by_index) == [0, 1, 2, 3]
+    assert "error" in by_index[3] and by_index[3]["filename"] == "images/readme.txt"
+    assert all("verdict" in by_index[i]["analysis"] for i in range(3))
+
+
+def test_batch_pipeline_serializes_numpy_values_like_the_other_endpoints():
+    import asyncio
+    import json
+    from concurrent.futures import ThreadPoolExecutor
+    from batch import run_pipeline
+    from response_format import orjson
+
+    if orjson is None:
+        pytest.skip("numpy values need the orjson-backed dumps")
+
+    def analyze_chunk(chunk):
+        return [{"index": index, "score": np.float32(0.25), "frames": np.arange(2)} for index, _, _, _ in chunk]
+
+    async def collect():
+        items = iter([(i, f"{i}.png", b"", None) for i in range(3)])
+        return [line async for line in run_pipeline(items, analyze_chunk, pool, batch_size=2, depth=2)]
+
+    with ThreadPoolExecutor(2) as pool:
+        lines = [json.loads(line) for line in asyncio.run(collect())]
+    assert sorted(line["index"] for line in lines[:-1]) == [0, 1, 2]
+    assert all(line["score"] == 0.25 and line["frames"] == [0, 1] for line in lines[:-1])
+    assert lines[-1] == {"done": True, "items": 3, "failed": 0}
+
+
+def test_columnar_frames_match_the_full_layout():
+    import base64
+    from response_format import frame_view_options, shape_result
+
+    frames = [
+        {"frame_number": i * 10, "timestamp": i * 0.4, "score": 0.1 * i,
+         "details": {"ml_model": {"score": 0.5, "details": "..."}, "color_analysis": {"score": 0.05 * i}}}
+        for i in range(6)
+    ]
+    frames[3]["reused_from"] = 20
+    del frames[4]["details"]["color_analysis"]
+    result = {"analysis": {}, "frame_by_frame": frames}
+    detectors = ["ml_model", "color_analysis"]
+
+    view = frame_view_options("columnar", False, "json", 2, 3)
+    shaped = shape_result(result, view, detectors)
+    columns = shaped["frame_by_frame"]
+    assert result["frame_by_frame"] is frames
+    assert shaped["frames_page"] == {"offset": 2, "limit": 3, "total": 6}
+    assert columns["frame_number"] == [20, 30, 40]
+    assert columns["detectors"]["color_analysis"] == [0.1, 0.15000000000000002, None]
+    assert columns["reused_from"] == [-1, 20, -1]
+
+    packed = shape_result(result, frame_view_options("columnar", True, "json", None, None), detectors)
+    scores = np.frombuffer(base64.b64decode(packed["frame_by_frame"]["score"]), "<f4")
+    assert np.allclose(scores, [f["score"] for f in frames])
+
+
+def test_metrics_endpoint_reports_requests_by_route():
+    from fastapi.testclient import TestClient
+
+    client = TestClient(main.app)
+    assert client.get("/health").status_code == 200
+
+    response = client.get("/metrics")
+    assert response.status_code == 200
+    assert 'truthlens_request_seconds_count{method="GET",route="/health",status="200"}' in response.text
+    assert "truthlens_detector_seconds" in response.text
+
+
+def test_admission_lanes_prioritize_images_and_reject_when_full():
+    import threading
+    from admission import AdmissionExecutor, Saturated
+
+    pool = AdmissionExecutor(2, reserved=1)
+    pool.add_lane("image", 0, max_queued=4, interactive=True)
+    pool.add_lane("video", 1, max_queued=1)
+    started, release = threading.Event(), threading.Event()
+    order = []
+
+    def hold():
+        started.set()
+        release.wait(5)
+
+    try:
+        # One video holds the only non-reserved thread; the next one queues
+        running = pool.submit("video", hold)
+        assert started.wait(5)
+        queued = pool.submit("video", order.append, "video")
+        with pytest.raises(Saturated) as rejected:
+            pool.submit("video", order.append, "too many")
+        assert rejected.value.retry_after >= 1
+
+        # The reserved thread still serves images while the videos wait
+        assert pool.submit("image", order.append, "image").result(timeout=5) is None
+        assert order == ["image"]
+        assert pool.stats()["lanes"]["video"]["rejected"] == 1
+
+        release.set()
+        running.result(timeout=5)
+        queued.result(timeout=5)
+        assert order == ["image", "video"]
+    finally:
+        release.set()
+        pool.shutdown()
+
+
+def test_cpu_budget_splits_the_cgroup_quota_between_layers(monkeypatch):
+    import cpu_budget
+
+    monkeypatch.setattr(cpu_budget, "usable_cores", lambda: list(range(16)))
+    monkeypatch.setattr(cpu_budget, "cgroup_cpu_limit", lambda: 3.5)
+    detected = cpu_budget.detect_cpus()
+    assert (detected["cpus"], detected["source"]) == (4, "cgroup quota")
+
+    # Two workers of 2 CPUs: 2 analysis threads each, single-threaded OpenCV/BLAS calls
+    budget = cpu_budget.plan_budget(detected["cpus"], processes=2)
+    assert budget["cpus_per_process"] == 2
+    assert (budget["analysis_threads"], budget["opencv_threads"], budget["blas_threads"]) == (2, 1, 1)
+    assert budget["torch_threads"] == 2
+    assert cpu_budget.plan_budget(8, microbatch=False, analysis_threads=4)["torch_threads"] == 2
+
+    budget = cpu_budget.plan_budget(8, process_backend=True, pool_workers=4)
+    assert (budget["pool_workers"], budget["pool_worker_threads"]) == (4, 2)
+    assert cpu_budget.core_sets(list(range(8)), 4) == [[0, 1], [2, 3], [4, 5], [6, 7]]
+
+
+def test_cpu_budget_splits_only_between_workers_run_py_started(monkeypatch):
+    import cpu_budget
+
+    monkeypatch.setattr(cpu_budget, "usable_cores", lambda: list(range(8)))
+    monkeypatch.setattr(cpu_budget, "cgroup_cpu_limit", lambda: None)
+
+    # `uvicorn main:app` with WORKERS=4 from .env is still a single process
+    budget = cpu_budget.budget_from_env({"WORKERS": "4"})
+    assert (budget["processes"], budget["cpus_per_process"]) == (1, 8)
+    assert (budget["analysis_threads"], budget["torch_threads"]) == (8, 8)
+
+    budget = cpu_budget.budget_from_env({"WORKERS": "4", cpu_budget.WORKER_PROCESSES_VAR: "4"})
+    assert (budget["processes"], budget["cpus_per_process"], budget["torch_threads"]) == (4, 2, 2)
+    # The model server is one more process
+    budget = cpu_budget.budget_from_env({cpu_budget.WORKER_PROCESSES_VAR: "3", "MODEL_SERVER_SOCKET": "/tmp/m.sock"})
+    assert budget["cpus_per_process"] == 2
+
+
+def test_live_stream_drops_frames_beyond_the_fps_budget(tmp_path, monkeypatch):
+    """A 20 fps file source analyzed at 4 fps: the rest is dropped, and every frame is accounted for"""
+    from fastapi.testclient import TestClient
+
+    path = tmp_path / "live.avi"
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), 20, (160, 120))
+    rng = np.random.default_rng(5)
+    for _ in range(30):
+        writer.write(cv2.GaussianBlur(rng.integers(0, 256, (120, 160, 3), dtype=np.uint8), (0, 0), 3))
+    writer.release()
+
+    client = TestClient(main.app)
+    with client.websocket_connect(f"/ws/live?source={path}") as ws:
+        assert ws.receive_json() == {"type": "error", "detail": "Stream sources are disabled"}
+
+    monkeypatch.setattr(main, "LIVE_SOURCES_ENABLED", True)
+    with client.websocket_connect(f"/ws/live?source={path}&max_fps=4") as ws:
+        assert ws.receive_json()["max_fps"] == 4
+        messages = []
+        while not messages or messages[-1]["type"] != "summary":
+            messages.append(ws.receive_json())
+
+    updates, summary = messages[:-1], messages[-1]
+    counts = summary["counts"]
+    assert all(m["type"] == "update" for m in updates) and len(updates) == counts["analyzed"]
+    # 1.5 s of video at 4 fps, plus the first frame
+    assert 2 <= counts["analyzed"] <= 8
+    assert counts["received"] == 30
+    assert counts["analyzed"] + counts["dropped"] + counts["stale"] == 30
+    assert summary["verdict"] == updates[-1]["window"]["verdict"]
+    assert summary["window"]["frames"] == counts["analyzed"]
+
+
+def test_busy_video_endpoints_refuse_before_reading_the_upload(monkeypatch):
+    from admission import AdmissionExecutor
+    from fastapi.testclient import TestClient
+
+    pool = AdmissionExecutor(1, reserved=0)
+    monkeypatch.setattr(main, "video_lane", pool.add_lane("video", 0, max_queued=0))
+    monkeypatch.setattr(main.job_manager, "max_pending", 0)
+
+    async def never_saved(file):
+        raise AssertionError("upload was read")
+
+    monkeypatch.setattr(main, "save_video_upload", never_saved)
+    client = TestClient(main.app)
+    upload = {"file": ("clip.mp4", b"\x00" * 1024, "video/mp4")}
+    try:
+        response = client.post("/analyze/video", files=upload)
+        assert response.status_code == 503 and int(response.headers["retry-after"]) >= 1
+        response = client.post("/jobs/video", files=upload)
+        assert response.status_code == 429 and "retry-after" in response.headers
+    finally:
+        pool.shutdown()
+
+
+def test_inference_scheduler_batches_concurrent_requests_and_fails_leftovers_on_shutdown():
+    import threading
+    import time
+    from concurrent.futures import ThreadPoolExecutor
+    from inference_scheduler import InferenceScheduler
+
+    batches = []
+    release = threading.Event()
+
+    def run_batch(images):
+        batches.append(len(images))
+        release.wait(5)
+        return [{"score": float(image[0, 0])} for image in images]
+
+    scheduler = InferenceScheduler(run_batch, max_batch_size=4, max_wait_ms=200)
+    images = [np.full((2, 2), i, dtype=np.float32) for i in range(6)]
+    release.set()
+    with ThreadPoolExecutor(6) as pool:
+        futures = list(pool.map(scheduler.submit, images))
+    # Six requests within the wait window: a full batch of 4, then the other 2
+    assert [future.result(timeout=5)["score"] for future in futures] == list(range(6))
+    assert batches == [4, 2]
+
+    # A lone request is flushed once max_wait passes instead of waiting for company
+    assert scheduler.submit(images[1]).result(timeout=5) == {"score": 1.0}
+    assert batches[-1] == 1
+    assert scheduler.stats()["items"] == 7
+
+    # Requests queued behind a running batch fail on shutdown rather than hang
+    release.clear()
+    running = scheduler.submit(images[0])
+    while len(batches) < 4:
+        time.sleep(0.01)
+    queued = [scheduler.submit(image) for image in images[1:3]]
+    threading.Timer(0.2, release.set).start()
+    scheduler.shutdown()
+    assert running.result(timeout=5) == {"score": 0.0}
+    for future in queued:
+        with pytest.raises(RuntimeError):
+            future.result(timeout=5)
+    with pytest.raises(RuntimeError):
+        scheduler.submit(images[0]).result(timeout=1)
+
+
+def test_result_cache_evicts_least_recently_used_by_count_size_and_age(tmp_path, monkeypatch):
+    import result_cache
+    from result_cache import ResultCache
+
+    cache = ResultCache(max_entries=2, max_memory_mb=1)
+    cache.set("a", {"v": 1})
+    cache.set("b", {"v": 2})
+    assert cache.get("a") == {"v": 1}  # a is now the most recently used
+    cache.set("c", {"v": 3})
+    assert cache.get("b") is None and cache.get("a") == {"v": 1} and cache.get("c") == {"v": 3}
+
+    # Size: two 0.4 MB results fit in 1 MB, a third pushes out the oldest
+    big = ResultCache(max_entries=100, max_memory_mb=1)
+    for key in "xyz":
+        big.set(key, {"frames": "f" * 400_000})
+    assert big.get("x") is None and big.get("y") is not None and big.get("z") is not None
+    assert big.stats()["memory_bytes"] <= 1024 * 1024
+    big.set("huge", {"frames": "f" * 2_000_000})  # Larger than the whole tier: not kept
+    assert big.get("huge") is None and big.stats()["memory_entries"] == 2
+
+    # TTL: entries older than ttl_seconds miss in both tiers
+    now = [1000.0]
+    monkeypatch.setattr(result_cache.time, "time", lambda: now[0])
+    aging = ResultCache(ttl_seconds=60, db_path=str(tmp_path / "ttl.db"))
+    aging.set("k", {"v": 1})
+    now[0] += 30
+    assert aging.get("k") == {"v": 1}
+    now[0] += 61
+    assert aging.get("k") is None
+    assert aging.stats()["disk_entries"] == 0
+
+    # SQLite tier: least recently accessed rows go once the size limit is exceeded
+    disk = ResultCache(max_entries=1, db_path=str(tmp_path / "lru.db"), max_disk_mb=1)
+    for key in ("d1", "d2"):
+        now[0] += 1
+        disk.set(key, {"frames": "f" * 400_000})
+    now[0] += 1
+    assert disk.get("d1") is not None  # From disk (memory holds only d2); refreshes d1
+    now[0] += 1
+    disk.set("d3", {"frames": "f" * 400_000})
+    stats = disk.stats()
+    assert stats["disk_entries"] == 2 and stats["disk_bytes"] <= 1024 * 1024
+    fresh = ResultCache(db_path=str(tmp_path / "lru.db"))
+    assert fresh.get("d2") is None and fresh.get("d1") is not None and fresh.get("d3") is not None
+
+
+def drawn_face(size: int) -> np.ndarray:
+    """Gray cartoon face (brows, eyes, nose, mouth) that the Haar cascade detects"""
+    face = np.full((size, size), 90, np.uint8)
+    center = size // 2
+    cv2.ellipse(face, (center, center), (int(size * 0.38), int(size * 0.48)), 0, 0, 360, 200, -1)
+    for side in (-1, 1):
+        x = center + side * int(size * 0.18)
+        cv2.ellipse(face, (x, int(size * 0.33)), (int(size * 0.11), int(size * 0.03)), 0, 0, 360, 60, -1)
+        cv2.ellipse(face, (x, int(size * 0.42)), (int(size * 0.09), int(size * 0.045)), 0, 0, 360, 40, -1)
+    cv2.ellipse(face, (center, int(size * 0.60)), (int(size * 0.05), int(size * 0.08)), 0, 0, 360, 170, -1)
+    cv2.ellipse(face, (center, int(size * 0.75)), (int(size * 0.14), int(size * 0.035)), 0, 0, 360, 70, -1)
+    return cv2.GaussianBlur(face, (0, 0), 3)
+
+
+def test_process_backend_matches_thread_backend_frame_by_frame(tmp_path):
+    """ANALYSIS_BACKEND=process gives the same per-frame results as analyzing in-thread"""
+    from deepfake_analyzer import DeepfakeAnalyzer
+    from process_pool import ProcessAnalysisPool
+
+    # A drawn face drifting across a textured background, so face detection and tracking both run
+    path = tmp_path / "clip.avi"
+    rng = np.random.default_rng(5)
+    writer = cv2.VideoWriter(str(path), cv2.VideoWriter_fourcc(*"MJPG"), 25, (320, 240))
+    for i in range(60):
+        frame = cv2.GaussianBlur(rng.integers(70, 150, (240, 320), dtype=np.uint8), (0, 0), 2)
+        # Growing, so boxes carried over by tracking differ from fresh detections
+        size = 100 + 2 * i
+        frame[10:10 + size, 40 + i:40 + i + size] = drawn_face(size)
+        writer.write(cv2.cvtColor(frame, cv2.COLOR_GRAY2BGR))
+    writer.release()
+
+    analyzer = DeepfakeAnalyzer()
+    expected = analyzer.analyze_video(str(path), sample_rate=12, batch_size=4)
+
+    analyzer.process_pool = ProcessAnalysisPool(workers=2, threads_per_worker=1)
+    try:
+        analyzer.process_pool.warm_up()
+        pooled = analyzer.analyze_video(str(path), sample_rate=12, batch_size=4)
+    finally:
+        analyzer.process_pool.shutdown()
+
+    assert len(expected["frame_by_frame"]) == 12
+    faces = [f["details"]["facial_consistency"].get("faces_detected", 0) for f in expected["frame_by_frame"]]
+    assert all(count >= 1 for count in faces)
+    assert pooled["frame_by_frame"] == expected["frame_by_frame"]
+    assert pooled["overall_analysis"] == expected["overall_analysis"]
+
+
+def wait_until(condition, timeout: float = 5.0):
+    import time
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+
+def test_job_manager_refuses_a_full_queue_and_cancels_queued_and_running_jobs(monkeypatch):
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    from fastapi.testclient import TestClient
+    from jobs import JobManager, JobQueueFull
+
+    pool = ThreadPoolExecutor(1)
+    manager = JobManager(pool, max_pending=2)
+    started = threading.Event()
+    ran, cleaned = [], []
+
+    def work(job):
+        ran.append(job.id)
+        started.set()
+        while True:
+            job.check_cancelled()
+            threading.Event().wait(0.01)
+
+    try:
+        running = manager.submit("video", work, cleanup=lambda: cleaned.append("running"))
+        queued = manager.submit("video", work, cleanup=lambda: cleaned.append("queued"))
+        assert started.wait(5)
+        with pytest.raises(JobQueueFull):
+            manager.submit("video", work)
+
+        # The upload endpoint answers 429 before reading the body
+        monkeypatch.setattr(main, "job_manager", manager)
+        response = TestClient(main.app).post("/jobs/video", files={"file": ("clip.mp4", b"\x00", "video/mp4")})
+        assert response.status_code == 429 and "retry-after" in response.headers
+
+        # A queued job is cancelled outright and never runs
+        manager.cancel(queued.id)
+        assert queued.status == "cancelled"
+        # A running one stops at its next check_cancelled()
+        assert running.status == "running"
+        manager.cancel(running.id)
+        wait_until(lambda: running.done)
+        assert running.status == "cancelled"
+        assert ran == [running.id]
+        wait_until(lambda: len(cleaned) == 2)
+        assert manager.stats()["jobs"] == {"cancelled": 2}
+    finally:
+        pool.shutdown(cancel_futures=True)
+
+
+def test_job_manager_prunes_finished_jobs_by_count_and_age(monkeypatch):
+    import jobs
+    from concurrent.futures import ThreadPoolExecutor
+    from jobs import JobManager
+
+    now = [1000.0]
+    monkeypatch.setattr(jobs.time, "time", lambda: now[0])
+    pool = ThreadPoolExecutor(1)
+    manager = JobManager(pool, max_retained=2, retention_seconds=60)
+    try:
+        finished = []
+        for i in range(3):
+            now[0] += 1
+            job = manager.submit("video", lambda job, i=i: {"n": i})
+            wait_until(lambda: job.done)
+            finished.append(job)
+
+        # Only the two most recently finished are kept
+        assert manager.get(finished[0].id) is None
+        assert manager.get(finished[1].id).result == {"n": 1}
+        now[0] += 30
+        assert manager.get(finished[2].id) is not None
+        now[0] += 31
+        assert manager.get(finished[1].id) is None and manager.get(finished[2].id) is None
+    finally:
+        pool.shutdown()
+
+
+@pytest.mark.parametrize("fail", [False, True])
+def test_job_events_stream_progress_then_the_outcome(fail):
+    import asyncio
+    import threading
+    from concurrent.futures import ThreadPoolExecutor
+    from jobs import JobManager
+
+    pool = ThreadPoolExecutor(1)
+    manager = JobManager(pool)
+    subscribed = threading.Event()
+
+    def work(job):
+        assert subscribed.wait(5)
+        for percent in (50, 100):
+            job.report_progress({"percent": percent})
+        if fail:
+            raise RuntimeError("decoder crashed")
+        return {"score": 0.5}
+
+    async def follow():
+        job = manager.submit("video", work)
+        events = []
+        async for event, data in job.events(heartbeat=5):
+            events.append((event, data))
+            subscribed.set()
+        return events
+
+    try:
+        events = asyncio.run(follow())
+    finally:
+        pool.shutdown()
+
+    # Status snapshots (queued, running) may come first depending on timing
+    names = [event for event, _ in events if event != "status"]
+    assert names == ["progress", "progress", "failed" if fail else "result"]
+    assert [data["percent"] for event, data in events if event == "progress"] == [50, 100]
+    outcome = events[-1][1]
+    if fail:
+        assert outcome["status"] == "failed" and outcome["error"] == "decoder crashed"
+    else:
+        assert outcome["status"] == "completed" and outcome["result"] == {"score": 0.5}
+
+
+def upload_test_app(limit: int):
+    """A one-route app behind UploadLimitMiddleware, recording what reached the handler"""
+    from fastapi import FastAPI, File, UploadFile
+    from uploads import UploadLimitMiddleware
+
+    app = FastAPI()
+    app.add_middleware(UploadLimitMiddleware, limits={"/upload": limit})
+    app.state.handled = []
+
+    @app.post("/upload")
+    async def upload(file: UploadFile = File(...)):
+        app.state.handled.append(file.filename)
+        return {"ok": True}
+
+    return app
+
+
+def test_upload_limits_refuse_oversized_and_non_multipart_requests():
+    import asyncio
+    from fastapi.testclient import TestClient
+    from uploads import MULTIPART_OVERHEAD
+
+    app = upload_test_app(1024)
+    client = TestClient(app)
+    assert client.post("/upload", files={"file": ("a.bin", b"x" * 100)}).status_code == 200
+
+    # Declared too large: refused from Content-Length alone
+    response = client.post("/upload", files={"file": ("a.bin", b"x" * (MULTIPART_OVERHEAD + 2048))})
+    assert response.status_code == 413
+    assert client.post("/upload", json={"file": "x"}).status_code == 415
+    assert app.state.handled == ["a.bin"]
+
+    # A chunked body without Content-Length is cut off once it passes the limit
+    boundary = "b0undary"
+    head = (f"--{boundary}\r\nContent-Disposition: form-data; name=\"file\"; filename=\"big.bin\"\r\n"
+            "Content-Type: application/octet-stream\r\n\r\n").encode()
+    chunks = [head] + [b"x" * 16384] * 64 + [f"\r\n--{boundary}--\r\n".encode()]
+    served = []
+    sent = []
+
+    async def receive():
+        served.append(len(chunks[len(served)]))
+        return {"type": "http.request", "body": chunks[len(served) - 1], "more_body": len(served) < len(chunks)}
+
+    async def send(message):
+        sent.append(message)
+
+    scope = {
+        "type": "http", "method": "POST", "path": "/upload", "raw_path": b"/upload", "query_string": b"",
+        "root_path": "", "scheme": "http", "server": ("test", 80), "client": ("test", 1), "http_version": "1.1",
+        "headers": [(b"content-type", f"multipart/form-data; boundary={boundary}".encode())]
+    }
+    asyncio.run(app(scope, receive, send))
+    assert sent[0]["status"] == 413
+    assert len(served) < len(chunks) and sum(served) <= 1024 + MULTIPART_OVERHEAD + 16384 + len(head)
+    assert app.state.handled == ["a.bin"]
+
+
+def test_uploads_are_sniffed_and_temp_files_removed_on_failure(tmp_path, monkeypatch):
+    import io
+    import tempfile
+    from fastapi import HTTPException
+    from fastapi.testclient import TestClient
+    from uploads import map_upload, save_upload
+
+    monkeypatch.setattr(tempfile, "tempdir", str(tmp_path))
+    webm = b"\x1a\x45\xdf\xa3" + b"\x00" * 4096
+
+    path, digest = save_upload(io.BytesIO(webm), "video", 1 << 20, chunk_size=1024)
+    assert open(path, "rb").read() == webm and len(digest) == 64
+    os.unlink(path)
+
+    # Wrong magic bytes: 415 whatever the declared content type
+    with pytest.raises(HTTPException) as refused:
+        save_upload(io.BytesIO(b"#!/bin/sh\necho hi\n" * 20), "video", 1 << 20)
+    assert refused.value.status_code == 415
+    upload = tmp_path / "upload.bin"
+    upload.write_bytes(webm)
+    with open(upload, "rb") as f, pytest.raises(HTTPException) as refused:
+        with map_upload(f, "image", 1 << 20):
+            pass
+    assert refused.value.status_code == 415
+
+    # Too large once copied: the partial temp file is removed
+    with pytest.raises(HTTPException) as refused:
+        save_upload(io.BytesIO(webm), "video", 2048, chunk_size=1024)
+    assert refused.value.status_code == 413
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["upload.bin"]
+
+    response = TestClient(main.app).post("/jobs/video", files={"file": ("clip.mp4", b"plain text" * 100, "video/mp4")})
+    assert response.status_code == 415
+    assert sorted(p.name for p in tmp_path.iterdir()) == ["upload.bin"]
+
+
+def test_model_client_round_trips_through_the_model_server(tmp_path):
+    import stat
+    import threading
+    import torch
+    from model_server import ModelClient, ModelServer
+
+    class DoublingBackend:
+        name = "fake"
+
+        def __call__(self, inputs: dict) -> np.ndarray:
+            pixels = inputs["pixel_values"].numpy()
+            if np.isnan(pixels).any():
+                raise ValueError("NaN in the batch")
+            return pixels.reshape(len(pixels), -1)[:, :2] * 2
+
+    address = str(tmp_path / "model.sock")
+    server = ModelServer(address, DoublingBackend(), "tiny-test", max_batch_size=4, max_wait_ms=1)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        client = ModelClient(address, connect_timeout=5)
+        assert client.name == "server:fake" and client.model_name == "tiny-test"
+        assert stat.S_IMODE(os.stat(address).st_mode) == 0o600
+
+        pixels = torch.arange(24, dtype=torch.float32).reshape(2, 3, 2, 2)
+        probs = client({"pixel_values": pixels})
+        assert np.array_equal(probs, pixels.numpy().reshape(2, -1)[:, :2] * 2)
+
+        # Backend and protocol errors come back as exceptions; the connection stays usable
+        with pytest.raises(RuntimeError, match="NaN in the batch"):
+            client({"pixel_values": torch.full((1, 3, 2, 2), float("nan"))})
+        with pytest.raises(RuntimeError, match="unknown request"):
+            client._request(("reload",))
+        assert client.stats()["batches"] >= 1
+        assert np.array_equal(client({"pixel_values": pixels}), probs)
+    finally:
+        server.scheduler.shutdown()
+
+
+def test_live_stream_reports_failed_frames_and_always_ends_with_a_summary(monkeypatch):
+    from admission import Saturated
+    from fastapi.testclient import TestClient
+
+    outcomes = [Saturated("live", 1), {"score": 0.2}, RuntimeError("model crashed"), ValueError("Could not decode frame")]
+
+    def analyze_live_frame(data, face_tracker, buffers):
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    monkeypatch.setattr(main, "analyze_live_frame", analyze_live_frame)
+    with TestClient(main.app).websocket_connect("/ws/live") as ws:
+        assert ws.receive_json()["type"] == "ready"
+        replies = []
+        for _ in range(4):
+            ws.send_bytes(b"frame")
+            replies.append(ws.receive_json())
+        ws.send_text("end")
+        summary = ws.receive_json()
+
+    assert [reply["type"] for reply in replies] == ["error", "update", "error", "error"]
+    assert replies[0]["detail"] == "The live analysis queue is full"
+    assert replies[2]["detail"] == "model crashed"
+    assert summary["type"] == "summary"
+    assert summary["counts"]["analyzed"] == 1 and summary["counts"]["failed"] == 3
+    assert summary["window"]["frames"] == 1
+
+
+@pytest.mark.parametrize("fast_preprocess", [False, True])
+def test_batched_ml_detection_matches_single_images(monkeypatch, fast_preprocess):
+    """Chunked forward passes score every image as if it had been run on its own"""
+    import torch
+    from transformers import ViTConfig, ViTForImageClassification, ViTImageProcessor
+    from deepfake_analyzer import DeepfakeAnalyzer, ml_model_cache
+    from inference_backends import TorchBackend
+    from preprocessing import FramePreprocessor
+
+    torch.manual_seed(0)
+    config = ViTConfig(image_size=224, patch_size=32, hidden_size=32, num_hidden_layers=2,
+                       num_attention_heads=2, intermediate_size=64, num_labels=2)
+    model = ViTForImageClassification(config).eval()
+    # Spread the random logits so the images get clearly different scores
+    torch.nn.init.normal_(model.classifier.weight, std=0.5)
+    processor = ViTImageProcessor()
+
+    preprocessor = FramePreprocessor.from_processor(processor, "cpu") if fast_preprocess else None
+    for key, value in {"model": model, "processor": processor, "device": "cpu",
+                       "backend": TorchBackend("torch", model, "cpu"), "preprocessor": preprocessor,
+                       "loaded": True, "available": True}.items():
+        monkeypatch.setitem(ml_model_cache, key, value)
+
+    rng = np.random.default_rng(0)
+    images = [cv2.GaussianBlur(rng.integers(0, 256, shape, dtype=np.uint8), (0, 0), 2)
+              for shape in [(120, 160, 3), (224, 224, 3), (97, 301, 3)] * 3]
+    analyzer = DeepfakeAnalyzer()
+
+    single = np.concatenate([analyzer._ml_forward(analyzer._ml_preprocess([image])) for image in images])
+    batched = np.concatenate([analyzer._ml_forward(analyzer._ml_preprocess(images[i:i + 4]))
+                              for i in range(0, len(images), 4)])
+    assert np.allclose(batched, single, atol=1e-5)
+
+    expected = [analyzer._ml_detection(image) for image in images]
+    assert len({result["score"] for result in expected}) > 1
+    for results in (analyzer._ml_detection_batch(images, batch_size=4),
+                    [analysis["ml_model"] for analysis in analyzer.analyze_images(images)]):
+        assert [r["prediction"] for r in results] == [r["prediction"] for r in expected]
+        assert [r["score"] for r in results] == pytest.approx([r["score"] for r in expected], abs=1e-3)
+
+
+class FakeCascade:
+    """Stands in for the Haar cascade: records calls and returns preset boxes"""
+
+    def __init__(self):
+        self.calls = 0
+        self.boxes = []
+
+    def detectMultiScale(self, image, *args):
+        self.calls += 1
+        return np.array(self.boxes, dtype=int).reshape(-1, 4)
+
+
+def face_frame(x: int, y: int) -> np.ndarray:
+    """1280x960 gray frame with a 120x120 textured "face" at full-size (x, y)"""
+    rng = np.random.default_rng(0)
+    frame = np.full((960, 1280), 128, dtype=np.uint8)
+    patch = rng.integers(0, 256, (60, 60), dtype=np.uint8)
+    frame[y:y + 120, x:x + 120] = np.repeat(np.repeat(patch, 2, axis=0), 2, axis=1)
+    return frame
+
+
+def test_face_tracker_follows_faces_between_detections(monkeypatch):
+    import face_detection
+    from face_detection import FaceTracker
+
+    cascade = FakeCascade()
+    monkeypatch.setattr(face_detection, "get_face_cascade", lambda: cascade)
+    tracker = FaceTracker(redetect_interval=3, max_dim=640)
+
+    # Detection runs at half size; boxes come back in full-size coordinates
+    cascade.boxes = [(100, 80, 60, 60)]
+    assert tracker.update(face_frame(200, 160)).tolist() == [[200, 160, 120, 120]]
+    assert cascade.calls == 1
+
+    # Between detections the face is followed by template matching
+    assert tracker.update(face_frame(208, 166)).tolist() == [[208, 166, 120, 120]]
+    assert tracker.update(face_frame(216, 172)).tolist() == [[216, 172, 120, 120]]
+    assert cascade.calls == 1
+
+    # Every redetect_interval frames the cascade runs again
+    cascade.boxes = [(110, 87, 60, 60)]
+    assert tracker.update(face_frame(220, 174)).tolist() == [[220, 174, 120, 120]]
+    assert cascade.calls == 2
+
+    # A face that can't be found near its last position triggers a detection right away
+    cascade.boxes = []
+    assert tracker.update(np.full((960, 1280), 40, np.uint8)).tolist() == []
+    assert cascade.calls == 3
+    tracker.update(face_frame(220, 174))
+    assert cascade.calls == 4
+
+
+def test_face_tracker_with_interval_one_detects_every_frame(monkeypatch):
+    import face_detection
+    from face_detection import FaceTracker, detect_faces
+
+    cascade = FakeCascade()
+    cascade.boxes = [(100, 80, 60, 60)]
+    monkeypatch.setattr(face_detection, "get_face_cascade", lambda: cascade)
+
+    tracker = FaceTracker(redetect_interval=1, max_dim=640)
+    for _ in range(3):
+        assert tracker.update(face_frame(200, 160)).tolist() == [[200, 160, 120, 120]]
+    assert cascade.calls == 3
+
+    # Boxes at the edge of the downscaled frame are clipped to the full-size frame
+    cascade.boxes = [(600, 440, 60, 60)]
+    assert detect_faces(face_frame(0, 0), max_dim=640).tolist() == [[1200, 880, 80, 80]]
+    # Frames already within max_dim are searched as they are
+    cascade.boxes = [(10, 20, 30, 40)]
+    assert detect_faces(np.zeros((480, 640), np.uint8), max_dim=640).tolist() == [[10, 20, 30, 40]]
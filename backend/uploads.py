@@ -0,0 +1,188 @@
+"""
+Upload ingestion without buffering whole files in memory
+
+Starlette already spools multipart file parts to a temporary file, so the
+expensive part was `await file.read()` pulling the whole upload back into
+memory. These helpers instead:
+
+- reject oversized or non-multipart requests before the body is parsed
+  (UploadLimitMiddleware), and abort uploads that grow past the limit while
+  they stream in
+- sniff the first bytes so non-media files are refused before any decoding
+- copy videos to disk in fixed-size chunks, hashing as they go
+- memory-map image uploads so cv2.imdecode reads the spooled file directly
+"""
+import hashlib
+import mmap
+import os
+import tempfile
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional, Tuple
+
+from fastapi import HTTPException
+from fastapi.responses import JSONResponse
+
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+# Allowance for multipart boundaries and part headers on top of the file itself
+MULTIPART_OVERHEAD = 64 * 1024
+
+IMAGE_SIGNATURES = (
+    b'\xff\xd8\xff',            # JPEG
+    b'\x89PNG\r\n\x1a\n',       # PNG
+    b'GIF87a', b'GIF89a',       # GIF
+    b'BM',                      # BMP
+    b'II*\x00', b'MM\x00*',     # TIFF
+    b'\x00\x00\x00\x0cjP  ',    # JPEG 2000
+    b'P1', b'P2', b'P3', b'P4', b'P5', b'P6',  # PNM
+)
+
+VIDEO_SIGNATURES = (
+    b'\x1a\x45\xdf\xa3',        # Matroska / WebM
+    b'FLV',                     # Flash video
+    b'\x00\x00\x01\xba',        # MPEG program stream
+    b'\x00\x00\x01\xb3',        # MPEG-1/2 elementary stream
+    b'\x30\x26\xb2\x75',        # ASF / WMV
+)
+
+
+def sniff_media_type(header: bytes) -> Optional[str]:
+    """Classify a file from its first bytes as "image", "video" or None"""
+    if header.startswith(IMAGE_SIGNATURES):
+        return "image"
+    if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+        return "image"
+
+    if header[4:8] == b'ftyp':  # MP4, MOV, 3GP, ...
+        return "video"
+    if header[:4] == b'RIFF' and header[8:12] == b'AVI ':
+        return "video"
+    if header.startswith(VIDEO_SIGNATURES):
+        return "video"
+    if len(header) > 188 and header[0] == 0x47 and header[188] == 0x47:  # MPEG-TS
+        return "video"
+
+    return None
+
+
+def check_media_type(header: bytes, expected: str):
+    """Raise 415 unless the header looks like the expected kind of media"""
+    if sniff_media_type(header) != expected:
+        raise HTTPException(status_code=415, detail=f"File content is not a supported {expected} format")
+
+
+def _upload_size(fileobj) -> int:
+    fileobj.seek(0, os.SEEK_END)
+    size = fileobj.tell()
+    fileobj.seek(0)
+    return size
+
+
+def _too_large(max_bytes: int) -> HTTPException:
+    return HTTPException(status_code=413, detail=f"File exceeds the {max_bytes // (1024 * 1024)} MB upload limit")
+
+
+def save_upload(fileobj, expected: str, max_bytes: int, suffix: str = ".mp4",
+                chunk_size: int = UPLOAD_CHUNK_SIZE) -> Tuple[str, str]:
+    """Copy an uploaded file to a named temp file in chunks, returning (path, sha256)
+
+    Blocking - call it through run_in_threadpool from async handlers.
+    """
+    fileobj.seek(0)
+    check_media_type(fileobj.read(256), expected)
+    fileobj.seek(0)
+
+    hasher = hashlib.sha256()
+    written = 0
+
+    with tempfile.NamedTemporaryFile(delete=False, suffix=suffix) as tmp_file:
+        try:
+            while True:
+                chunk = fileobj.read(chunk_size)
+                if not chunk:
+                    break
+
+                written += len(chunk)
+                if written > max_bytes:
+                    raise _too_large(max_bytes)
+
+                hasher.update(chunk)
+                tmp_file.write(chunk)
+        except BaseException:
+            tmp_file.close()
+            os.unlink(tmp_file.name)
+            raise
+
+    return tmp_file.name, hasher.hexdigest()
+
+
+@contextmanager
+def map_upload(fileobj, expected: str, max_bytes: int) -> Iterator[mmap.mmap]:
+    """Memory-map an uploaded file so it can be hashed and decoded without copies"""
+    size = _upload_size(fileobj)
+    if size == 0:
+        raise HTTPException(status_code=400, detail="Empty upload")
+    if size > max_bytes:
+        raise _too_large(max_bytes)
+
+    # fileno() rolls a small in-memory spooled upload over to its temp file
+    mapped = mmap.mmap(fileobj.fileno(), 0, access=mmap.ACCESS_READ)
+    try:
+        check_media_type(mapped[:256], expected)
+        yield mapped
+    finally:
+        try:
+            mapped.close()
+        except BufferError:
+            # A numpy view still points into the map; it is released with the view
+            pass
+
+
+class UploadLimitMiddleware:
+    """Enforce per-route upload limits before and while the request body is read
+
+    limits maps a URL path to its maximum file size in bytes. POSTs to those
+    paths must be multipart/form-data; a Content-Length over the limit is
+    refused with 413 before any of the body is read, and a chunked body that
+    grows past the limit is aborted as soon as it does.
+    """
+
+    def __init__(self, app, limits: Dict[str, int]):
+        self.app = app
+        self.limits = limits
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or scope["method"] != "POST" or scope["path"] not in self.limits:
+            await self.app(scope, receive, send)
+            return
+
+        max_bytes = self.limits[scope["path"]]
+        max_body = max_bytes + MULTIPART_OVERHEAD
+        headers = dict(scope["headers"])
+
+        content_type = headers.get(b"content-type", b"").decode("latin-1")
+        if not content_type.startswith("multipart/form-data"):
+            response = JSONResponse({"detail": "Expected a multipart/form-data upload"}, status_code=415)
+            await response(scope, receive, send)
+            return
+
+        content_length = headers.get(b"content-length")
+        if content_length is not None and content_length.isdigit() and int(content_length) > max_body:
+            response = JSONResponse({"detail": _too_large(max_bytes).detail}, status_code=413)
+            await response(scope, receive, send)
+            return
+
+        received = 0
+
+        async def limited_receive():
+            nonlocal received
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > max_body:
+                    # Surfaces from the form parser as a 413 response
+                    raise _too_large(max_bytes)
+            return message
+
+        await self.app(scope, limited_receive, send)
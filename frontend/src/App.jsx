@@ -11,6 +11,7 @@ function App() {
   const [results, setResults] = useState(null);
   const [error, setError] = useState(null);
   const [uploadProgress, setUploadProgress] = useState(0);
+  const [progressMessage, setProgressMessage] = useState('');
 
   // Configuration from environment variables
   const API_URL = import.meta.env.VITE_API_URL || 'http://localhost:8000';
@@ -30,29 +31,105 @@ function App() {
     setError(null);
   };
 
+  // Follow a background job's event stream until it finishes, resolving with its result
+  const followJob = (jobId) => new Promise((resolve, reject) => {
+    const events = new EventSource(`${API_URL}/jobs/${jobId}/events`);
+
+    events.addEventListener('progress', (e) => {
+      const progress = JSON.parse(e.data);
+      if (progress.stage === 'downloading') {
+        setProgressMessage('Downloading video...');
+        return;
+      }
+      setUploadProgress(progress.percent);
+      setProgressMessage(
+        `Frame ${progress.frames_done} of ${progress.frames_total} - running score ${(progress.running_score * 100).toFixed(1)}%`
+      );
+    });
+
+    events.addEventListener('result', (e) => {
+      events.close();
+      resolve(JSON.parse(e.data).result);
+    });
+
+    const fail = (e) => {
+      events.close();
+      const job = JSON.parse(e.data);
+      reject(new Error(job.error || `Analysis ${job.status}`));
+    };
+    events.addEventListener('failed', fail);
+    events.addEventListener('cancelled', fail);
+
+    // EventSource reconnects by itself after transient errors; only once it has
+    // given up, keep following the job by polling it
+    events.onerror = () => {
+      if (events.readyState === EventSource.CLOSED) {
+        pollJob(jobId).then(resolve, reject);
+      }
+    };
+  });
+
+  const pollJob = async (jobId) => {
+    for (;;) {
+      const response = await fetch(`${API_URL}/jobs/${jobId}`);
+      if (!response.ok) {
+        throw new Error('Lost connection to the analysis job');
+      }
+
+      const job = await response.json();
+      if (job.status === 'completed') return job.result;
+      if (job.status === 'failed' || job.status === 'cancelled') {
+        throw new Error(job.error || `Analysis ${job.status}`);
+      }
+      if (job.progress && job.progress.percent !== undefined) {
+        setUploadProgress(job.progress.percent);
+      }
+      await new Promise((r) => setTimeout(r, 2000));
+    }
+  };
+
+  const submitJob = async (endpoint, options) => {
+    const response = await fetch(`${API_URL}${endpoint}`, { method: 'POST', ...options });
+
+    if (!response.ok) {
+      const errorData = await response.json().catch(() => ({}));
+      throw new Error(errorData.detail || `Analysis failed: ${response.statusText}`);
+    }
+
+    const job = await response.json();
+    return followJob(job.job_id);
+  };
+
   const analyzeFile = async () => {
     if (!file) return;
 
     setLoading(true);
     setError(null);
     setUploadProgress(0);
+    setProgressMessage('');
 
     const formData = new FormData();
     formData.append('file', file);
 
     try {
-      const endpoint = fileType === 'video' ? '/analyze/video' : '/analyze/image';
-      
-      const response = await fetch(`${API_URL}${endpoint}`, {
-        method: 'POST',
-        body: formData,
-      });
-
-      if (!response.ok) {
-        throw new Error(`Analysis failed: ${response.statusText}`);
+      let data;
+
+      if (fileType === 'video') {
+        // Videos run as background jobs so we can show per-frame progress
+        data = await submitJob('/jobs/video', { body: formData });
+      } else {
+        const response = await fetch(`${API_URL}/analyze/image`, {
+          method: 'POST',
+          body: formData,
+        });
+
+        if (!response.ok) {
+          throw new Error(`Analysis failed: ${response.statusText}`);
+        }
+
+        data = await response.json();
       }
 
-      const data = await response.json();
       setResults(data);
       setUploadProgress(100);
     } catch (err) {
@@ -68,10 +145,10 @@ function App() {
     setLoading(true);
     setError(null);
     setUploadProgress(0);
+    setProgressMessage('');
 
     try {
-      const response = await fetch(`${API_URL}/analyze/youtube`, {
-        method: 'POST',
+      const data = await submitJob('/jobs/youtube', {
         headers: {
           'Content-Type': 'application/json',
         },
@@ -81,12 +158,6 @@ function App() {
         }),
       });
 
-      if (!response.ok) {
-        const errorData = await response.json();
-        throw new Error(errorData.detail || 'Analysis failed');
-      }
-
-      const data = await response.json();
       setResults(data);
       setUploadProgress(100);
     } catch (err) {
@@ -267,7 +338,7 @@ function App() {
               <Activity className="spin" size={48} />
             </div>
             <h3>Analyzing Media...</h3>
-            <p>This may take a few moments depending on file size</p>
+            <p>{progressMessage || 'This may take a few moments depending on file size'}</p>
             <div className="progress-bar">
               <div 
                 className="progress-fill" 